@@ -0,0 +1,191 @@
+"""
+Admission control for /api/chat — per-session and per-IP token buckets, and
+a global cap on in-flight chat turns with a bounded wait queue.
+
+A client over its rate gets 429; when every slot is busy and the queue is
+full (or a queued turn waits too long) the turn is shed with 503. Both
+carry Retry-After. A few aggressive clients therefore can't use up the
+Gemini quota or the worker threadpool that everyone else shares.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets tracked per limiter before idle (full) ones are pruned
+MAX_TRACKED_KEYS = 10_000
+
+
+def client_ip(peer: str | None, forwarded_for: list[str], trusted_hops: int) -> str | None:
+    """
+    The address to rate-limit. Each of the `trusted_hops` proxies in front of
+    the app appends the address it received from to X-Forwarded-For, so the
+    client is the rightmost entry they didn't add. Entries further left come
+    from the client and are ignored — a forged header can't buy a fresh bucket.
+    """
+    if trusted_hops <= 0:
+        return peer
+    chain = [hop.strip() for value in forwarded_for for hop in value.split(",") if hop.strip()]
+    if peer:
+        chain.append(peer)
+    if not chain:
+        return None
+    return chain[max(0, len(chain) - 1 - trusted_hops)]
+
+
+class Rejected(Exception):
+    """A chat turn refused by admission control."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    Keyed token buckets: `burst` tokens, refilled at `per_minute`. A rate of
+    0 disables the limiter.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: int):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self._buckets: dict[str, list[float]] = {}  # key → [tokens, last refill]
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, key: str):
+        """Spend one token for `key`, or raise Rejected(429) with the wait until the next."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_KEYS:
+                    self._prune(now)
+                bucket = self._buckets[key] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self.limited += 1
+                raise Rejected(429, f"{self.name} rate limit", (1 - tokens) / self.rate)
+            bucket[0] = tokens - 1
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely — they hold no state worth keeping."""
+        full = [
+            k for k, (tokens, last) in self._buckets.items()
+            if tokens + (now - last) * self.rate >= self.burst
+        ]
+        for k in full:
+            del self._buckets[k]
+
+    def stats(self) -> dict:
+        with self._lock:
+            tracked = len(self._buckets)
+        return {
+            "perMinute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "tracked": tracked,
+            "limited": self.limited,
+        }
+
+
+class ConcurrencyLimiter:
+    """At most `max_in_flight` turns run; up to `max_queue` more wait `queue_timeout` for a slot."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._avg_seconds = 2.0  # EWMA of turn duration, for Retry-After
+
+    def _retry_after(self) -> float:
+        # Roughly when the queue ahead would have drained
+        return self._avg_seconds * (self.queued + 1) / self.max_in_flight
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            if self.in_flight >= self.max_in_flight:
+                if self.queued >= self.max_queue:
+                    self.shed_queue_full += 1
+                    raise Rejected(503, "queue full", self._retry_after())
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+                try:
+                    ok = self._cond.wait_for(
+                        lambda: self.in_flight < self.max_in_flight, self.queue_timeout
+                    )
+                finally:
+                    self.queued -= 1
+                if not ok:
+                    self.shed_timeout += 1
+                    raise Rejected(503, "queue timeout", self._retry_after())
+            self.in_flight += 1
+            self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self.in_flight -= 1
+                self._avg_seconds += 0.1 * (elapsed - self._avg_seconds)
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "maxInFlight": self.max_in_flight,
+                "maxQueue": self.max_queue,
+                "inFlight": self.in_flight,
+                "queued": self.queued,
+                "peakQueued": self.peak_queued,
+                "admitted": self.admitted,
+                "shedQueueFull": self.shed_queue_full,
+                "shedTimeout": self.shed_timeout,
+                "avgTurnSeconds": round(self._avg_seconds, 3),
+            }
+
+
+class ChatAdmission:
+    def __init__(self, session_limit: TokenBucket, ip_limit: TokenBucket,
+                 concurrency: ConcurrencyLimiter):
+        self.session_limit = session_limit
+        self.ip_limit = ip_limit
+        self.concurrency = concurrency
+
+    @contextmanager
+    def admit(self, session_id: str, client_ip: str | None):
+        """Charge the session's and IP's buckets, then hold a chat slot for the block."""
+        self.session_limit.take(session_id)
+        if client_ip:
+            self.ip_limit.take(client_ip)
+        with self.concurrency.slot():
+            yield
+
+    def admit_session_start(self, client_ip: str | None):
+        """Charge a new session to the IP's bucket, so fresh sessions don't dodge the session limit."""
+        if client_ip:
+            self.ip_limit.take(client_ip)
+
+    def stats(self) -> dict:
+        return {
+            "session": self.session_limit.stats(),
+            "ip": self.ip_limit.stats(),
+            "concurrency": self.concurrency.stats(),
+        }
@@ -27,12 +27,15 @@ class LocationUpdateResponse(BaseModel):
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    zoom: int | None = None  # map zoom — selects route geometry detail
 
 
 class ChatResponse(BaseModel):
     reply: str
     intent: str | None = None
     routes: list[dict] = []
+    shapes: list[dict] = []  # encoded polylines for route_find legs
+    degraded: list[str] = []  # stages answered by a latency-budget fallback
 
 
 class NearbyStopsResponse(BaseModel):
@@ -42,3 +45,12 @@ class NearbyStopsResponse(BaseModel):
 class BusInfoResponse(BaseModel):
     bus: dict | None = None
     stops: list[dict] = []
+    shapes: list[dict] = []
+
+
+class TracingSettings(BaseModel):
+    exporter: str | None = None  # none | log | otlp
+    slow_seconds: float | None = None
+    sample_rate: float | None = None
+    profile_mode: str | None = None  # off | cprofile | tracemalloc
+    profile_sample_rate: float | None = None
@@ -0,0 +1,81 @@
+"""Pre-encoded, compressed HTTP payloads served straight from memory."""
+
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional — gzip is always available
+    brotli = None
+
+# Cache for a day, revalidate with ETag afterwards (data refreshes nightly)
+CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+
+
+class EncodedPayload:
+    """A JSON document encoded once into identity, gzip and (optionally) brotli bytes."""
+
+    def __init__(self, data):
+        self.identity = json.dumps(
+            data, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.identity).hexdigest()[:16] + '"'
+        self.gzip = gzip.compress(self.identity, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.identity, quality=11) if brotli else None
+
+    def response(self, request: Request) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in (t.strip() for t in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if self.br is not None and "br" in accepted:
+            body, headers["Content-Encoding"] = self.br, "br"
+        elif "gzip" in accepted:
+            body, headers["Content-Encoding"] = self.gzip, "gzip"
+        else:
+            body = self.identity
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def sizes(self) -> dict:
+        return {
+            "identity": len(self.identity),
+            "gzip": len(self.gzip),
+            "br": len(self.br) if self.br is not None else None,
+        }
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def columnar_stops(stops: list[dict]) -> dict:
+    """
+    Convert stop rows to parallel arrays — field names appear once instead of per stop.
+    Coordinates are rounded to 6 decimals (~0.1 m).
+    """
+    return {
+        "ids": [s["id"] for s in stops],
+        "names": [s.get("name") or "" for s in stops],
+        "codes": [s.get("code") or "" for s in stops],
+        "lat": [round(s["latitude"], 6) for s in stops],
+        "lng": [round(s["longitude"], 6) for s in stops],
+        "hub": [1 if s.get("isTransportHub") else 0 for s in stops],
+    }
@@ -1,8 +1,8 @@
 """FastAPI route handlers — the HTTP layer."""
 
 import time
-from fastapi import APIRouter, HTTPException
-from google.genai.errors import ClientError
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
 
 from conductor.api.models import (
     SessionStartRequest,
@@ -12,46 +12,122 @@ from conductor.api.models import (
     ChatRequest,
     ChatResponse,
     NearbyStopsResponse,
+    TracingSettings,
 )
+from conductor.api.admission import (
+    ChatAdmission,
+    ConcurrencyLimiter,
+    Rejected,
+    TokenBucket,
+    client_ip,
+)
+from conductor.api.state import DataState, Reloader
 from conductor.session import Session, SessionStore
 from conductor.graph.client import Neo4jClient
-from conductor.graph.retriever import GraphRetriever
-from conductor.matching.fuzzy import StopMatcher
+from conductor.graph.geometry import shape_level_for_zoom
+from conductor.budget import DeadlineExceeded, budget_stats, request_budget, stage
+from conductor.config import (
+    ADMIN_TOKEN,
+    CHAT_BUDGET_SECONDS,
+    CHAT_IP_BURST,
+    CHAT_IP_RATE_PER_MINUTE,
+    CHAT_MAX_IN_FLIGHT,
+    CHAT_MAX_QUEUE,
+    CHAT_QUEUE_TIMEOUT_SECONDS,
+    CHAT_SESSION_BURST,
+    CHAT_SESSION_RATE_PER_MINUTE,
+    MATCH_TIMEOUT_SECONDS,
+    RELOAD_WATCH_SECONDS,
+    RETRIEVE_TIMEOUT_SECONDS,
+    TRUSTED_PROXY_HOPS,
+)
+from conductor.llm.gateway import RateLimitError, gateway
+from conductor.metrics import Gauge
+from conductor.tracing import span, tracer
+from conductor.startup import startup
 from conductor.rag.parser import parse_intent
+from conductor.rag import generator
+from conductor.rag.context import MAX_LISTED_BUSES, compact_stop_list, context_stats
 from conductor.rag.generator import (
     generate_response,
     format_route_context,
     ask_for_location,
 )
-from conductor.rag.prompts import GREETING, GREETING_WITH_LOCATION
+from conductor.rag.prompts import BUSY_REPLY, GREETING, GREETING_WITH_LOCATION
 
 router = APIRouter()
 
 # Shared state — initialized in main.py lifespan
 neo4j_client: Neo4jClient | None = None
-retriever: GraphRetriever | None = None
-matcher: StopMatcher | None = None
+reloader: Reloader | None = None
 sessions: SessionStore = SessionStore()
+admission = ChatAdmission(
+    TokenBucket("session", CHAT_SESSION_RATE_PER_MINUTE, CHAT_SESSION_BURST),
+    TokenBucket("ip", CHAT_IP_RATE_PER_MINUTE, CHAT_IP_BURST),
+    ConcurrencyLimiter(CHAT_MAX_IN_FLIGHT, CHAT_MAX_QUEUE, CHAT_QUEUE_TIMEOUT_SECONDS),
+)
+Gauge("conductor_chat_in_flight", "Chat turns running.", lambda: admission.concurrency.in_flight)
+Gauge("conductor_chat_queued", "Chat turns waiting for a slot.", lambda: admission.concurrency.queued)
+Gauge("conductor_llm_in_flight", "LLM calls in progress.", lambda: gateway.in_flight)
 
 
 def init_services(client: Neo4jClient):
-    global neo4j_client, retriever, matcher
+    global neo4j_client, reloader
     neo4j_client = client
-    retriever = GraphRetriever(client)
-    matcher = StopMatcher(client)
+    reloader = Reloader(client)
+    reloader.reload("startup")
+    reloader.start_watching(RELOAD_WATCH_SECONDS)
+
+
+def _data() -> DataState:
+    """
+    The active data state. Read it once per request and pass it down, so a
+    request runs entirely against one version even if a reload swaps it.
+    503 until the startup warm-up has loaded the first state.
+    """
+    state = reloader.state if reloader is not None else None
+    if state is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Xidmət işə düşür, bir neçə saniyədən sonra yenidən cəhd edin.",
+            headers={"Retry-After": "5"},
+        )
+    return state
+
+
+def _client_ip(request: Request) -> str | None:
+    return client_ip(
+        request.client.host if request.client else None,
+        request.headers.getlist("x-forwarded-for"),
+        TRUSTED_PROXY_HOPS,
+    )
+
+
+def _rejected(e: Rejected) -> HTTPException:
+    if e.status == 429:
+        detail = f"Çox tez-tez yazırsınız. Zəhmət olmasa, {e.retry_after} saniyə gözləyin."
+    else:
+        detail = "Server hazırda çox yüklüdür. Zəhmət olmasa, bir az sonra yenidən cəhd edin."
+    return HTTPException(
+        status_code=e.status, detail=detail, headers={"Retry-After": str(e.retry_after)}
+    )
 
 
 # ── Session ─────────────────────────────────────────
 
 @router.post("/api/session/start", response_model=SessionStartResponse)
-def start_session(req: SessionStartRequest):
+def start_session(req: SessionStartRequest, request: Request):
+    try:
+        admission.admit_session_start(_client_ip(request))
+    except Rejected as e:
+        raise _rejected(e)
     session = sessions.create()
 
     if req.latitude is not None and req.longitude is not None:
         session.latitude = req.latitude
         session.longitude = req.longitude
         session.location_source = "geolocation"
-        session.nearest_stops = retriever.find_nearest_stops(
+        session.nearest_stops = _data().retriever.find_nearest_stops(
             req.latitude, req.longitude
         )
         stop_names = ", ".join(
@@ -79,7 +155,7 @@ def update_location(req: LocationUpdateRequest):
     session.latitude = req.latitude
     session.longitude = req.longitude
     session.location_source = "manual"
-    session.nearest_stops = retriever.find_nearest_stops(
+    session.nearest_stops = _data().retriever.find_nearest_stops(
         req.latitude, req.longitude
     )
 
@@ -89,25 +165,55 @@ def update_location(req: LocationUpdateRequest):
 # ── Chat ────────────────────────────────────────────
 
 @router.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+def chat(req: ChatRequest, request: Request):
     session = sessions.get(req.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    data = _data()
+
+    try:
+        with admission.admit(req.session_id, _client_ip(request)):
+            return _chat_turn(data, session, req)
+    except Rejected as e:
+        raise _rejected(e)
 
+
+def _chat_turn(data: DataState, session: Session, req: ChatRequest) -> ChatResponse:
     session.add_user_message(req.message)
 
-    try:
-        reply, intent, routes = _process_chat(session, req.message)
-    except ClientError as e:
-        if e.code == 429:
+    # Every stage below runs inside one latency budget (conductor/budget.py),
+    # traced as one request (exported only when slow, see conductor/tracing.py)
+    with tracer.request("chat", session=session.id) as root, \
+            request_budget(CHAT_BUDGET_SECONDS) as budget:
+        try:
+            with span("process_chat"):
+                reply, intent, routes = _process_chat(data, session, req.message)
+        except RateLimitError:
             reply = "Sorğu limiti aşılıb. Zəhmət olmasa, 1 dəqiqə gözləyin və yenidən cəhd edin."
             intent = "error"
             routes = []
-        else:
-            raise
+        except DeadlineExceeded:
+            # A stage with no fallback (or whose fallback had nothing) ran out of time
+            budget.fallback("request")
+            reply, intent, routes = BUSY_REPLY, "error", []
+
+        shapes = []
+        if intent == "route_find" and routes:
+            try:
+                with stage("shapes", RETRIEVE_TIMEOUT_SECONDS):
+                    shapes = data.retriever.get_route_shapes(routes, req.zoom)
+            except DeadlineExceeded:
+                budget.fallback("shapes")  # the map can do without polylines
+        root.set("intent", intent)
+        root.set("routes", len(routes))
+        if budget.fallbacks:
+            root.set("degraded", ",".join(dict.fromkeys(budget.fallbacks)))
 
     session.add_model_message(reply)
-    return ChatResponse(reply=reply, intent=intent, routes=routes)
+    return ChatResponse(
+        reply=reply, intent=intent, routes=routes, shapes=shapes,
+        degraded=list(dict.fromkeys(budget.fallbacks)),
+    )
 
 
 def _last_bot_asked_for_location(session) -> bool:
@@ -119,23 +225,27 @@ def _last_bot_asked_for_location(session) -> bool:
     return False
 
 
-def _process_chat(session, message: str) -> tuple[str, str, list]:
-    """Parse intent and dispatch to handler. May raise ClientError on rate limit."""
+def _process_chat(data: DataState, session, message: str) -> tuple[str, str, list]:
+    """Parse intent and dispatch to handler. May raise RateLimitError or DeadlineExceeded."""
 
     # If bot just asked for location and user responds with a place name,
     # treat it as origin for the pending route search (no Gemini call needed)
     if _last_bot_asked_for_location(session) and session.pending_destination:
-        origin_stops = matcher.match(message)
-        if origin_stops:
-            dest_stops = matcher.match(session.pending_destination)
-            if dest_stops:
+        with span("handle.pending_origin"):
+            with stage("match", MATCH_TIMEOUT_SECONDS):
+                origin_stops = data.matcher.match(message)
+                dest_stops = data.matcher.match(session.pending_destination) if origin_stops else []
+            if origin_stops and dest_stops:
                 origin_ids = [s["id"] for s in origin_stops]
                 dest_ids = [s["id"] for s in dest_stops]
-                search_result = retriever.search_routes(origin_ids, dest_ids)
+                with stage("retrieve", RETRIEVE_TIMEOUT_SECONDS):
+                    search_result = data.retriever.search_routes(origin_ids, dest_ids)
                 context = format_route_context(
                     search_result, origin_stops[0]["name"], dest_stops[0]["name"]
                 )
-                reply = generate_response(message, context, session.conversation_history[:-1])
+                reply = generate_response(
+                    message, context, session.conversation_history[:-1], intent="route_find"
+                )
                 session.pending_destination = None  # clear after use
                 return reply, "route_find", search_result.get("routes", [])
 
@@ -143,23 +253,25 @@ def _process_chat(session, message: str) -> tuple[str, str, list]:
     intent = parsed.get("intent", "general")
     entities = parsed.get("entities", {})
 
-    if intent == "route_find":
-        reply, routes = _handle_route_find(session, message, entities)
-    elif intent == "bus_info":
-        reply, routes = _handle_bus_info(message, entities)
-    elif intent == "stop_info":
-        reply, routes = _handle_stop_info(message, entities)
-    elif intent == "nearby_stops":
-        reply, routes = _handle_nearby_stops(session, message)
-    elif intent in ("fare_info", "schedule_info"):
-        reply, routes = _handle_bus_info(message, entities)
-    else:
-        reply = generate_response(
-            message,
-            "Ümumi sual. Bakı ictimai nəqliyyat sistemi haqqında cavab ver.",
-            session.conversation_history[:-1],
-        )
-        routes = []
+    with span(f"handle.{intent}"):
+        if intent == "route_find":
+            reply, routes = _handle_route_find(data, session, message, entities)
+        elif intent == "bus_info":
+            reply, routes = _handle_bus_info(data, message, entities)
+        elif intent == "stop_info":
+            reply, routes = _handle_stop_info(data, message, entities)
+        elif intent == "nearby_stops":
+            reply, routes = _handle_nearby_stops(data, session, message)
+        elif intent in ("fare_info", "schedule_info"):
+            reply, routes = _handle_bus_info(data, message, entities)
+        else:
+            reply = generate_response(
+                message,
+                "Ümumi sual. Bakı ictimai nəqliyyat sistemi haqqında cavab ver.",
+                session.conversation_history[:-1],
+                intent="general",
+            )
+            routes = []
 
     return reply, intent, routes
 
@@ -167,31 +279,33 @@ def _process_chat(session, message: str) -> tuple[str, str, list]:
 # ── Intent handlers ─────────────────────────────────
 
 def _handle_route_find(
-    session: Session, message: str, entities: dict
+    data: DataState, session: Session, message: str, entities: dict
 ) -> tuple[str, list]:
     origin_raw = entities.get("origin", "")
     dest_raw = entities.get("destination", "")
 
-    # Resolve origin
-    if origin_raw == "user_location" or not origin_raw:
-        if not session.has_location:
-            session.pending_destination = dest_raw
-            return ask_for_location(), []
-        origin_stops = retriever.find_nearest_stops(
-            session.latitude, session.longitude, limit=5
-        )
-        origin_name = "Sizin yeriniz"
-    else:
-        origin_stops = matcher.match(origin_raw)
-        origin_name = origin_raw
-        if session.has_location and origin_stops:
-            origin_stops = matcher.match_near(
-                origin_raw, session.latitude, session.longitude
+    if (origin_raw == "user_location" or not origin_raw) and not session.has_location:
+        session.pending_destination = dest_raw
+        return ask_for_location(), []
+
+    with stage("match", MATCH_TIMEOUT_SECONDS):
+        # Resolve origin
+        if origin_raw == "user_location" or not origin_raw:
+            origin_stops = data.retriever.find_nearest_stops(
+                session.latitude, session.longitude, limit=5
             )
+            origin_name = "Sizin yeriniz"
+        else:
+            origin_stops = data.matcher.match(origin_raw)
+            origin_name = origin_raw
+            if session.has_location and origin_stops:
+                origin_stops = data.matcher.match_near(
+                    origin_raw, session.latitude, session.longitude
+                )
 
-    # Resolve destination
-    dest_stops = matcher.match(dest_raw)
-    dest_name = dest_raw
+        # Resolve destination
+        dest_stops = data.matcher.match(dest_raw)
+        dest_name = dest_raw
 
     if not origin_stops:
         return f"'{origin_name}' adlı dayanacaq tapılmadı. Zəhmət olmasa, daha dəqiq yazın.", []
@@ -201,28 +315,39 @@ def _handle_route_find(
     origin_ids = [s["id"] for s in origin_stops]
     dest_ids = [s["id"] for s in dest_stops]
 
-    search_result = retriever.search_routes(origin_ids, dest_ids)
+    with stage("retrieve", RETRIEVE_TIMEOUT_SECONDS):
+        search_result = data.retriever.search_routes(origin_ids, dest_ids)
     context = format_route_context(search_result, origin_name, dest_name)
 
     reply = generate_response(
-        message, context, session.conversation_history[:-1]
+        message, context, session.conversation_history[:-1], intent="route_find"
     )
 
     return reply, search_result.get("routes", [])
 
 
-def _handle_bus_info(message: str, entities: dict) -> tuple[str, list]:
+def _handle_bus_info(data: DataState, message: str, entities: dict) -> tuple[str, list]:
     bus_number = entities.get("bus_number", "")
     if not bus_number:
-        return generate_response(message, "Avtobus nömrəsi göstərilməyib."), []
+        return generate_response(message, "Avtobus nömrəsi göstərilməyib.", intent="bus_info"), []
 
-    buses = retriever.find_bus_by_number(bus_number)
-    if not buses:
+    with stage("retrieve", RETRIEVE_TIMEOUT_SECONDS):
+        detail = data.retriever.get_bus_detail(bus_number)
+    if not detail:
         return f"#{bus_number} nömrəli avtobus tapılmadı.", []
 
-    bus = buses[0]
-    stops = retriever.get_bus_route_stops(bus["id"], direction=1)
-    stop_names = " → ".join(s["stopName"] for s in stops)
+    bus = detail["bus"]
+    direction_labels = {1: "gediş", 2: "qayıdış"}
+    stop_lines, seen = [], []
+    for d in detail["directions"]:
+        label = direction_labels.get(d["direction"], d["direction"])
+        names = [s["stopName"] for s in d["stops"]]
+        if any(names == prev[::-1] for prev in seen):
+            stop_lines.append(f"Dayanacaqlar ({label}): eyni, əks istiqamətdə")
+        else:
+            stop_lines.append(f"Dayanacaqlar ({label}, {len(names)}): " + compact_stop_list(names, message))
+        seen.append(names)
+    stop_lines = "\n".join(stop_lines)
 
     context = (
         f"Avtobus #{bus['number']} ({bus.get('carrier', '')})\n"
@@ -231,48 +356,55 @@ def _handle_bus_info(message: str, entities: dict) -> tuple[str, list]:
         f"Müddət: {bus.get('durationMinuts', '?')} dəqiqə\n"
         f"Qiymət: {bus.get('tariffStr', '?')}\n"
         f"Ödəniş: {bus.get('paymentType', '?')}\n"
-        f"Dayanacaqlar: {stop_names}"
+        f"{stop_lines}"
     )
 
-    reply = generate_response(message, context)
-    return reply, buses
+    reply = generate_response(message, context, intent="bus_info")
+    return reply, [bus]
 
 
-def _handle_stop_info(message: str, entities: dict) -> tuple[str, list]:
+def _handle_stop_info(data: DataState, message: str, entities: dict) -> tuple[str, list]:
     stop_name = entities.get("stop_name", entities.get("destination", ""))
     if not stop_name:
-        return generate_response(message, "Dayanacaq adı göstərilməyib."), []
+        return generate_response(message, "Dayanacaq adı göstərilməyib.", intent="stop_info"), []
 
-    stops = matcher.match(stop_name, limit=1)
+    with stage("match", MATCH_TIMEOUT_SECONDS):
+        stops = data.matcher.match(stop_name, limit=1)
     if not stops:
         return f"'{stop_name}' adlı dayanacaq tapılmadı.", []
 
-    detail = retriever.get_stop_detail(stops[0]["id"])
+    with stage("retrieve", RETRIEVE_TIMEOUT_SECONDS):
+        detail = data.retriever.get_stop_detail(stops[0]["id"])
     if not detail:
         return f"'{stop_name}' haqqında məlumat tapılmadı.", []
 
     buses = detail.get("buses", [])
-    bus_list = ", ".join(
+    bus_entries = list(dict.fromkeys(
         f"#{b['busNumber']} ({b['firstPoint']} → {b['lastPoint']})"
         for b in buses if b.get("busNumber")
-    )
+    ))
+    bus_list = ", ".join(bus_entries[:MAX_LISTED_BUSES])
+    if len(bus_entries) > MAX_LISTED_BUSES:
+        bus_list += f", +{len(bus_entries) - MAX_LISTED_BUSES} daha"
 
     context = (
         f"Dayanacaq: {detail['stopName']} (kod: {detail.get('stopCode', '')})\n"
         f"Koordinatlar: {detail.get('latitude')}, {detail.get('longitude')}\n"
         f"Transport qovşağı: {'Bəli' if detail.get('isTransportHub') else 'Xeyr'}\n"
-        f"Bu dayanacaqdan keçən avtobuslar: {bus_list}"
+        f"Marşrutun başlanğıc/son dayanacağı: {'Bəli' if detail.get('isTerminal') else 'Xeyr'}\n"
+        f"Bu dayanacaqdan keçən avtobuslar ({detail.get('busCount') or 0}): {bus_list}"
     )
 
-    reply = generate_response(message, context)
+    reply = generate_response(message, context, intent="stop_info")
     return reply, []
 
 
-def _handle_nearby_stops(session: Session, message: str) -> tuple[str, list]:
+def _handle_nearby_stops(data: DataState, session: Session, message: str) -> tuple[str, list]:
     if not session.has_location:
         return ask_for_location(), []
 
-    stops = retriever.find_nearest_stops(session.latitude, session.longitude)
+    with stage("retrieve", RETRIEVE_TIMEOUT_SECONDS):
+        stops = data.retriever.find_nearest_stops(session.latitude, session.longitude)
     if not stops:
         return "Yaxınlığınızda dayanacaq tapılmadı.", []
 
@@ -282,35 +414,137 @@ def _handle_nearby_stops(session: Session, message: str) -> tuple[str, list]:
     )
 
     context = f"İstifadəçinin yaxınlığındakı dayanacaqlar:\n{stop_list}"
-    reply = generate_response(message, context)
+    reply = generate_response(message, context, intent="nearby_stops")
     return reply, stops
 
 
 # ── Utility endpoints ───────────────────────────────
 
 @router.get("/api/stops")
-def all_stops():
-    stops = retriever.find_all_stops()
-    return {"stops": stops}
+def all_stops(request: Request):
+    return _data().stops_payload.response(request)
+
+
+@router.get("/api/stops/clusters")
+def stop_clusters(bbox: str, zoom: int):
+    """Clusters and stops visible in a viewport. bbox = 'minLng,minLat,maxLng,maxLat'."""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be minLng,minLat,maxLng,maxLat")
+    return _data().cluster_index.query(min_lng, min_lat, max_lng, max_lat, zoom)
 
 
 @router.get("/api/stops/nearby", response_model=NearbyStopsResponse)
 def nearby_stops(lat: float, lng: float, radius: int = 500):
-    stops = retriever.find_nearest_stops(lat, lng, radius=radius)
+    stops = _data().retriever.find_nearest_stops(lat, lng, radius=radius)
+    return NearbyStopsResponse(stops=stops)
+
+
+@router.get("/api/stops/nearby/buses", response_model=NearbyStopsResponse)
+def nearby_stops_with_buses(lat: float, lng: float, radius: int = 500, limit: int = 10):
+    """Nearest stops, each with the buses and directions serving it."""
+    stops = _data().retriever.find_nearest_stops_with_buses(
+        lat, lng, radius=radius, limit=limit
+    )
     return NearbyStopsResponse(stops=stops)
 
 
 @router.get("/api/stops/{stop_id}/buses")
 def buses_at_stop(stop_id: int):
-    buses = retriever.find_buses_at_stop(stop_id)
+    buses = _data().retriever.find_buses_at_stop(stop_id)
     return {"buses": buses}
 
 
 @router.get("/api/bus/{number}")
-def get_bus(number: str):
-    buses = retriever.find_bus_by_number(number)
-    if not buses:
+def get_bus(number: str, zoom: int | None = None):
+    detail = _data().retriever.get_bus_detail(number)
+    if not detail:
         raise HTTPException(status_code=404, detail="Bus not found")
-    bus = buses[0]
-    stops = retriever.get_bus_route_stops(bus["id"], direction=1)
-    return {"bus": bus, "stops": stops}
+
+    bus = detail["bus"]
+    level = shape_level_for_zoom(zoom)
+    directions = [
+        {
+            "direction": d["direction"],
+            "stops": d["stops"],
+            "polyline": d["shape"].get(level),
+        }
+        for d in detail["directions"]
+    ]
+    # "stops"/"shapes" keep the pre-existing response shape (direction 1 stops)
+    stops = directions[0]["stops"] if directions else []
+    shapes = [
+        {"busId": bus["id"], "direction": d["direction"], "polyline": d["polyline"]}
+        for d in directions if d["polyline"]
+    ]
+    return {"bus": bus, "stops": stops, "directions": directions, "shapes": shapes}
+
+
+@router.get("/api/stats")
+def stats():
+    """Request-coalescing counters: executed calls vs. waiters that shared a result."""
+    data = _data()
+    return {
+        "singleflight": {
+            "graph": data.retriever.flight.stats(),
+            "llm": generator.flight.stats(),
+        },
+        "llmGateway": gateway.stats(),
+        "contextTokens": context_stats.stats(),
+        "latencyBudget": budget_stats.stats(),
+        "admission": admission.stats(),
+        "tracing": tracer.stats(),
+        "stopsPayload": data.stops_payload.sizes(),
+    }
+
+
+# ── Data version / reload ───────────────────────────
+
+@router.get("/api/ready")
+def ready():
+    """Readiness probe with the startup timing report — 503 while warming up."""
+    report = startup.report()
+    if not startup.ready:
+        return JSONResponse(report, status_code=503, headers={"Retry-After": "5"})
+    return report
+
+
+@router.get("/api/version")
+def data_version():
+    """Active graph version, when it was loaded, and whether a reload is running."""
+    if reloader is None:
+        return {"version": None, "reloading": False, "lastError": startup.error}
+    return reloader.status()
+
+
+def _check_admin(x_admin_token: str | None):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/api/admin/reload", status_code=202)
+def reload_data(x_admin_token: str | None = Header(default=None)):
+    """Rebuild in-process indexes and caches in the background, then swap them in."""
+    _check_admin(x_admin_token)
+    _data()  # nothing to reload before the first load
+    started = reloader.reload_async("admin")
+    return {"started": started, **reloader.status()}
+
+
+@router.post("/api/admin/tracing")
+def configure_tracing(req: TracingSettings, x_admin_token: str | None = Header(default=None)):
+    """Change tracing and profiling settings at runtime; omitted fields are kept."""
+    _check_admin(x_admin_token)
+    try:
+        return tracer.configure(
+            exporter=req.exporter,
+            slow_seconds=req.slow_seconds,
+            sample_rate=req.sample_rate,
+            profile_mode=req.profile_mode,
+            profile_sample_rate=req.profile_sample_rate,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,186 @@
+"""Per-graph-version service state — built in the background, swapped in atomically."""
+
+import os
+import threading
+import time
+
+from conductor.api.payload import EncodedPayload, columnar_stops
+from conductor.config import SNAPSHOT_CLOSE_GRACE_SECONDS, SNAPSHOT_PATH, SNAPSHOT_URL
+from conductor.graph.client import Neo4jClient, ScopedClient
+from conductor.graph import queries
+from conductor.graph.retriever import GraphRetriever
+from conductor.graph.spatial import ClusterIndex
+from conductor.matching.fuzzy import StopMatcher
+from conductor.transit.snapshot import Snapshot, fetch_snapshot
+
+
+class DataState:
+    """
+    Everything derived from one graph version: retriever (with its snapshot and
+    caches), stop matcher, /api/stops payload and viewport cluster index.
+    Queries are pinned to the generation that was active when the state was
+    built. Never mutated after construction — a reload builds a new one.
+    """
+
+    def __init__(self, client: Neo4jClient):
+        start = time.perf_counter()
+        rows = client.run_query(queries.GRAPH_VERSION, {})
+        self.generation = rows[0].get("generation") if rows else None
+        scoped = ScopedClient(client, gen=self.generation)
+        self.retriever = GraphRetriever(scoped)
+        self.matcher = StopMatcher(scoped)
+        self.version = self.retriever.refresh_graph_version()
+
+        _download_snapshot()
+        self.snapshot_mtime = _mtime(SNAPSHOT_PATH)
+        t0 = time.perf_counter()
+        if self.retriever.use_snapshot(Snapshot.open(SNAPSHOT_PATH)):
+            print(
+                f"Snapshot {SNAPSHOT_PATH} mapped in {(time.perf_counter() - t0) * 1000:.1f}ms "
+                f"({self.retriever.snapshot.meta['stops']} stops)"
+            )
+
+        stops = self.retriever.find_all_stops()
+        self.stops_payload = EncodedPayload(columnar_stops(stops))
+        self.cluster_index = ClusterIndex(stops)
+        print(f"Stops payload: {len(stops)} stops, {self.stops_payload.sizes()} bytes")
+
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        self.build_seconds = round(time.perf_counter() - start, 3)
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "snapshot": self.retriever.snapshot is not None,
+            "loadedAt": self.loaded_at,
+            "buildSeconds": self.build_seconds,
+        }
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _download_snapshot() -> bool:
+    """Fetch a newer published snapshot (SNAPSHOT_URL); failures keep the local file."""
+    if not SNAPSHOT_URL:
+        return False
+    try:
+        if fetch_snapshot(SNAPSHOT_URL, SNAPSHOT_PATH):
+            print(f"Snapshot downloaded from {SNAPSHOT_URL}")
+            return True
+    except Exception as e:
+        print(f"Warning: snapshot download failed: {type(e).__name__}: {e}")
+    return False
+
+
+def _close_later(snapshot: Snapshot | None):
+    """Unmap a replaced snapshot once requests that still hold it have finished."""
+    if snapshot is None:
+        return
+    timer = threading.Timer(SNAPSHOT_CLOSE_GRACE_SECONDS, snapshot.close)
+    timer.daemon = True
+    timer.start()
+
+
+class Reloader:
+    """
+    Owns the active DataState. reload() builds a replacement off to the side and
+    swaps the reference in one assignment; requests that already hold the old
+    state finish on it, and its snapshot is unmapped after a grace period. An
+    optional watcher thread reloads when the snapshot file or the GraphMeta
+    version changes.
+    """
+
+    def __init__(self, client: Neo4jClient):
+        self.client = client
+        self.state: DataState | None = None
+        self.reloading = False
+        self.last_error: str | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def reload(self, reason: str = "manual") -> bool:
+        """Build and swap in a new state. False if one is already running or the build failed."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+        try:
+            print(f"Reloading data ({reason})...")
+            state = DataState(self.client)
+            previous, self.state = self.state, state
+            self.last_error = None
+            print(
+                f"Data version {previous.version if previous else None} → {state.version} "
+                f"in {state.build_seconds:.2f}s"
+            )
+            if previous is not None:
+                _close_later(previous.retriever.snapshot)
+            return True
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Reload failed, keeping current data: {self.last_error}")
+            if self.state is None:
+                raise
+            return False
+        finally:
+            self.reloading = False
+            self._lock.release()
+
+    def reload_async(self, reason: str = "manual") -> bool:
+        if self.reloading:
+            return False
+        threading.Thread(
+            target=self.reload, args=(reason,), name="data-reload", daemon=True
+        ).start()
+        return True
+
+    def changed(self) -> str | None:
+        """Why the active state is stale, or None."""
+        state = self.state
+        if state is None:
+            return "no data loaded"
+        if state.retriever.snapshot is None and _download_snapshot():
+            # The build publishes its snapshot after switching versions
+            return "snapshot published"
+        if _mtime(SNAPSHOT_PATH) != state.snapshot_mtime:
+            return "snapshot file changed"
+        rows = self.client.run_query(queries.GRAPH_VERSION, {})
+        version = rows[0]["version"] if rows else None
+        if version != state.version:
+            return f"graph version {version}"
+        return None
+
+    def start_watching(self, interval: float):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="data-watch", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                reason = self.changed()
+            except Exception as e:
+                print(f"Data watch check failed: {e}")
+                continue
+            if reason:
+                self.reload(reason)
+
+    def status(self) -> dict:
+        state = self.state
+        return {
+            **(state.describe() if state else {"version": None}),
+            "reloading": self.reloading,
+            "lastError": self.last_error,
+        }
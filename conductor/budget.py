@@ -0,0 +1,168 @@
+"""
+Per-request latency budgets.
+
+A chat request runs under one budget (CHAT_BUDGET_SECONDS) split into
+stages (parse, match, retrieve, generate), each with its own cap. The
+budget travels in a context variable, so the Neo4j client, the LLM gateway
+and single-flight waits size their timeouts from it without threading it
+through every call. Outside a request (scripts, warm-up) there is no budget
+and the usual fixed timeouts apply.
+
+When a stage runs out of time it raises DeadlineExceeded, and the pipeline
+falls back: local intent parse, cached or snapshot routes, templated reply.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from conductor.metrics import record_stage
+from conductor.tracing import span
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's latency budget (or the current stage's) is spent."""
+
+
+class Budget:
+    def __init__(self, seconds: float):
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+        self._stage_deadline: float | None = None
+        self.stage_name: str | None = None
+        self.stages: dict[str, float] = {}
+        self.fallbacks: list[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left in the current stage (or the whole request outside stages)."""
+        end = self.deadline if self._stage_deadline is None else self._stage_deadline
+        return end - time.monotonic()
+
+    def timeout(self, default: float) -> float:
+        """A call timeout that ends no later than the budget; raises if none is left."""
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded(f"no time left for {self.stage_name or 'request'}")
+        return min(default, left)
+
+    @contextmanager
+    def stage(self, name: str, seconds: float):
+        prev_deadline, prev_name = self._stage_deadline, self.stage_name
+        start = time.monotonic()
+        outer = self.deadline if prev_deadline is None else prev_deadline
+        self._stage_deadline = min(outer, start + seconds)
+        self.stage_name = name
+        try:
+            with span(name):
+                yield self
+        finally:
+            self._stage_deadline, self.stage_name = prev_deadline, prev_name
+            elapsed = time.monotonic() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            budget_stats.record_stage(name, elapsed)
+            record_stage(name, elapsed)
+
+    def fallback(self, stage: str):
+        """Note that `stage` was answered by its fallback."""
+        self.fallbacks.append(stage)
+        budget_stats.record_fallback(stage)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+_current: ContextVar[Budget | None] = ContextVar("budget", default=None)
+
+
+def current_budget() -> Budget | None:
+    return _current.get()
+
+
+@contextmanager
+def request_budget(seconds: float):
+    """Run the enclosed block under a fresh budget of `seconds`."""
+    budget = Budget(seconds)
+    token = _current.set(budget)
+    exceeded = False
+    try:
+        yield budget
+    except DeadlineExceeded:
+        exceeded = True
+        raise
+    finally:
+        # A caller that catches DeadlineExceeded itself marks it as the "request" fallback
+        budget_stats.record_request(budget, exceeded or "request" in budget.fallbacks)
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str, seconds: float):
+    """Budget.stage() on the current budget; a no-op outside a request."""
+    budget = _current.get()
+    if budget is None:
+        yield None
+        return
+    with budget.stage(name, seconds):
+        yield budget
+
+
+def call_timeout(default: float) -> float:
+    """Timeout for one outbound call: `default`, capped by the current budget."""
+    budget = _current.get()
+    return default if budget is None else budget.timeout(default)
+
+
+def time_left() -> float | None:
+    """Seconds left in the current budget, or None outside a request."""
+    budget = _current.get()
+    return None if budget is None else budget.remaining()
+
+
+class BudgetStats:
+    """Process-wide counters: requests, overruns, fallbacks and per-stage latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.exceeded = 0
+        self.max_seconds = 0.0
+        self.fallbacks: dict[str, int] = {}
+        self._stages: dict[str, list] = {}  # name → [count, total, max]
+
+    def record_stage(self, name: str, seconds: float):
+        with self._lock:
+            s = self._stages.setdefault(name, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+
+    def record_fallback(self, stage: str):
+        with self._lock:
+            self.fallbacks[stage] = self.fallbacks.get(stage, 0) + 1
+
+    def record_request(self, budget: Budget, exceeded: bool):
+        with self._lock:
+            self.requests += 1
+            self.exceeded += exceeded
+            self.max_seconds = max(self.max_seconds, budget.elapsed())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "exceeded": self.exceeded,
+                "maxSeconds": round(self.max_seconds, 3),
+                "fallbacks": dict(self.fallbacks),
+                "stages": {
+                    name: {
+                        "count": n,
+                        "avgMs": round(total / n * 1000, 1),
+                        "maxMs": round(peak * 1000, 1),
+                    }
+                    for name, (n, total, peak) in self._stages.items()
+                },
+            }
+
+
+budget_stats = BudgetStats()
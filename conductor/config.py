@@ -9,16 +9,89 @@ NEO4J_HTTP_URL = os.getenv("NEO4J_HTTP_URL", "")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+# Per-query HTTP timeout outside chat requests (scripts, warm-up); chat queries use their budget
+NEO4J_TIMEOUT_SECONDS = float(os.getenv("NEO4J_TIMEOUT_SECONDS", "120"))
+# build_graph.py: concurrent write batches and the per-batch latency the sizer aims for
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+INGEST_TARGET_BATCH_SECONDS = float(os.getenv("INGEST_TARGET_BATCH_SECONDS", "2.0"))
+# scripts/busDetails.py: AYNA API root (point at a local stub for testing) and parallel requests
+AYNA_API_URL = os.getenv("AYNA_API_URL", "https://map-api.ayna.gov.az").rstrip("/")
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+# Resolve stop names with the Lucene full-text index in one query (needs build_graph's index)
+STOP_SEARCH_FULLTEXT = os.getenv("STOP_SEARCH_FULLTEXT", "").lower() in ("1", "true", "yes")
+
+# Binary transit snapshot written by build_graph.py and memory-mapped by the API
+SNAPSHOT_PATH = os.getenv(
+    "SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "transit.snap"),
+)
+# Where deployments without the build output download the snapshot from (empty = local file only)
+SNAPSHOT_URL = os.getenv("SNAPSHOT_URL", "")
+# Poll the snapshot file and GraphMeta version every N seconds and hot-reload on change (0 = off)
+RELOAD_WATCH_SECONDS = float(os.getenv("RELOAD_WATCH_SECONDS", "60"))
+# After a reload swaps in a new snapshot, keep the old one mapped this long for in-flight requests
+SNAPSHOT_CLOSE_GRACE_SECONDS = float(os.getenv("SNAPSHOT_CLOSE_GRACE_SECONDS", "60"))
+# Enables POST /api/admin/reload (sent as X-Admin-Token); empty disables the endpoint
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # LLM
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.5-flash")
+# LLM gateway: backend ("gemini", or "stub" for the local server in conductor/llm/stub.py),
+# concurrent calls across the process, and per-call timeout
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8099")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+# Cache the static system prompts provider-side (falls back to inline when unsupported)
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "true").lower() in ("1", "true", "yes")
+LLM_PROMPT_CACHE_TTL_SECONDS = int(os.getenv("LLM_PROMPT_CACHE_TTL_SECONDS", "3600"))
+
+# Chat latency budget: the whole request, and the cap for each stage within it.
+# A stage that runs out falls back (local parse, cached/snapshot routes, templated reply).
+CHAT_BUDGET_SECONDS = float(os.getenv("CHAT_BUDGET_SECONDS", "15"))
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "4"))
+MATCH_TIMEOUT_SECONDS = float(os.getenv("MATCH_TIMEOUT_SECONDS", "3"))
+RETRIEVE_TIMEOUT_SECONDS = float(os.getenv("RETRIEVE_TIMEOUT_SECONDS", "5"))
+GENERATE_TIMEOUT_SECONDS = float(os.getenv("GENERATE_TIMEOUT_SECONDS", "10"))
+
+# Chat admission control: per-session and per-client-IP token buckets (0 = no limit),
+# sized to stop scripted floods, not a user sending quick follow-ups; and at most
+# CHAT_MAX_IN_FLIGHT turns at once with CHAT_MAX_QUEUE more waiting up to
+# CHAT_QUEUE_TIMEOUT_SECONDS. Keep in-flight + queue below the worker threadpool (40).
+CHAT_SESSION_RATE_PER_MINUTE = float(os.getenv("CHAT_SESSION_RATE_PER_MINUTE", "20"))
+CHAT_SESSION_BURST = int(os.getenv("CHAT_SESSION_BURST", "20"))
+CHAT_IP_RATE_PER_MINUTE = float(os.getenv("CHAT_IP_RATE_PER_MINUTE", "60"))
+CHAT_IP_BURST = int(os.getenv("CHAT_IP_BURST", "40"))
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "16"))
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "5"))
+# Reverse proxies in front of the app that append to X-Forwarded-For (Render: 1). The
+# client IP is the hop they saw; entries left of it are client-supplied and ignored.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+# Tracing: spans around the chat pipeline, exported only for turns slower than
+# TRACE_SLOW_SECONDS (plus a TRACE_SAMPLE_RATE fraction of the rest).
+# Exporter: "none" (spans are not recorded), "log" (printed as a tree) or "otlp"
+# (OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local OpenTelemetry collector)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "conductor")
+# Profile a PROFILE_SAMPLE_RATE fraction of traced chat turns ("off", "cprofile" or
+# "tracemalloc"); the capture is written to PROFILE_DIR only if the turn is slow
+PROFILE_MODE = os.getenv("PROFILE_MODE", "off").lower()
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/conductor-profiles")
 
 # App
 APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
 APP_PORT = int(os.getenv("APP_PORT", "8000"))
 DISABLE_SSL_VERIFY = os.getenv("DISABLE_SSL_VERIFY", "").lower() in ("1", "true", "yes")
 DEFAULT_SEARCH_RADIUS_METERS = int(os.getenv("DEFAULT_SEARCH_RADIUS_METERS", "500"))
+MAX_SEARCH_RADIUS_METERS = int(os.getenv("MAX_SEARCH_RADIUS_METERS", "2000"))
 TRANSFER_MAX_DISTANCE_METERS = int(os.getenv("TRANSFER_MAX_DISTANCE_METERS", "300"))
+WALKING_SPEED_METERS_PER_MIN = float(os.getenv("WALKING_SPEED_METERS_PER_MIN", "72"))
 MAX_TRANSFER_COUNT = int(os.getenv("MAX_TRANSFER_COUNT", "2"))
 DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "az")
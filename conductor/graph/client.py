@@ -1,13 +1,32 @@
 """Neo4j client — uses HTTP Query API v2 (port 443) to bypass corporate firewalls."""
 
+import time
+
 import requests
 import urllib3
 from base64 import b64encode
-from conductor.config import NEO4J_HTTP_URL, NEO4J_USERNAME, NEO4J_PASSWORD, DISABLE_SSL_VERIFY
+from conductor.budget import DeadlineExceeded, current_budget
+from conductor.graph import queries
+from conductor.metrics import record_query
+from conductor.tracing import span
+from conductor.config import (
+    NEO4J_HTTP_URL, NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_TIMEOUT_SECONDS, DISABLE_SSL_VERIFY,
+)
 
 if DISABLE_SSL_VERIFY:
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Query text → template name, so metrics are tagged "BUS_DETAIL" rather than by Cypher text
+_QUERY_NAMES = {
+    text: name for name, text in vars(queries).items()
+    if name.isupper() and isinstance(text, str)
+}
+
+
+def query_name(query: str) -> str:
+    """The queries.py template name for `query`, or "other" (writer batches, ad-hoc Cypher)."""
+    return _QUERY_NAMES.get(query, "other")
+
 
 class Neo4jClient:
     def __init__(self):
@@ -19,9 +38,14 @@ class Neo4jClient:
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
+        # Keep-alive pool so concurrent requests reuse TLS connections
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def close(self):
-        pass  # HTTP is stateless, nothing to close
+        self._session.close()
 
     def verify_connectivity(self):
         result = self._execute("RETURN 1 AS n")
@@ -31,18 +55,40 @@ class Neo4jClient:
             raise ConnectionError(f"Failed to connect to Neo4j at {self._url}")
 
     def _execute(self, query: str, parameters: dict = None) -> list[dict] | None:
-        """Execute a Cypher query via the HTTP Query API v2."""
+        """Execute a Cypher query via the HTTP Query API v2, recording its latency, rows and bytes."""
+        name = query_name(query)
+        with span("neo4j.query", query=name) as s:
+            start = time.perf_counter()
+            try:
+                result, nbytes = self._post(query, parameters)
+            except Exception:
+                record_query(name, time.perf_counter() - start, error=True)
+                raise
+            record_query(name, time.perf_counter() - start, len(result), nbytes)
+            s.set("rows", len(result))
+            s.set("bytes", nbytes)
+        return result
+
+    def _post(self, query: str, parameters: dict | None) -> tuple[list[dict], int]:
         payload = {"statement": query}
         if parameters:
             payload["parameters"] = parameters
 
-        resp = requests.post(
-            self._url,
-            json=payload,
-            headers=self._headers,
-            timeout=120,
-            verify=not DISABLE_SSL_VERIFY,
-        )
+        # Inside a chat request the timeout ends with its latency budget
+        budget = current_budget()
+        timeout = budget.timeout(NEO4J_TIMEOUT_SECONDS) if budget else NEO4J_TIMEOUT_SECONDS
+        try:
+            resp = self._session.post(
+                self._url,
+                json=payload,
+                headers=self._headers,
+                timeout=timeout,
+                verify=not DISABLE_SSL_VERIFY,
+            )
+        except requests.Timeout as e:
+            if budget is None:
+                raise
+            raise DeadlineExceeded(f"Neo4j query timed out after {timeout:.1f}s") from e
 
         if resp.status_code != 200 and resp.status_code != 202:
             error_msg = resp.text[:500]
@@ -63,7 +109,7 @@ class Neo4jClient:
         rows = data.get("values", [])
 
         if not fields:
-            return []
+            return [], len(resp.content)
 
         # Convert to list of dicts
         result = []
@@ -73,7 +119,7 @@ class Neo4jClient:
                 record[field] = _extract_value(row[i]) if i < len(row) else None
             result.append(record)
 
-        return result
+        return result, len(resp.content)
 
     def run_query(self, query: str, parameters: dict = None) -> list[dict]:
         result = self._execute(query, parameters)
@@ -89,6 +135,23 @@ class Neo4jClient:
         self.close()
 
 
+class ScopedClient:
+    """
+    A view of a Neo4jClient that adds fixed parameters to every query —
+    used to pin readers and writers to one graph generation ($gen).
+    """
+
+    def __init__(self, client: Neo4jClient, **params):
+        self.client = client
+        self.params = params
+
+    def run_query(self, query: str, parameters: dict = None) -> list[dict]:
+        return self.client.run_query(query, {**self.params, **(parameters or {})})
+
+    def run_write(self, query: str, parameters: dict = None):
+        return self.client.run_write(query, {**self.params, **(parameters or {})})
+
+
 def _extract_value(val):
     """Recursively extract values from Neo4j HTTP API v2 response format."""
     if isinstance(val, dict):
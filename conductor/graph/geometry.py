@@ -0,0 +1,112 @@
+"""Route geometry — Douglas–Peucker simplification and encoded polylines."""
+
+from math import cos, radians
+
+_METERS_PER_DEG = 111_320.0
+
+# Simplification tolerances (meters) stored per route shape
+SHAPE_TOLERANCES = {
+    "fine": 3.0,
+    "medium": 15.0,
+    "coarse": 60.0,
+}
+
+
+def shape_level_for_zoom(zoom: int | None) -> str:
+    """Pick the coarsest tolerance that stays under ~1 screen pixel at this zoom."""
+    if zoom is None or zoom >= 15:
+        return "fine"
+    if zoom >= 12:
+        return "medium"
+    return "coarse"
+
+
+def simplify(points: list[tuple[float, float]], tolerance: float) -> list[tuple[float, float]]:
+    """
+    Douglas–Peucker simplification of (lat, lng) points with a tolerance in meters.
+    Uses a local equirectangular projection — accurate to well under a meter at city scale.
+    """
+    n = len(points)
+    if n < 3:
+        return list(points)
+
+    kx = _METERS_PER_DEG * cos(radians(points[0][0]))
+    ky = _METERS_PER_DEG
+    xy = [(lng * kx, lat * ky) for lat, lng in points]
+    tol_sq = tolerance * tolerance
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        seg_sq = dx * dx + dy * dy
+
+        max_sq, index = 0.0, -1
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if seg_sq == 0:
+                d_sq = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                t = ((px - ax) * dx + (py - ay) * dy) / seg_sq
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                d_sq = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+            if d_sq > max_sq:
+                max_sq, index = d_sq, i
+
+        if max_sq > tol_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def encode_polyline(points: list[tuple[float, float]], precision: int = 5) -> str:
+    """Encode (lat, lng) points with Google's encoded polyline algorithm."""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * factor), round(lng * factor)
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> list[tuple[float, float]]:
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def encode_shape_levels(points: list[tuple[float, float]]) -> dict[str, str]:
+    """Simplify a path at every SHAPE_TOLERANCES level and encode each result."""
+    return {
+        level: encode_polyline(simplify(points, tol))
+        for level, tol in SHAPE_TOLERANCES.items()
+    }
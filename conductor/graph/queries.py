@@ -1,10 +1,16 @@
-"""Cypher query templates for the Conductor Graph RAG."""
+"""
+Cypher query templates for the Conductor Graph RAG.
+
+Every node belongs to a graph generation (`gen` property). Queries anchor on
+$gen — supplied by the ScopedClient the API builds for the active generation —
+and relationships never cross generations, so traversals stay inside it.
+"""
 
 # ── Stop lookups ──────────────────────────────────────
 
 FIND_STOPS_BY_NAME = """
 MATCH (s:Stop)
-WHERE s.nameNormalized CONTAINS $name
+WHERE s.gen = $gen AND s.nameNormalized CONTAINS $name
 RETURN s.id AS id, s.name AS name, s.code AS code,
        s.latitude AS latitude, s.longitude AS longitude,
        s.isTransportHub AS isTransportHub
@@ -12,10 +18,22 @@ ORDER BY s.isTransportHub DESC, s.name
 LIMIT $limit
 """
 
+# Lucene full-text search over name / nameNormalized / nameAscii.
+# $query is built by StopMatcher from all input variants (fuzzy ~ and prefix * terms).
+FIND_STOPS_FULLTEXT = """
+CALL db.index.fulltext.queryNodes("stop_name_fulltext", $query) YIELD node AS s, score
+WHERE s.gen = $gen
+RETURN s.id AS id, s.name AS name, s.code AS code,
+       s.latitude AS latitude, s.longitude AS longitude,
+       s.isTransportHub AS isTransportHub, score
+ORDER BY score DESC, s.isTransportHub DESC
+LIMIT $limit
+"""
+
 FIND_NEAREST_STOPS = """
 WITH point({latitude: $lat, longitude: $lng}) AS userLoc
 MATCH (s:Stop)
-WHERE s.location IS NOT NULL
+WHERE s.gen = $gen AND s.location IS NOT NULL
 WITH s, point.distance(s.location, userLoc) AS dist
 WHERE dist <= $radius
 RETURN s.id AS id, s.name AS name, s.code AS code,
@@ -25,8 +43,26 @@ ORDER BY dist
 LIMIT $limit
 """
 
-FIND_ALL_STOPS = """
+# Nearest stops plus the buses serving each — reads the per-stop summary arrays
+FIND_NEAREST_STOPS_WITH_BUSES = """
+WITH point({latitude: $lat, longitude: $lng}) AS userLoc
 MATCH (s:Stop)
+WHERE s.gen = $gen AND s.location IS NOT NULL
+WITH s, point.distance(s.location, userLoc) AS dist
+WHERE dist <= $radius
+RETURN s.id AS id, s.name AS name, s.code AS code,
+       s.latitude AS latitude, s.longitude AS longitude,
+       s.isTransportHub AS isTransportHub,
+       round(dist, 1) AS distanceMeters,
+       s.busIds AS busIds, s.busNumbers AS busNumbers,
+       s.busDirections AS busDirections,
+       s.busFirstPoints AS busFirstPoints, s.busLastPoints AS busLastPoints
+ORDER BY dist
+LIMIT $limit
+"""
+
+FIND_ALL_STOPS = """
+MATCH (s:Stop {gen: $gen})
 WHERE s.latitude IS NOT NULL AND s.longitude IS NOT NULL
 RETURN s.id AS id, s.name AS name, s.code AS code,
        s.latitude AS latitude, s.longitude AS longitude,
@@ -37,7 +73,7 @@ ORDER BY s.name
 # ── Bus lookups ───────────────────────────────────────
 
 FIND_BUS_BY_NUMBER = """
-MATCH (b:Bus)
+MATCH (b:Bus {gen: $gen})
 WHERE b.number = $number
 RETURN b.id AS id, b.number AS number, b.carrier AS carrier,
        b.firstPoint AS firstPoint, b.lastPoint AS lastPoint,
@@ -45,19 +81,45 @@ RETURN b.id AS id, b.number AS number, b.carrier AS carrier,
        b.tariffStr AS tariffStr, b.paymentType AS paymentType
 """
 
+# One round trip: bus metadata + ordered stops and geometry for every direction
+BUS_DETAIL = """
+MATCH (b:Bus {numberNormalized: $number, gen: $gen})
+WITH b ORDER BY b.id LIMIT 1
+OPTIONAL MATCH (b)-[h:HAS_STOP]->(s:Stop)
+WITH b, h, s ORDER BY h.direction, h.order
+WITH b, h.direction AS direction,
+     collect({
+         stopId: s.id, stopName: s.name, stopCode: s.code,
+         latitude: s.latitude, longitude: s.longitude,
+         stopOrder: h.order, distance: h.distanceFromStart
+     }) AS stops
+OPTIONAL MATCH (r:RouteShape {busId: b.id, direction: direction, gen: $gen})
+WITH b, collect({
+         direction: direction,
+         stops: stops,
+         shape: r {.fine, .medium, .coarse}
+     }) AS directions
+RETURN b {.id, .number, .carrier, .firstPoint, .lastPoint, .routLength,
+          .durationMinuts, .tariffStr, .paymentType} AS bus,
+       directions
+"""
+
+# Per-stop bus summaries are precomputed by build_graph as parallel arrays
+# (one entry per bus + direction) — a single indexed node read, no expansion.
 FIND_BUSES_AT_STOP = """
-MATCH (b:Bus)-[:HAS_STOP]->(s:Stop {id: $stopId})
-RETURN DISTINCT b.id AS id, b.number AS number, b.carrier AS carrier,
-       b.firstPoint AS firstPoint, b.lastPoint AS lastPoint,
-       b.tariffStr AS tariffStr, b.paymentType AS paymentType
-ORDER BY b.number
+MATCH (s:Stop {id: $stopId, gen: $gen})
+RETURN s.busIds AS busIds, s.busNumbers AS busNumbers,
+       s.busDirections AS busDirections, s.busCarriers AS busCarriers,
+       s.busFirstPoints AS busFirstPoints, s.busLastPoints AS busLastPoints,
+       s.busTariffs AS busTariffs, s.busPaymentTypes AS busPaymentTypes
 """
 
 # ── Direct route finding ─────────────────────────────
 
 FIND_DIRECT_ROUTES = """
 MATCH (origin:Stop)<-[h1:HAS_STOP]-(bus:Bus)-[h2:HAS_STOP]->(dest:Stop)
-WHERE origin.id IN $originIds
+WHERE origin.gen = $gen
+  AND origin.id IN $originIds
   AND dest.id IN $destIds
   AND h1.direction = h2.direction
   AND h1.order < h2.order
@@ -78,17 +140,18 @@ FIND_ONE_TRANSFER_ROUTES = """
 MATCH (origin:Stop)<-[h1:HAS_STOP]-(bus1:Bus)-[h2:HAS_STOP]->(ts1:Stop)
 MATCH (ts1)-[t:TRANSFER]->(ts2:Stop)
 MATCH (ts2)<-[h3:HAS_STOP]-(bus2:Bus)-[h4:HAS_STOP]->(dest:Stop)
-WHERE origin.id IN $originIds
+WHERE origin.gen = $gen
+  AND origin.id IN $originIds
   AND dest.id IN $destIds
   AND bus1.id <> bus2.id
   AND h1.direction = h2.direction
   AND h1.order < h2.order
   AND h3.direction = h4.direction
   AND h3.order < h4.order
-RETURN bus1.number AS bus1Number, bus1.carrier AS bus1Carrier,
-       bus1.tariffStr AS bus1Tariff,
-       bus2.number AS bus2Number, bus2.carrier AS bus2Carrier,
-       bus2.tariffStr AS bus2Tariff,
+RETURN bus1.id AS bus1Id, bus1.number AS bus1Number, bus1.carrier AS bus1Carrier,
+       bus1.tariffStr AS bus1Tariff, h1.direction AS bus1Direction,
+       bus2.id AS bus2Id, bus2.number AS bus2Number, bus2.carrier AS bus2Carrier,
+       bus2.tariffStr AS bus2Tariff, h3.direction AS bus2Direction,
        origin.name AS originStopName,
        ts1.name AS transferStop1Name,
        ts2.name AS transferStop2Name,
@@ -103,27 +166,41 @@ LIMIT $limit
 # ── Stop details with all buses ──────────────────────
 
 STOP_DETAIL = """
-MATCH (s:Stop {id: $stopId})
-OPTIONAL MATCH (b:Bus)-[h:HAS_STOP]->(s)
+MATCH (s:Stop {id: $stopId, gen: $gen})
 RETURN s.id AS stopId, s.name AS stopName, s.code AS stopCode,
        s.latitude AS latitude, s.longitude AS longitude,
        s.isTransportHub AS isTransportHub,
-       collect(DISTINCT {
-           busNumber: b.number,
-           busId: b.id,
-           carrier: b.carrier,
-           firstPoint: b.firstPoint,
-           lastPoint: b.lastPoint,
-           direction: h.direction
-       }) AS buses
+       s.busCount AS busCount, s.isTerminal AS isTerminal,
+       s.busIds AS busIds, s.busNumbers AS busNumbers,
+       s.busDirections AS busDirections, s.busCarriers AS busCarriers,
+       s.busFirstPoints AS busFirstPoints, s.busLastPoints AS busLastPoints,
+       s.busTariffs AS busTariffs, s.busPaymentTypes AS busPaymentTypes
 """
 
 # ── Bus route stops (ordered) ────────────────────────
 
 BUS_ROUTE_STOPS = """
-MATCH (b:Bus {id: $busId})-[h:HAS_STOP {direction: $direction}]->(s:Stop)
+MATCH (b:Bus {id: $busId, gen: $gen})-[h:HAS_STOP {direction: $direction}]->(s:Stop)
 RETURN s.id AS stopId, s.name AS stopName, s.code AS stopCode,
        s.latitude AS latitude, s.longitude AS longitude,
        h.order AS stopOrder, h.distanceFromStart AS distance
 ORDER BY h.order
 """
+
+# ── Route geometry (encoded polylines) ───────────────
+# $level is one of geometry.SHAPE_TOLERANCES: "fine" | "medium" | "coarse"
+
+ROUTE_SHAPES_FOR_BUSES = """
+MATCH (r:RouteShape)
+WHERE r.gen = $gen AND r.busId IN $busIds
+RETURN r.busId AS busId, r.direction AS direction, r[$level] AS polyline
+"""
+
+# ── Graph metadata ───────────────────────────────────
+
+# `generation` is the active-version pointer flipped by a blue/green rebuild;
+# `version` also changes on incremental updates (cache invalidation).
+GRAPH_VERSION = """
+OPTIONAL MATCH (m:GraphMeta {key: "active"})
+RETURN m.version AS version, m.generation AS generation
+"""
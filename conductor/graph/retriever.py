@@ -1,58 +1,261 @@
 """Graph retriever — translates parsed intents into graph queries and returns context."""
 
-from conductor.graph.client import Neo4jClient
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from conductor.graph.client import Neo4jClient, ScopedClient
 from conductor.graph import queries
-from conductor.config import DEFAULT_SEARCH_RADIUS_METERS
+from conductor.graph.geometry import shape_level_for_zoom
+from conductor.matching.transliterate import normalize_bus_number
+from conductor.budget import DeadlineExceeded, current_budget
+from conductor.config import DEFAULT_SEARCH_RADIUS_METERS, MAX_SEARCH_RADIUS_METERS
+from conductor.singleflight import SingleFlight, make_key
+from conductor.transit.snapshot import Snapshot
+
+
+# search_routes results kept per graph version (LRU)
+ROUTE_CACHE_SIZE = 2048
+
+_SUMMARY_FIELDS = (
+    "busIds", "busNumbers", "busDirections", "busCarriers",
+    "busFirstPoints", "busLastPoints", "busTariffs", "busPaymentTypes",
+)
+
+
+def _radius(radius: int | None) -> int:
+    """Requested radius, defaulted and capped — it comes from the query string."""
+    return min(radius or DEFAULT_SEARCH_RADIUS_METERS, MAX_SEARCH_RADIUS_METERS)
+
+
+def _summary_entries(row: dict) -> list[dict]:
+    """Unpack a stop's parallel bus-summary arrays into one dict per bus + direction."""
+    ids = row.get("busIds") or []
+    cols = {f: row.get(f) or [None] * len(ids) for f in _SUMMARY_FIELDS}
+    return [
+        {
+            "id": ids[i],
+            "number": cols["busNumbers"][i],
+            "direction": cols["busDirections"][i],
+            "carrier": cols["busCarriers"][i],
+            "firstPoint": cols["busFirstPoints"][i],
+            "lastPoint": cols["busLastPoints"][i],
+            "tariffStr": cols["busTariffs"][i],
+            "paymentType": cols["busPaymentTypes"][i],
+        }
+        for i in range(len(ids))
+    ]
+
+
+def _strip_summary(row: dict) -> dict:
+    return {k: v for k, v in row.items() if k not in _SUMMARY_FIELDS}
+
+
+def _coalesced(method):
+    """Share one in-flight graph query between identical concurrent calls."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = make_key(method.__name__, *args, **kwargs)
+        return self.flight.do(key, method, self, *args, **kwargs)
+    return wrapper
 
 
 class GraphRetriever:
-    def __init__(self, client: Neo4jClient):
+    def __init__(self, client: Neo4jClient | ScopedClient):
         self.client = client
+        self.flight = SingleFlight()
+        self.graph_version: str | None = None
+        self.snapshot: Snapshot | None = None
+        self._bus_cache: dict[str, dict] = {}
+        self._route_cache: OrderedDict = OrderedDict()
+        self._route_lock = threading.Lock()
+
+    # ── Graph version ────────────────────────────────
+
+    def refresh_graph_version(self) -> str | None:
+        """Read the active graph version; drop per-version caches if it changed."""
+        rows = self.client.run_query(queries.GRAPH_VERSION, {})
+        version = rows[0]["version"] if rows else None
+        if version != self.graph_version:
+            self._bus_cache = {}
+            with self._route_lock:
+                self._route_cache = OrderedDict()
+            self.graph_version = version
+        return version
+
+    def use_snapshot(self, snapshot: Snapshot | None) -> bool:
+        """
+        Serve stop and stop-sequence lookups from a memory-mapped snapshot.
+        Only accepted when it was built for the active graph version.
+        """
+        if snapshot is not None and snapshot.graph_version != self.graph_version:
+            print(
+                f"Snapshot version {snapshot.graph_version} != graph version "
+                f"{self.graph_version}; querying Neo4j instead."
+            )
+            snapshot.close()
+            snapshot = None
+        self.snapshot = snapshot
+        return snapshot is not None
 
     # ── Stop resolution ──────────────────────────────
 
+    @_coalesced
     def find_all_stops(self) -> list[dict]:
+        if self.snapshot is not None:
+            return self.snapshot.all_stops()
         return self.client.run_query(queries.FIND_ALL_STOPS, {})
 
+    @_coalesced
     def find_stops_by_name(self, name: str, limit: int = 5) -> list[dict]:
         normalized = name.strip().lower()
+        if self.snapshot is not None:
+            return self.snapshot.stops_by_name(normalized, limit)
         return self.client.run_query(
             queries.FIND_STOPS_BY_NAME,
             {"name": normalized, "limit": limit},
         )
 
+    @_coalesced
     def find_nearest_stops(
         self, lat: float, lng: float, radius: int = None, limit: int = 10
     ) -> list[dict]:
+        if self.snapshot is not None:
+            return self.snapshot.nearest_stops(lat, lng, _radius(radius), limit)
         return self.client.run_query(
             queries.FIND_NEAREST_STOPS,
             {
                 "lat": lat,
                 "lng": lng,
-                "radius": radius or DEFAULT_SEARCH_RADIUS_METERS,
+                "radius": _radius(radius),
+                "limit": limit,
+            },
+        )
+
+    @_coalesced
+    def find_nearest_stops_with_buses(
+        self, lat: float, lng: float, radius: int = None, limit: int = 10
+    ) -> list[dict]:
+        rows = self.client.run_query(
+            queries.FIND_NEAREST_STOPS_WITH_BUSES,
+            {
+                "lat": lat,
+                "lng": lng,
+                "radius": _radius(radius),
                 "limit": limit,
             },
         )
+        stops = []
+        for row in rows:
+            buses: dict[int, dict] = {}
+            for e in _summary_entries(row):
+                bus = buses.setdefault(e["id"], {
+                    "id": e["id"],
+                    "number": e["number"],
+                    "firstPoint": e["firstPoint"],
+                    "lastPoint": e["lastPoint"],
+                    "directions": [],
+                })
+                bus["directions"].append(e["direction"])
+            stops.append({**_strip_summary(row), "buses": list(buses.values())})
+        return stops
 
     # ── Bus lookups ──────────────────────────────────
 
+    @_coalesced
     def find_bus_by_number(self, number: str) -> list[dict]:
         return self.client.run_query(
             queries.FIND_BUS_BY_NUMBER, {"number": number}
         )
 
+    def get_bus_detail(self, number: str) -> dict | None:
+        """
+        Bus metadata plus ordered stops and route shapes for all directions,
+        from one query. Cached per graph version; '108a' and '108A' share an entry.
+        """
+        key = normalize_bus_number(number)
+        detail = self._bus_cache.get(key)
+        if detail is None:
+            detail = self._fetch_bus_detail(key)
+            if detail is not None:
+                self._bus_cache[key] = detail
+        return detail
+
+    @_coalesced
+    def _fetch_bus_detail(self, number: str) -> dict | None:
+        rows = self.client.run_query(queries.BUS_DETAIL, {"number": number})
+        if not rows:
+            return None
+        directions = [
+            {
+                "direction": d["direction"],
+                "stops": d["stops"],
+                "shape": d.get("shape") or {},
+            }
+            for d in rows[0]["directions"]
+            if d.get("direction") is not None
+        ]
+        directions.sort(key=lambda d: d["direction"])
+        return {"bus": rows[0]["bus"], "directions": directions}
+
+    @_coalesced
     def find_buses_at_stop(self, stop_id: int) -> list[dict]:
-        return self.client.run_query(
+        rows = self.client.run_query(
             queries.FIND_BUSES_AT_STOP, {"stopId": stop_id}
         )
+        if not rows:
+            return []
+        buses = {}
+        for e in _summary_entries(rows[0]):
+            if e["id"] not in buses:
+                buses[e["id"]] = {k: v for k, v in e.items() if k != "direction"}
+        return list(buses.values())
 
+    @_coalesced
     def get_bus_route_stops(self, bus_id: int, direction: int = 1) -> list[dict]:
+        if self.snapshot is not None:
+            stops = self.snapshot.bus_route_stops(bus_id, direction)
+            if stops is not None:
+                return stops
         return self.client.run_query(
             queries.BUS_ROUTE_STOPS, {"busId": bus_id, "direction": direction}
         )
 
+    # ── Route geometry ───────────────────────────────
+
+    def get_route_shapes(self, routes: list[dict], zoom: int | None = None) -> list[dict]:
+        """Encoded polylines for every (bus, direction) used by route_find results."""
+        legs = []
+        for r in routes:
+            if "busId" in r:
+                legs.append((r["busId"], r.get("busNumber"), r.get("direction")))
+            if "bus1Id" in r:
+                legs.append((r["bus1Id"], r.get("bus1Number"), r.get("bus1Direction")))
+                legs.append((r["bus2Id"], r.get("bus2Number"), r.get("bus2Direction")))
+        legs = list(dict.fromkeys(legs))
+        if not legs:
+            return []
+
+        rows = self._find_shapes_for_buses(
+            sorted({bus_id for bus_id, _, _ in legs}), shape_level_for_zoom(zoom)
+        )
+        by_leg = {(r["busId"], r["direction"]): r["polyline"] for r in rows}
+        return [
+            {"busId": bus_id, "busNumber": number, "direction": direction,
+             "polyline": by_leg[(bus_id, direction)]}
+            for bus_id, number, direction in legs
+            if by_leg.get((bus_id, direction))
+        ]
+
+    @_coalesced
+    def _find_shapes_for_buses(self, bus_ids: list[int], level: str) -> list[dict]:
+        return self.client.run_query(
+            queries.ROUTE_SHAPES_FOR_BUSES, {"busIds": bus_ids, "level": level}
+        )
+
     # ── Route finding ────────────────────────────────
 
+    @_coalesced
     def find_direct_routes(
         self, origin_ids: list[int], dest_ids: list[int], limit: int = 5
     ) -> list[dict]:
@@ -61,6 +264,7 @@ class GraphRetriever:
             {"originIds": origin_ids, "destIds": dest_ids, "limit": limit},
         )
 
+    @_coalesced
     def find_one_transfer_routes(
         self, origin_ids: list[int], dest_ids: list[int], limit: int = 5
     ) -> list[dict]:
@@ -71,11 +275,25 @@ class GraphRetriever:
 
     # ── Stop detail ──────────────────────────────────
 
+    @_coalesced
     def get_stop_detail(self, stop_id: int) -> dict | None:
         rows = self.client.run_query(
             queries.STOP_DETAIL, {"stopId": stop_id}
         )
-        return rows[0] if rows else None
+        if not rows:
+            return None
+        buses = [
+            {
+                "busNumber": e["number"],
+                "busId": e["id"],
+                "carrier": e["carrier"],
+                "firstPoint": e["firstPoint"],
+                "lastPoint": e["lastPoint"],
+                "direction": e["direction"],
+            }
+            for e in _summary_entries(rows[0])
+        ]
+        return {**_strip_summary(rows[0]), "buses": buses}
 
     # ── High-level: full route search ────────────────
 
@@ -87,7 +305,37 @@ class GraphRetriever:
         """
         Try direct routes first, then 1-transfer.
         Returns structured context for the LLM.
+
+        Results are cached per graph version. If Neo4j doesn't answer within
+        the request's latency budget, direct routes computed from the snapshot
+        are returned instead (with "fallback": "snapshot").
         """
+        key = make_key("search_routes", origin_ids, dest_ids)
+        with self._route_lock:
+            result = self._route_cache.get(key)
+            if result is not None:
+                self._route_cache.move_to_end(key)
+                return result
+
+        try:
+            result = self._search_routes(origin_ids, dest_ids)
+        except DeadlineExceeded:
+            # An empty snapshot answer proves nothing (transfers aren't covered)
+            routes = self.snapshot.direct_routes(origin_ids, dest_ids) if self.snapshot else []
+            budget = current_budget()
+            if not routes or budget is None:
+                raise
+            budget.fallback("retrieve")
+            return {"type": "direct", "routes": routes, "fallback": "snapshot"}
+
+        with self._route_lock:
+            self._route_cache[key] = result
+            if len(self._route_cache) > ROUTE_CACHE_SIZE:
+                self._route_cache.popitem(last=False)
+        return result
+
+    @_coalesced
+    def _search_routes(self, origin_ids: list[int], dest_ids: list[int]) -> dict:
         direct = self.find_direct_routes(origin_ids, dest_ids)
         if direct:
             return {"type": "direct", "routes": direct}
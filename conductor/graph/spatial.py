@@ -0,0 +1,190 @@
+"""In-memory spatial indexes over stops — viewport clustering and radius neighbor search."""
+
+from math import asin, ceil, floor, log, pi, radians, sin, sqrt, tan, cos
+
+EARTH_RADIUS_M = 6_371_000.0
+_METERS_PER_DEG = 111_320.0
+
+# Web-Mercator tiles are 256px; a cluster cell is CELL_PX wide on screen
+TILE_PX = 256
+CELL_PX = 64
+_CELLS_PER_TILE = TILE_PX // CELL_PX
+
+# Above this zoom, individual stops are returned instead of clusters
+MAX_CLUSTER_ZOOM = 15
+MIN_ZOOM = 0
+
+_STOP_FIELDS = ("id", "name", "code", "latitude", "longitude", "isTransportHub")
+
+
+def _mercator(lat: float, lng: float) -> tuple[float, float]:
+    """Project to normalized Web-Mercator coordinates in [0, 1)."""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lng + 180.0) / 360.0
+    y = (1.0 - log(tan(radians(lat)) + 1.0 / cos(radians(lat))) / pi) / 2.0
+    return x, y
+
+
+def _cell(x: float, y: float, zoom: int) -> tuple[int, int]:
+    scale = (1 << zoom) * _CELLS_PER_TILE
+    return floor(x * scale), floor(y * scale)
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid clusters, one level per zoom, built once at startup.
+
+    The finest level buckets stops into CELL_PX screen cells at MAX_CLUSTER_ZOOM + 1;
+    each coarser level merges 2×2 child cells. A viewport query touches only the
+    cells it covers, so the response size is bounded by screen area, not by the
+    number of stops.
+    """
+
+    def __init__(self, stops: list[dict]):
+        self._stops = [
+            {k: s.get(k) for k in _STOP_FIELDS}
+            for s in stops
+            if s.get("latitude") and s.get("longitude")
+        ]
+
+        # Leaf level: cell → stop indices
+        leaf_zoom = MAX_CLUSTER_ZOOM + 1
+        self._leaf: dict[tuple[int, int], list[int]] = {}
+        for i, s in enumerate(self._stops):
+            x, y = _mercator(s["latitude"], s["longitude"])
+            self._leaf.setdefault(_cell(x, y, leaf_zoom), []).append(i)
+
+        # Cluster levels: cell → [count, sumLat, sumLng, hubCount, firstStopIndex]
+        self._levels: dict[int, dict[tuple[int, int], list]] = {}
+        level = {}
+        for cell, members in self._leaf.items():
+            agg = [0, 0.0, 0.0, 0, members[0]]
+            for i in members:
+                s = self._stops[i]
+                agg[0] += 1
+                agg[1] += s["latitude"]
+                agg[2] += s["longitude"]
+                agg[3] += 1 if s["isTransportHub"] else 0
+            level[cell] = agg
+        for zoom in range(MAX_CLUSTER_ZOOM, MIN_ZOOM - 1, -1):
+            parent = {}
+            for (cx, cy), agg in level.items():
+                p = parent.get((cx >> 1, cy >> 1))
+                if p is None:
+                    parent[(cx >> 1, cy >> 1)] = list(agg)
+                else:
+                    p[0] += agg[0]
+                    p[1] += agg[1]
+                    p[2] += agg[2]
+                    p[3] += agg[3]
+            self._levels[zoom] = parent
+            level = parent
+
+    def __len__(self) -> int:
+        return len(self._stops)
+
+    def query(
+        self, min_lng: float, min_lat: float, max_lng: float, max_lat: float, zoom: int
+    ) -> dict:
+        """Return clusters (or single stops) whose cells intersect the bounding box."""
+        zoom = max(MIN_ZOOM, zoom)
+        if zoom > MAX_CLUSTER_ZOOM:
+            cells = self._cells_in_bbox(
+                self._leaf, min_lng, min_lat, max_lng, max_lat, MAX_CLUSTER_ZOOM + 1
+            )
+            stops = [
+                self._stops[i]
+                for _, members in cells
+                for i in members
+                if min_lat <= self._stops[i]["latitude"] <= max_lat
+                and min_lng <= self._stops[i]["longitude"] <= max_lng
+            ]
+            return {"zoom": zoom, "clusters": [], "stops": stops}
+
+        clusters = []
+        stops = []
+        level = self._levels[zoom]
+        for _, (count, sum_lat, sum_lng, hubs, first) in self._cells_in_bbox(
+            level, min_lng, min_lat, max_lng, max_lat, zoom
+        ):
+            if count == 1:
+                stops.append(self._stops[first])
+            else:
+                clusters.append({
+                    "lat": round(sum_lat / count, 6),
+                    "lng": round(sum_lng / count, 6),
+                    "count": count,
+                    "hubs": hubs,
+                })
+        return {"zoom": zoom, "clusters": clusters, "stops": stops}
+
+    @staticmethod
+    def _cells_in_bbox(level: dict, min_lng, min_lat, max_lng, max_lat, zoom: int):
+        x0, y0 = _cell(*_mercator(max_lat, min_lng), zoom)  # north-west corner
+        x1, y1 = _cell(*_mercator(min_lat, max_lng), zoom)  # south-east corner
+        span = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if span > len(level):
+            return [
+                (c, v) for c, v in level.items()
+                if x0 <= c[0] <= x1 and y0 <= c[1] <= y1
+            ]
+        out = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                v = level.get((cx, cy))
+                if v is not None:
+                    out.append(((cx, cy), v))
+        return out
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    dlat = radians(lat2 - lat1)
+    dlng = radians(lng2 - lng1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(a))
+
+
+class GridIndex:
+    """
+    Uniform metric grid (equirectangular projection, cell = search radius).
+    A radius query only inspects the 3×3 block of cells around a point, so
+    all-pairs neighbor search is O(n + k) instead of O(n²). Larger radii scan
+    a wider block of ceil(radius / cell) rings.
+    """
+
+    def __init__(self, points: list[tuple[int, float, float]], cell_meters: float):
+        self.cell = cell_meters
+        self._points = points
+        # Scale x at the highest latitude so projected distances never exceed
+        # true ones — a neighbor within radius is always in the scanned block.
+        ref_lat = max((abs(p[1]) for p in points), default=0.0)
+        self._kx = _METERS_PER_DEG * cos(radians(min(ref_lat, 89.0)))
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for i, (_, lat, lng) in enumerate(points):
+            self._cells.setdefault(self._key(lat, lng), []).append(i)
+
+    def _key(self, lat: float, lng: float) -> tuple[int, int]:
+        return floor(lng * self._kx / self.cell), floor(lat * _METERS_PER_DEG / self.cell)
+
+    def within(self, lat: float, lng: float, radius: float) -> list[tuple[int, float]]:
+        """(id, distance) of every point within radius meters."""
+        cx, cy = self._key(lat, lng)
+        reach = max(1, ceil(radius / self.cell))
+        rings = range(-reach, reach + 1)
+        out = []
+        for dx in rings:
+            for dy in rings:
+                for i in self._cells.get((cx + dx, cy + dy), ()):
+                    pid, plat, plng = self._points[i]
+                    d = haversine(lat, lng, plat, plng)
+                    if d <= radius:
+                        out.append((pid, d))
+        return out
+
+    def pairs_within(self, radius: float):
+        """Yield (id_a, id_b, distance) for every unordered pair with id_a < id_b."""
+        for pid, lat, lng in self._points:
+            for other, d in self.within(lat, lng, radius):
+                if pid < other:
+                    yield pid, other, d
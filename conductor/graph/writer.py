@@ -0,0 +1,198 @@
+"""Pipelined batch writer — concurrent UNWIND batches with adaptive sizing and retries."""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from conductor.config import INGEST_CONCURRENCY, INGEST_TARGET_BATCH_SECONDS
+from conductor.graph.client import Neo4jClient
+
+# Error markers worth retrying — everything else (syntax, constraint) fails fast
+_RETRYABLE = ("TransientError", "DeadlockDetected", "error 429", "error 5")
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, requests.RequestException):
+        return True
+    text = str(error)
+    return any(marker in text for marker in _RETRYABLE)
+
+
+class _BatchSizer:
+    """
+    AIMD batch sizing: grow additively while batches finish under the target
+    latency, shrink multiplicatively when they run slow or fail.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float):
+        self.size = max(minimum, min(initial, maximum))
+        self.min = minimum
+        self.max = maximum
+        self.target = target_seconds
+        self.step = max(minimum, initial // 4)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            if seconds > self.target:
+                self.size = max(self.min, int(self.size * 0.7))
+            else:
+                self.size = min(self.max, self.size + self.step)
+
+    def failed(self):
+        with self._lock:
+            self.size = max(self.min, self.size // 2)
+
+
+class PhaseStats:
+    __slots__ = ("label", "rows", "batches", "retries", "seconds", "final_batch")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.final_batch = 0
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class BatchWriter:
+    """
+    Write row lists as UNWIND batches with up to `concurrency` requests in flight.
+
+    `write()` blocks until every batch of the phase has landed, so calling phases
+    in order keeps node-before-edge dependencies intact; independent phases can
+    run side by side with run_stage(). Batches must be idempotent (MERGE/SET),
+    since a failed batch is retried — split into smaller pieces if the sizer
+    has shrunk meanwhile.
+    """
+
+    def __init__(
+        self,
+        client: Neo4jClient,
+        concurrency: int = INGEST_CONCURRENCY,
+        target_seconds: float = INGEST_TARGET_BATCH_SECONDS,
+        max_retries: int = 4,
+    ):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.target_seconds = target_seconds
+        self.max_retries = max_retries
+        self.stats: list[PhaseStats] = []
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="ingest"
+        )
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._stats_lock = threading.Lock()
+
+    def write(
+        self,
+        label: str,
+        query: str,
+        rows: list,
+        param: str = "rows",
+        batch_size: int = 500,
+        min_batch: int = 25,
+        max_batch: int = 5000,
+    ) -> PhaseStats:
+        stats = PhaseStats(label)
+        sizer = _BatchSizer(batch_size, min_batch, max_batch, self.target_seconds)
+        start = time.perf_counter()
+
+        futures = []
+        i = 0
+        while i < len(rows):
+            # Size is read per submission, so later batches follow observed latency
+            self._slots.acquire()
+            batch = rows[i : i + sizer.size]
+            i += len(batch)
+            try:
+                future = self._pool.submit(self._run, query, param, batch, sizer, stats)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+
+        error = None
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+        stats.seconds = time.perf_counter() - start
+        stats.final_batch = sizer.size
+        with self._stats_lock:
+            self.stats.append(stats)
+        print(
+            f"  {label}: {stats.rows} rows in {stats.seconds:.1f}s "
+            f"({stats.rate:.0f} rows/s, {stats.batches} batches, "
+            f"batch size → {stats.final_batch}, {stats.retries} retries)"
+        )
+        return stats
+
+    def _run(self, query: str, param: str, batch: list, sizer: _BatchSizer,
+             stats: PhaseStats, attempt: int = 0):
+        while True:
+            t0 = time.perf_counter()
+            try:
+                self.client.run_write(query, {param: batch})
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                sizer.failed()
+                with self._stats_lock:
+                    stats.retries += 1
+                time.sleep(min(0.5 * 2 ** attempt, 10.0) * random.uniform(0.5, 1.0))
+                if len(batch) > sizer.size:
+                    size = sizer.size
+                    for j in range(0, len(batch), size):
+                        self._run(query, param, batch[j : j + size], sizer, stats, attempt)
+                    return
+                continue
+
+            sizer.observe(time.perf_counter() - t0)
+            with self._stats_lock:
+                stats.rows += len(batch)
+                stats.batches += 1
+            return
+
+    def report(self):
+        """Print per-phase throughput for the whole run."""
+        if not self.stats:
+            return
+        print("Ingestion throughput:")
+        for s in self.stats:
+            print(f"  {s.label:<28} {s.rows:>8} rows  {s.seconds:>6.1f}s  {s.rate:>8.0f} rows/s")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def run_stage(*phases):
+    """
+    Run independent phase callables concurrently and wait for all of them.
+    Their batches share the BatchWriter's concurrency limit.
+    """
+    if len(phases) == 1:
+        return [phases[0]()]
+    with ThreadPoolExecutor(max_workers=len(phases), thread_name_prefix="phase") as pool:
+        futures = [pool.submit(p) for p in phases]
+        return [f.result() for f in futures]
@@ -0,0 +1,156 @@
+"""
+Provider-side prompt cache — the static system instructions (SYSTEM_PROMPT,
+INTENT_PARSE_PROMPT) are uploaded once as cached content and referenced by
+name, instead of being resent and re-prefilled on every call.
+
+Entries are created, and refreshed (TTL extended) shortly before they
+expire, on a background thread, so a request never waits on the provider's
+cache API; until an entry exists its calls go inline. Backends without
+caching, and prompts the provider refuses to cache (e.g. below Gemini's
+minimum cacheable size), fall back to sending the instruction inline.
+Callers never see the difference.
+"""
+
+import hashlib
+import threading
+import time
+
+# Extend an entry's TTL when it has less than this left
+REFRESH_MARGIN_SECONDS = 120
+# After a transient create failure, send inline for this long before retrying
+RETRY_AFTER_FAILURE_SECONDS = 300
+
+
+def _status(e: Exception) -> int:
+    """HTTP status of a google-genai APIError or requests HTTPError, else 0."""
+    response = getattr(e, "response", None)
+    return getattr(e, "code", None) or getattr(response, "status_code", None) or 0
+
+
+class CachedContentGone(Exception):
+    """The provider no longer has the cached content (expired or deleted)."""
+
+
+class _Entry:
+    __slots__ = ("name", "tokens", "expires")
+
+    def __init__(self, name: str, tokens: int, expires: float):
+        self.name = name
+        self.tokens = tokens
+        self.expires = expires
+
+
+class PromptCache:
+    def __init__(self, enabled: bool, ttl_seconds: int):
+        self.enabled = enabled
+        self.ttl = ttl_seconds
+        self._entries: dict[str, _Entry] = {}
+        self._refused: dict[str, float] = {}  # key → monotonic time to retry (inf: never)
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.refreshed = 0
+        self.invalidated = 0
+        self.inline = 0  # calls that sent their instruction inline
+        self.last_error: str | None = None
+
+    @staticmethod
+    def _key(system_instruction: str) -> str:
+        return hashlib.sha1(system_instruction.encode("utf-8")).hexdigest()
+
+    def lookup(self, backend, system_instruction: str | None) -> str | None:
+        """
+        Name of the cached content holding `system_instruction`; None means send
+        the instruction inline. Never blocks: a missing or expiring entry is
+        created or refreshed on a background thread, and this call uses
+        whatever is valid right now.
+        """
+        if not system_instruction:
+            return None
+        if not self.enabled or not hasattr(backend, "create_cache"):
+            self.inline += 1
+            return None
+
+        key = self._key(system_instruction)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.expires - REFRESH_MARGIN_SECONDS:
+            return entry.name
+        if now < self._refused.get(key, 0.0):
+            self.inline += 1
+            return None
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        if lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._update, args=(backend, key, system_instruction, lock),
+                name="prompt-cache", daemon=True,
+            ).start()
+        if entry is not None and now < entry.expires:
+            return entry.name
+        self.inline += 1
+        return None
+
+    def _update(self, backend, key: str, system_instruction: str, lock: threading.Lock):
+        """Create or refresh one entry off the request path, then release `lock`."""
+        try:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry.expires - REFRESH_MARGIN_SECONDS:
+                return
+            if entry is not None and time.monotonic() < entry.expires:
+                try:
+                    backend.refresh_cache(entry.name, self.ttl)
+                    entry.expires = time.monotonic() + self.ttl
+                    self.refreshed += 1
+                    return
+                except Exception as e:
+                    self.last_error = f"refresh: {e}"
+                    self._entries.pop(key, None)
+            try:
+                name, tokens = backend.create_cache(system_instruction, self.ttl)
+            except Exception as e:
+                # A 4xx (too small, unsupported model) won't change; anything else
+                # might, including rate limits (429) and request timeouts (408)
+                status = _status(e)
+                permanent = 400 <= status < 500 and status not in (408, 429)
+                self._refused[key] = (
+                    float("inf") if permanent else time.monotonic() + RETRY_AFTER_FAILURE_SECONDS
+                )
+                self.last_error = f"create: {e}"
+                print(f"Prompt cache: sending instruction inline ({e})")
+                return
+            self._entries[key] = _Entry(name, tokens, time.monotonic() + self.ttl)
+            self._refused.pop(key, None)
+            self.created += 1
+        finally:
+            lock.release()
+
+    def invalidate(self, system_instruction: str):
+        if self._entries.pop(self._key(system_instruction), None) is not None:
+            self.invalidated += 1
+
+    def close(self, backend):
+        """Delete our cached contents so they stop accruing storage."""
+        for entry in list(self._entries.values()):
+            try:
+                backend.delete_cache(entry.name)
+            except Exception:
+                pass
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "ttlSeconds": self.ttl,
+            "entries": [
+                {"name": e.name, "tokens": e.tokens, "expiresIn": round(e.expires - now)}
+                for e in list(self._entries.values())
+            ],
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "invalidated": self.invalidated,
+            "inlineCalls": self.inline,
+            "lastError": self.last_error,
+        }
@@ -0,0 +1,399 @@
+"""
+LLM gateway — every model call (intent parsing, response generation) goes
+through one process-wide gateway that owns the backend client and its
+connection pool, caps concurrent calls, applies timeouts, retries rate
+limits once and keeps per-purpose latency and token counters. Static
+system instructions are cached provider-side where the backend supports it
+(see cache.py).
+
+Backends (LLM_BACKEND):
+    gemini  Google Gemini via google-genai, sharing one pooled httpx client
+    stub    The deterministic local server in conductor/llm/stub.py — for
+            offline benchmarks and load tests of the full chat pipeline
+"""
+
+import threading
+import time
+
+import requests
+
+from conductor.config import (
+    DISABLE_SSL_VERIFY,
+    GEMINI_API_KEY,
+    LLM_BACKEND,
+    LLM_MAX_CONCURRENCY,
+    LLM_PROMPT_CACHE,
+    LLM_PROMPT_CACHE_TTL_SECONDS,
+    LLM_STUB_URL,
+    LLM_TIMEOUT_SECONDS,
+    MODEL_NAME,
+)
+from conductor.budget import DeadlineExceeded, call_timeout, time_left
+from conductor.llm.cache import CachedContentGone, PromptCache
+from conductor.metrics import record_llm
+from conductor.tracing import span
+from conductor.startup import startup
+
+# Wait before the single retry after a 429
+RATE_LIMIT_RETRY_SECONDS = 15
+
+
+class RateLimitError(Exception):
+    """The backend is rate limiting us (HTTP 429), even after a retry."""
+
+
+class LLMResult:
+    __slots__ = ("text", "prompt_tokens", "output_tokens", "cached_tokens")
+
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0,
+                 cached_tokens: int = 0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.cached_tokens = cached_tokens  # part of prompt_tokens served from cache
+
+
+# ── Backends ────────────────────────────────────────
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, max_connections: int, timeout: float):
+        # Deferred: the SDK takes ~0.5s to import and isn't needed until the first call
+        import httpx
+        from google import genai
+        from google.genai import errors, types
+
+        self._errors = errors
+        self._types = types
+        self._timeout_error = httpx.TimeoutException
+        self._http = httpx.Client(
+            verify=not DISABLE_SSL_VERIFY,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._client = genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                api_version="v1beta",
+                timeout=int(timeout * 1000),
+                httpx_client=self._http,
+            ),
+        )
+
+    def generate(self, purpose: str, contents, system_instruction: str | None,
+                 temperature: float | None, max_output_tokens: int | None, timeout: float,
+                 cached_content: str | None = None) -> LLMResult:
+        config = self._types.GenerateContentConfig(
+            # A cached content already carries the system instruction
+            system_instruction=None if cached_content else system_instruction,
+            cached_content=cached_content,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            http_options=self._types.HttpOptions(timeout=int(timeout * 1000)),
+        )
+        try:
+            response = self._client.models.generate_content(
+                model=MODEL_NAME, contents=contents, config=config
+            )
+        except self._timeout_error as e:
+            raise DeadlineExceeded(f"Gemini call timed out after {timeout:.1f}s") from e
+        except self._errors.ClientError as e:
+            if e.code == 429:
+                raise RateLimitError(str(e)) from e
+            if cached_content and e.code in (403, 404):
+                raise CachedContentGone(str(e)) from e
+            raise
+        usage = response.usage_metadata
+        return LLMResult(
+            response.text or "",
+            (usage.prompt_token_count or 0) if usage else 0,
+            (usage.candidates_token_count or 0) if usage else 0,
+            (usage.cached_content_token_count or 0) if usage else 0,
+        )
+
+    def create_cache(self, system_instruction: str, ttl_seconds: int) -> tuple[str, int]:
+        cache = self._client.caches.create(
+            model=MODEL_NAME,
+            config=self._types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                ttl=f"{ttl_seconds}s",
+                display_name="conductor-prompt",
+            ),
+        )
+        usage = cache.usage_metadata
+        return cache.name, (usage.total_token_count or 0) if usage else 0
+
+    def refresh_cache(self, name: str, ttl_seconds: int):
+        self._client.caches.update(
+            name=name, config=self._types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s")
+        )
+
+    def delete_cache(self, name: str):
+        self._client.caches.delete(name=name)
+
+    def close(self):
+        self._http.close()
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, max_connections: int, timeout: float, url: str = LLM_STUB_URL):
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = url.rstrip("/")
+        self.url = self.base_url + "/generate"
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def generate(self, purpose: str, contents, system_instruction: str | None,
+                 temperature: float | None, max_output_tokens: int | None, timeout: float,
+                 cached_content: str | None = None) -> LLMResult:
+        try:
+            response = self._session.post(
+                self.url,
+                json={
+                    "purpose": purpose,
+                    "contents": contents,
+                    "systemInstruction": None if cached_content else system_instruction,
+                    "cachedContent": cached_content,
+                    "maxOutputTokens": max_output_tokens,
+                },
+                timeout=timeout,
+            )
+        except requests.Timeout as e:
+            raise DeadlineExceeded(f"stub call timed out after {timeout:.1f}s") from e
+        if response.status_code == 429:
+            raise RateLimitError(response.text)
+        if cached_content and response.status_code == 404:
+            raise CachedContentGone(response.text)
+        response.raise_for_status()
+        data = response.json()
+        return LLMResult(
+            data["text"],
+            data.get("promptTokens", 0),
+            data.get("outputTokens", 0),
+            data.get("cachedTokens", 0),
+        )
+
+    def create_cache(self, system_instruction: str, ttl_seconds: int) -> tuple[str, int]:
+        response = self._session.post(
+            self.base_url + "/caches",
+            json={"systemInstruction": system_instruction, "ttlSeconds": ttl_seconds},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data["name"], data.get("tokens", 0)
+
+    def refresh_cache(self, name: str, ttl_seconds: int):
+        self._session.patch(
+            f"{self.base_url}/{name}", json={"ttlSeconds": ttl_seconds}, timeout=self.timeout
+        ).raise_for_status()
+
+    def delete_cache(self, name: str):
+        self._session.delete(f"{self.base_url}/{name}", timeout=self.timeout)
+
+    def close(self):
+        self._session.close()
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+# ── Gateway ─────────────────────────────────────────
+
+class _PurposeStats:
+    __slots__ = ("calls", "errors", "rate_limited", "timed_out", "latency", "max_latency",
+                 "wait", "prompt_tokens", "output_tokens", "cached_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.timed_out = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.wait = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+
+    def as_dict(self) -> dict:
+        done = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rateLimited": self.rate_limited,
+            "timedOut": self.timed_out,
+            "avgLatencyMs": round(self.latency / done * 1000, 1) if done else None,
+            "maxLatencyMs": round(self.max_latency * 1000, 1),
+            "avgQueueMs": round(self.wait / self.calls * 1000, 1) if self.calls else None,
+            "promptTokens": self.prompt_tokens,
+            "outputTokens": self.output_tokens,
+            "cachedTokens": self.cached_tokens,
+            "cachedShare": (
+                round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None
+            ),
+        }
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        backend: str = LLM_BACKEND,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        prompt_cache: bool = LLM_PROMPT_CACHE,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown LLM_BACKEND {backend!r} (expected one of {sorted(BACKENDS)})")
+        self.backend_name = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._backend = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats: dict[str, _PurposeStats] = {}
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.prompt_cache = PromptCache(prompt_cache, LLM_PROMPT_CACHE_TTL_SECONDS)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._init_lock:
+                if self._backend is None:
+                    with startup.phase("llm client"):
+                        self._backend = BACKENDS[self.backend_name](
+                            self.max_concurrency, self.timeout
+                        )
+        return self._backend
+
+    def generate(
+        self,
+        purpose: str,
+        contents,
+        system_instruction: str | None = None,
+        temperature: float | None = None,
+        max_output_tokens: int | None = None,
+        retries: int = 1,
+    ) -> str:
+        """
+        Run one completion and return its text. `purpose` labels the call in
+        stats(). A 429 is retried `retries` times after RATE_LIMIT_RETRY_SECONDS
+        (without holding a concurrency slot), then raised as RateLimitError.
+
+        Under a request budget (conductor/budget.py) the slot wait and the call
+        timeout end with the budget, a retry is only attempted if the budget can
+        still afford the wait, and running out raises DeadlineExceeded.
+        """
+        backend = self.backend
+        for attempt in range(1 + retries):
+            with span("llm.generate", purpose=purpose, attempt=attempt) as sp:
+                queued = time.perf_counter()
+                left = time_left()
+                if not self._slots.acquire(timeout=None if left is None else max(0.0, left)):
+                    error = DeadlineExceeded(f"no free LLM slot within the {purpose} budget")
+                    with self._stats_lock:
+                        self._record(purpose, time.perf_counter() - queued, 0.0, None, error)
+                    raise error
+                try:
+                    start = time.perf_counter()
+                    with self._stats_lock:
+                        self.in_flight += 1
+                    try:
+                        result = self._call(
+                            backend, purpose, contents, system_instruction,
+                            temperature, max_output_tokens, call_timeout(self.timeout),
+                        )
+                        error = None
+                    except Exception as e:
+                        result, error = None, e
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        with self._stats_lock:
+                            self.in_flight -= 1
+                            self._record(purpose, start - queued, elapsed, result, error)
+                        record_llm(purpose, elapsed)
+                        sp.set("queue_ms", round((start - queued) * 1000, 1))
+                        if error is not None:
+                            sp.fail(error)
+                        else:
+                            sp.set("prompt_tokens", result.prompt_tokens)
+                            sp.set("output_tokens", result.output_tokens)
+                            sp.set("cached_tokens", result.cached_tokens)
+                finally:
+                    self._slots.release()
+
+            if error is None:
+                return result.text.strip()
+            if isinstance(error, RateLimitError) and attempt < retries:
+                left = time_left()
+                if left is None or left > RATE_LIMIT_RETRY_SECONDS + 1:
+                    time.sleep(RATE_LIMIT_RETRY_SECONDS)
+                    continue
+            raise error
+
+    def _call(self, backend, purpose: str, contents, system_instruction: str | None,
+              temperature: float | None, max_output_tokens: int | None,
+              timeout: float) -> LLMResult:
+        cached = self.prompt_cache.lookup(backend, system_instruction)
+        if cached is not None:
+            try:
+                return backend.generate(
+                    purpose, contents, system_instruction, temperature, max_output_tokens,
+                    timeout, cached_content=cached,
+                )
+            except CachedContentGone:
+                # Expired or evicted early: drop it and send inline; the next call recreates it
+                self.prompt_cache.invalidate(system_instruction)
+        return backend.generate(
+            purpose, contents, system_instruction, temperature, max_output_tokens, timeout
+        )
+
+    def _record(self, purpose: str, wait: float, elapsed: float,
+                result: LLMResult | None, error: Exception | None):
+        s = self._stats.get(purpose)
+        if s is None:
+            s = self._stats[purpose] = _PurposeStats()
+        s.calls += 1
+        s.wait += wait
+        if error is not None:
+            s.errors += 1
+            if isinstance(error, RateLimitError):
+                s.rate_limited += 1
+            elif isinstance(error, DeadlineExceeded):
+                s.timed_out += 1
+            return
+        s.latency += elapsed
+        s.max_latency = max(s.max_latency, elapsed)
+        s.prompt_tokens += result.prompt_tokens
+        s.output_tokens += result.output_tokens
+        s.cached_tokens += result.cached_tokens
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "backend": self.backend_name,
+                "maxConcurrency": self.max_concurrency,
+                "inFlight": self.in_flight,
+                "purposes": {name: s.as_dict() for name, s in self._stats.items()},
+                "promptCache": self.prompt_cache.stats(),
+            }
+
+    def close(self):
+        if self._backend is not None:
+            self.prompt_cache.close(self._backend)
+            self._backend.close()
+
+
+# Shared by the intent parser and the response generator
+gateway = LLMGateway()
@@ -0,0 +1,180 @@
+"""
+Deterministic local LLM server for offline benchmarks and load tests.
+
+    python -m conductor.llm.stub --port 8099 --latency-ms 400
+    LLM_BACKEND=stub uvicorn conductor.main:app
+
+POST /generate takes {"purpose", "contents", "systemInstruction" or
+"cachedContent"} and answers {"text", "promptTokens", "outputTokens",
+"cachedTokens"}. The same input always gives the same output. Intent calls get a fixed "general" intent (the local
+pre-parser already handles the common intents). Response calls echo the
+first lines of the graph context, so the pipeline's work remains visible.
+A configurable fraction of calls can answer 429 to exercise the retry path.
+
+POST /caches, PATCH and DELETE /caches/<id> mimic Gemini's cached contents
+(with the same minimum size) so the prompt cache can be exercised offline;
+--no-cache makes them 404 to exercise the inline fallback.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _text_of(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(
+        part.get("text", "")
+        for message in contents or []
+        for part in message.get("parts", [])
+    )
+
+
+def _tokens(text: str) -> int:
+    # Roughly 4 characters per token, like Gemini's estimate for Latin scripts
+    return max(1, len(text) // 4)
+
+
+def respond(request: dict, cached_system: str = "") -> dict:
+    """The stub's deterministic answer to a /generate request."""
+    contents = request.get("contents")
+    prompt = _text_of(contents)
+    system = request.get("systemInstruction") or cached_system
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    if request.get("purpose") == "intent":
+        text = json.dumps({"intent": "general", "entities": {}})
+    else:
+        # The last user turn carries the context template; echo its first lines
+        last = _text_of(contents[-1:] if isinstance(contents, list) else contents)
+        lines = [line for line in last.splitlines() if line.strip()]
+        text = f"[stub {digest}]\n" + "\n".join(lines[:6])
+    return {
+        "text": text,
+        "promptTokens": _tokens(prompt) + _tokens(system),
+        "outputTokens": _tokens(text),
+        "cachedTokens": _tokens(cached_system) if cached_system else 0,
+    }
+
+
+# Gemini refuses to cache less than this many tokens
+MIN_CACHE_TOKENS = 1024
+
+
+def make_server(host: str, port: int, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                rate_limit: float = 0.0, caching: bool = True,
+                min_cache_tokens: int = MIN_CACHE_TOKENS) -> ThreadingHTTPServer:
+    caches: dict[str, tuple[str, float]] = {}  # name → (system instruction, expiry)
+    lock = threading.Lock()
+
+    def cached_system(name: str) -> str | None:
+        with lock:
+            entry = caches.get(name)
+            if entry is None or entry[1] < time.time():
+                caches.pop(name, None)
+                return None
+            return entry[0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _read(self) -> dict | None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "invalid JSON"})
+                return None
+
+        def do_POST(self):
+            request = self._read()  # always drain the body; the connection is kept alive
+            if request is None:
+                return
+            if self.path == "/caches" and caching:
+                return self._create_cache(request)
+            if self.path != "/generate":
+                return self._send(404, {"error": "not found"})
+            system = ""
+            if request.get("cachedContent"):
+                system = cached_system(request["cachedContent"])
+                if system is None:
+                    return self._send(404, {"error": "CachedContent not found"})
+            if latency_ms or jitter_ms:
+                # Cached prefixes skip prefill; model that as proportionally less latency
+                share = _tokens(system) / (_tokens(system) + _tokens(_text_of(request.get("contents"))))
+                scale = 1 - 0.5 * share if system else 1
+                time.sleep(scale * (latency_ms + random.uniform(0, jitter_ms)) / 1000)
+            if rate_limit and random.random() < rate_limit:
+                return self._send(429, {"error": "RESOURCE_EXHAUSTED"})
+            self._send(200, respond(request, system))
+
+        def _create_cache(self, request: dict):
+            system = request.get("systemInstruction") or ""
+            if _tokens(system) < min_cache_tokens:
+                return self._send(400, {
+                    "error": f"cached content must be at least {min_cache_tokens} tokens"
+                })
+            name = "caches/" + hashlib.sha1(f"{system}{time.time()}".encode("utf-8")).hexdigest()[:12]
+            with lock:
+                caches[name] = (system, time.time() + float(request.get("ttlSeconds", 3600)))
+            self._send(200, {"name": name, "tokens": _tokens(system)})
+
+        def do_PATCH(self):
+            request = self._read()
+            if request is None:
+                return
+            name = self.path.lstrip("/")
+            with lock:
+                if name not in caches or not caching:
+                    return self._send(404, {"error": "CachedContent not found"})
+                caches[name] = (caches[name][0], time.time() + float(request.get("ttlSeconds", 3600)))
+            self._send(200, {"name": name})
+
+        def do_DELETE(self):
+            with lock:
+                found = caches.pop(self.path.lstrip("/"), None) is not None
+            self._send(200 if found else 404, {})
+
+        def _send(self, status: int, body: dict):
+            raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic local LLM stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed delay per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random delay per call")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of calls answered 429")
+    parser.add_argument("--no-cache", action="store_true", help="don't support cached contents")
+    parser.add_argument(
+        "--min-cache-tokens", type=int, default=MIN_CACHE_TOKENS,
+        help="refuse to cache smaller instructions (0 to cache everything)",
+    )
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.rate_limit,
+        caching=not args.no_cache, min_cache_tokens=args.min_cache_tokens,
+    )
+    print(f"LLM stub listening on http://{args.host}:{args.port}/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
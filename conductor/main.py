@@ -1,32 +1,83 @@
 """Conductor — Bakı ictimai nəqliyyat Graph RAG API."""
 
+import time
+
+# First import, so the "imports" phase covers everything below
+from conductor.startup import startup
+
+import threading
 from pathlib import Path
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
 from conductor.config import APP_HOST, APP_PORT
 from conductor.graph.client import Neo4jClient
+from conductor.llm.gateway import gateway
+from conductor.metrics import ServerTimingMiddleware, render as render_metrics
+from conductor.tracing import tracer
+from conductor.api import routes
 from conductor.api.routes import router, init_services
 
+startup.record("imports", time.perf_counter() - startup.started)
+
 BASE_DIR = Path(__file__).resolve().parent
 
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+_templates = None
+_shutdown = threading.Event()
+
+
+def _get_templates():
+    """Jinja2 is only loaded when the page is first requested, not at boot."""
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+
+        _templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+    return _templates
+
+
+def _warm_up(client: Neo4jClient):
+    """
+    Connect to Neo4j and load the first data state off the event loop, so the
+    server accepts connections immediately; data routes answer 503 until done.
+    Retries with backoff — a paused free-tier Aura instance can take minutes.
+    """
+    attempt = 0
+    while not _shutdown.is_set():
+        try:
+            with startup.phase("connectivity"):
+                client.verify_connectivity()
+            with startup.phase("index load"):
+                init_services(client)
+        except Exception as e:
+            startup.error = f"{type(e).__name__}: {e}"
+            attempt += 1
+            delay = min(2 ** attempt, 30)
+            print(f"Startup attempt {attempt} failed ({startup.error}); retrying in {delay}s")
+            _shutdown.wait(delay)
+            continue
+        startup.mark_ready()
+        startup.print_report()
+        print("Conductor API ready.")
+        return
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     client = Neo4jClient()
-    client.verify_connectivity()
-    init_services(client)
-    print("Conductor API ready.")
+    threading.Thread(target=_warm_up, args=(client,), name="warm-up", daemon=True).start()
     yield
     # Shutdown
+    _shutdown.set()
+    if routes.reloader is not None:
+        routes.reloader.stop_watching()
     client.close()
+    gateway.close()
+    tracer.close()
     print("Neo4j connection closed.")
 
 
@@ -44,6 +95,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the Server-Timing "app" entry covers the whole request
+app.add_middleware(ServerTimingMiddleware)
 
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
@@ -52,7 +105,7 @@ app.include_router(router)
 
 @app.get("/")
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _get_templates().TemplateResponse("index.html", {"request": request})
 
 
 @app.head("/")
@@ -61,6 +114,12 @@ async def health():
     return Response(status_code=200)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: stage, Neo4j, LLM and HTTP latency histograms."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/favicon.ico")
 @app.get("/apple-touch-icon.png")
 @app.get("/apple-touch-icon-precomposed.png")
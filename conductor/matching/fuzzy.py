@@ -1,9 +1,13 @@
 """Fuzzy stop name matching — resolves user input to Stop node IDs."""
 
-from conductor.graph.client import Neo4jClient
+import re
+
+from conductor.config import STOP_SEARCH_FULLTEXT
+from conductor.graph.client import Neo4jClient, ScopedClient
 from conductor.graph import queries
 from conductor.matching.aliases import ALIASES
 from conductor.matching.transliterate import normalize, generate_variants
+from conductor.tracing import span
 
 # Azerbaijani dative/ablative suffixes to strip (longest first)
 _SUFFIXES = ("ndan", "ndən", "dan", "dən", "na", "nə", "ya", "yə", "a", "ə")
@@ -18,53 +22,103 @@ def _suffix_variants(text: str) -> list[str]:
     return variants
 
 
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _lucene_clause(term: str, boost: float = 1.0) -> str | None:
+    """
+    All tokens of a term must match, each as a prefix or (for longer tokens)
+    a fuzzy term. Tokens are word-character runs, so no Lucene syntax needs escaping.
+    """
+    tokens = _TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    parts = []
+    for tok in tokens:
+        if len(tok) >= 4:
+            parts.append(f"({tok}* OR {tok}~1)")
+        else:
+            parts.append(f"{tok}*")
+    clause = "(" + " AND ".join(parts) + ")"
+    return f"{clause}^{boost:g}" if boost != 1.0 else clause
+
+
 class StopMatcher:
-    def __init__(self, client: Neo4jClient):
+    def __init__(self, client: Neo4jClient | ScopedClient, fulltext: bool = STOP_SEARCH_FULLTEXT):
         self.client = client
+        self.fulltext = fulltext
 
     def match(self, user_input: str, limit: int = 5) -> list[dict]:
         """
         Resolve user text to a list of candidate stops.
         Tries: alias lookup → exact contains → variant contains.
         Also tries stripping Azerbaijani grammatical suffixes.
+        With full-text search enabled, all of these run as one index query.
         Returns list of {id, name, code, latitude, longitude, isTransportHub}.
         """
         text = normalize(user_input)
 
+        if self.fulltext:
+            return self._match_fulltext(text, limit)
+
         # 1. Check aliases first (also try transliteration variants + suffix-stripped)
         search_terms = self._alias_lookup(text)
         if search_terms:
             results = []
             for term in search_terms:
-                rows = self.client.run_query(
-                    queries.FIND_STOPS_BY_NAME,
-                    {"name": term, "limit": limit},
-                )
-                results.extend(rows)
+                results.extend(self._find_by_name("alias", term, limit))
             if results:
                 return _dedupe(results, limit)
 
         # 2. Direct search with normalized input (+ suffix-stripped variants)
         for form in _suffix_variants(text):
-            results = self.client.run_query(
-                queries.FIND_STOPS_BY_NAME,
-                {"name": form, "limit": limit},
-            )
+            results = self._find_by_name("direct", form, limit)
             if results:
                 return results
 
         # 3. Try all transliteration variants (+ suffix-stripped)
         for form in _suffix_variants(text):
             for variant in generate_variants(form):
-                results = self.client.run_query(
-                    queries.FIND_STOPS_BY_NAME,
-                    {"name": variant, "limit": limit},
-                )
+                results = self._find_by_name("variant", variant, limit)
                 if results:
                     return results
 
         return []
 
+    def _find_by_name(self, step: str, name: str, limit: int) -> list[dict]:
+        """One FIND_STOPS_BY_NAME query, traced with the matching step that tried it."""
+        with span("matcher.query", step=step, term=name) as s:
+            rows = self.client.run_query(
+                queries.FIND_STOPS_BY_NAME, {"name": name, "limit": limit}
+            )
+            s.set("rows", len(rows))
+        return rows
+
+    def _match_fulltext(self, text: str, limit: int) -> list[dict]:
+        """
+        One Lucene query over the stop_name_fulltext index: alias targets (boosted),
+        then every suffix-stripped and transliterated variant as prefix/fuzzy terms.
+        """
+        clauses = []
+        for term in self._alias_lookup(text) or []:
+            clauses.append(_lucene_clause(term, boost=4.0))
+        forms = _suffix_variants(text)
+        for i, form in enumerate(forms):
+            # The unstripped input outranks suffix-stripped guesses
+            clauses.append(_lucene_clause(form, boost=2.0 if i == 0 else 1.0))
+            for variant in generate_variants(form)[1:]:
+                clauses.append(_lucene_clause(variant))
+
+        query = " OR ".join(dict.fromkeys(c for c in clauses if c))
+        if not query:
+            return []
+        with span("matcher.query", step="fulltext", clauses=len(clauses)) as s:
+            rows = self.client.run_query(
+                queries.FIND_STOPS_FULLTEXT, {"query": query, "limit": limit}
+            )
+            s.set("rows", len(rows))
+        return _dedupe(rows, limit)
+
     def _alias_lookup(self, text: str) -> list[str] | None:
         """Look up aliases trying original, suffix-stripped, and transliterated forms."""
         for form in _suffix_variants(text):
@@ -28,6 +28,11 @@ def normalize(text: str) -> str:
     return text.strip().lower()
 
 
+def normalize_bus_number(number: str) -> str:
+    """Canonical bus number for lookups: '#108a ' → '108A'."""
+    return number.strip().lstrip("#").replace(" ", "").upper()
+
+
 def to_ascii(text: str) -> str:
     """Convert Azerbaijani characters to ASCII equivalents for comparison."""
     result = normalize(text)
@@ -0,0 +1,241 @@
+"""
+Latency instrumentation — Prometheus metrics and Server-Timing headers.
+
+Chat stages (via conductor/budget.py), Neo4j queries (per query template),
+LLM calls and HTTP requests are recorded in fixed-bucket histograms and
+counters, rendered in Prometheus text format at /metrics. Each request also
+accumulates its own timings, which ServerTimingMiddleware returns in a
+`Server-Timing` header, e.g.
+
+    Server-Timing: parse;dur=1.2, match;dur=8.4, neo4j;dur=41.0;desc="3 queries",
+                   retrieve;dur=45.3, llm;dur=1502.7, generate;dur=1510.2, app;dur=1570.9
+
+Recording is a lock, a bisect and a few additions, so it is cheap enough
+for every call.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values → [bucket counts..., sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, *label_values, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, s in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), s):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = _labels(self.labels + ("le",), label_values + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {round(s[-1], 6)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value read from `fn` at scrape time."""
+
+    def __init__(self, name: str, help: str, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(value)}"]
+
+
+_registry: list = []
+
+http_seconds = Histogram(
+    "conductor_http_request_seconds", "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+stage_seconds = Histogram(
+    "conductor_stage_seconds", "Chat pipeline stage latency.", ("stage",),
+)
+neo4j_seconds = Histogram(
+    "conductor_neo4j_query_seconds", "Neo4j query latency by query template.", ("query",),
+)
+neo4j_rows = Counter(
+    "conductor_neo4j_rows_total", "Rows returned by Neo4j queries.", ("query",),
+)
+neo4j_bytes = Counter(
+    "conductor_neo4j_response_bytes_total", "Response bytes read from Neo4j.", ("query",),
+)
+neo4j_errors = Counter(
+    "conductor_neo4j_errors_total", "Neo4j queries that failed or timed out.", ("query",),
+)
+llm_seconds = Histogram(
+    "conductor_llm_call_seconds", "LLM backend call latency by purpose.", ("purpose",),
+)
+
+
+# ── Per-request timings (Server-Timing) ─────────────
+
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+
+
+def add_timing(name: str, seconds: float):
+    """Add `seconds` to the current request's `name` entry; a no-op outside a request."""
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def record_stage(name: str, seconds: float):
+    stage_seconds.observe(name, value=seconds)
+    add_timing(name, seconds)
+
+
+def record_query(name: str, seconds: float, rows: int = 0, nbytes: int = 0, error: bool = False):
+    neo4j_seconds.observe(name, value=seconds)
+    if error:
+        neo4j_errors.inc(name)
+    else:
+        neo4j_rows.inc(name, amount=rows)
+        neo4j_bytes.inc(name, amount=nbytes)
+    add_timing("neo4j", seconds)
+
+
+def record_llm(purpose: str, seconds: float):
+    llm_seconds.observe(purpose, value=seconds)
+    add_timing("llm", seconds)
+
+
+# Server-Timing entries that also say how many calls they add up
+_COUNTED = {"neo4j": ("query", "queries"), "llm": ("call", "calls")}
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = []
+    for name, (seconds, count) in timings.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if name in _COUNTED:
+            noun = _COUNTED[name][count != 1]
+            part += f';desc="{count} {noun}"'
+        parts.append(part)
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: collects the request's timings, adds the Server-Timing
+    header, and records the request in conductor_http_request_seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: dict = {}
+        token = _timings.set(timings)  # sync routes run on a copy of this context
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            # Route templates, not raw paths, so labels stay bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_seconds.observe(
+                scope["method"], route, str(status), value=time.perf_counter() - start
+            )
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+"""
+Compact graph-context encoding for the response prompt.
+
+Route context dominates the prompt, and so input tokens and prefill
+latency. The helpers here keep it small:
+- values shared by every row (origin, destination, carrier) are stated once
+- long stop lists are cut to the segment the question is about (plus termini)
+- a return direction that mirrors the outbound one isn't repeated
+- each intent has a token budget; whole lines past it are dropped
+"""
+
+import re
+import threading
+
+from conductor.matching.transliterate import to_ascii
+
+# Estimated tokens of graph context per intent; lines past the budget are dropped
+CONTEXT_TOKEN_BUDGETS = {
+    "route_find": 300,
+    "bus_info": 250,
+    "stop_info": 200,
+    "nearby_stops": 100,
+    "general": 60,
+}
+DEFAULT_TOKEN_BUDGET = 200
+
+# Stop lists longer than this are cut down to the relevant segment
+MAX_LISTED_STOPS = 12
+# Stops kept on each side of a stop the question mentions
+SEGMENT_RADIUS = 3
+# Stops kept at each end when the question mentions none
+HEAD_TAIL_STOPS = 4
+# Buses listed for a stop before "+N"
+MAX_LISTED_BUSES = 15
+# Shortest word that can identify a stop ("m/st", "küç." split into shorter ones)
+MIN_MATCH_WORD = 4
+# Words shared by many stop names (ASCII): street, avenue, metro, square, settlement, ...
+GENERIC_STOP_WORDS = frozenset({
+    "kucesi", "prospekti", "sossesi", "metro", "metrosu", "stansiyasi", "meydani",
+    "dairesi", "qesebesi", "mehellesi", "bazari", "parki", "yolu", "dalan", "dongesi",
+})
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), matching the stub backend's estimate."""
+    return (len(text) + 3) // 4
+
+
+def cap_tokens(text: str, budget: int) -> tuple[str, bool]:
+    """Drop whole trailing lines until `text` fits `budget`. Returns (text, truncated)."""
+    if estimate_tokens(text) <= budget:
+        return text, False
+    lines = text.split("\n")
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if kept and used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    dropped = len(lines) - len(kept)
+    return "\n".join(kept) + f"\n… (+{dropped} sətir)", True
+
+
+def shared(rows: list[dict], key: str):
+    """The value of `key` if every row has the same one, else None."""
+    values = {r.get(key) for r in rows}
+    return values.pop() if len(values) == 1 else None
+
+
+def dedupe_consecutive(names: list[str]) -> list[str]:
+    """Collapse runs of the same name (a stop's platforms on both sides of the road)."""
+    return [n for i, n in enumerate(names) if i == 0 or n != names[i - 1]]
+
+
+def _words(text: str) -> list[str]:
+    """ASCII words of `text` that are long and specific enough to identify a stop."""
+    return [
+        w for w in re.split(r"[\W_]+", to_ascii(text))
+        if len(w) >= MIN_MATCH_WORD and w not in GENERIC_STOP_WORDS
+    ]
+
+
+def mentioned_stops(names: list[str], question: str) -> set[int]:
+    """
+    Indices of stops the question refers to. Words are compared by prefix, in
+    ASCII, so inflected forms match ("Gənclikdən" → "Gənclik m/st").
+    """
+    q_words = _words(question)
+    if not q_words:
+        return set()
+    hits = set()
+    for i, name in enumerate(names):
+        for w in _words(name):
+            if any(q.startswith(w) or w.startswith(q) for q in q_words):
+                hits.add(i)
+                break
+    return hits
+
+
+def compact_stop_list(names: list[str], question: str = "") -> str:
+    """
+    Stop names joined with "→". Long lists keep the termini and either the
+    segment around the stops the question mentions, or the first and last few.
+    Skipped runs become "… (N)".
+    """
+    names = dedupe_consecutive(names)
+    if len(names) <= MAX_LISTED_STOPS:
+        return " → ".join(names)
+
+    hits = mentioned_stops(names, question)
+    if hits:
+        keep = {0, len(names) - 1}
+        for i in hits:
+            keep.update(range(max(0, i - SEGMENT_RADIUS), min(len(names), i + SEGMENT_RADIUS + 1)))
+    else:
+        keep = set(range(HEAD_TAIL_STOPS)) | set(range(len(names) - HEAD_TAIL_STOPS, len(names)))
+
+    parts, skipped = [], 0
+    for i, name in enumerate(names):
+        if i in keep:
+            if skipped:
+                parts.append(f"… ({skipped})")
+                skipped = 0
+            parts.append(name)
+        else:
+            skipped += 1
+    return " → ".join(parts)
+
+
+class ContextStats:
+    """Estimated context tokens per intent, as actually sent (after capping)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._intents: dict[str, list] = {}  # intent → [requests, tokens, max, truncated]
+
+    def record(self, intent: str, tokens: int, truncated: bool):
+        with self._lock:
+            s = self._intents.setdefault(intent, [0, 0, 0, 0])
+            s[0] += 1
+            s[1] += tokens
+            s[2] = max(s[2], tokens)
+            s[3] += truncated
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                intent: {
+                    "requests": n,
+                    "avgTokens": round(total / n, 1),
+                    "maxTokens": peak,
+                    "truncated": truncated,
+                    "budget": CONTEXT_TOKEN_BUDGETS.get(intent, DEFAULT_TOKEN_BUDGET),
+                }
+                for intent, (n, total, peak, truncated) in self._intents.items()
+            }
+
+
+context_stats = ContextStats()
+
+
+def fit_context(intent: str | None, context: str) -> str:
+    """Cap `context` to the intent's token budget and record its size."""
+    if intent is None:
+        return context
+    budget = CONTEXT_TOKEN_BUDGETS.get(intent, DEFAULT_TOKEN_BUDGET)
+    context, truncated = cap_tokens(context, budget)
+    context_stats.record(intent, estimate_tokens(context), truncated)
+    return context
@@ -1,56 +1,78 @@
 """LLM response generation — takes graph context + user query → Azerbaijani response."""
 
-import time
-import httpx
-from google import genai
-from google.genai.errors import ClientError
-from conductor.config import GEMINI_API_KEY, MODEL_NAME, DISABLE_SSL_VERIFY
+from conductor.budget import DeadlineExceeded, current_budget, stage
+from conductor.config import GENERATE_TIMEOUT_SECONDS
+from conductor.llm.gateway import gateway
+from conductor.rag.context import fit_context, shared
+from conductor.singleflight import SingleFlight, make_key
 from conductor.rag.prompts import (
     SYSTEM_PROMPT,
     ROUTE_CONTEXT_TEMPLATE,
     NO_ROUTE_CONTEXT,
     LOCATION_REQUEST,
+    FALLBACK_REPLY,
+    BUSY_REPLY,
 )
 
-_client = None
+# Intents whose graph context reads well enough to be shown as the reply
+_TEMPLATED_INTENTS = ("route_find", "bus_info", "stop_info", "nearby_stops")
 
+# Coalesces identical generations without real history (e.g. many users asking the same route)
+flight = SingleFlight()
 
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(
-            api_key=GEMINI_API_KEY,
-            http_options={"api_version": "v1beta"},
-        )
-        if DISABLE_SSL_VERIFY:
-            _client._api_client._httpx_client = httpx.Client(verify=False)
-    return _client
+
+def _endpoints(routes: list[dict]) -> tuple[list[str], str | None, str | None]:
+    """Header lines for an origin/destination shared by every route, and those shared values."""
+    origin = shared(routes, "originStopName")
+    dest = shared(routes, "destStopName")
+    header = []
+    if origin and dest:
+        header.append(f"Min: {origin} | Düş: {dest}")
+    elif origin or dest:
+        header.append(f"Min: {origin}" if origin else f"Düş: {dest}")
+    return header, origin, dest
 
 
 def _format_direct_routes(routes: list[dict]) -> str:
-    lines = ["Birbaşa marşrutlar tapıldı:\n"]
+    lines = ["Birbaşa marşrutlar:"]
+    header, origin, dest = _endpoints(routes)
+    carrier = shared(routes, "carrier")
+    payment = shared(routes, "paymentType")
+    if carrier:
+        header.append(f"Daşıyıcı: {carrier}")
+    if payment:
+        header.append(f"Ödəniş: {payment}")
+    lines += header
     for i, r in enumerate(routes, 1):
-        lines.append(
-            f"{i}. Avtobus #{r['busNumber']} ({r.get('carrier', '')})\n"
-            f"   Min: {r['originStopName']} → Düş: {r['destStopName']}\n"
-            f"   Dayanacaq sayı: {r.get('stopCount', '?')}\n"
-            f"   Qiymət: {r.get('tariffStr', '?')} | Ödəniş: {r.get('paymentType', '?')}"
-        )
+        parts = [f"#{r['busNumber']}" + ("" if carrier or not r.get("carrier") else f" ({r['carrier']})")]
+        if not (origin and dest):
+            parts.append(f"{r['originStopName']} → {r['destStopName']}")
+        parts.append(f"{r.get('stopCount', '?')} dayanacaq")
+        if r.get("tariffStr"):
+            parts.append(r["tariffStr"])
+        if not payment and r.get("paymentType"):
+            parts.append(r["paymentType"])
+        lines.append(f"{i}. " + ", ".join(parts))
     return "\n".join(lines)
 
 
 def _format_transfer_routes(routes: list[dict]) -> str:
-    lines = ["Köçürməli marşrutlar tapıldı:\n"]
+    lines = ["Köçürməli marşrutlar:"]
+    header, origin, dest = _endpoints(routes)
+    lines += header
     for i, r in enumerate(routes, 1):
-        lines.append(
-            f"{i}. Avtobus #{r['bus1Number']} → piyada → Avtobus #{r['bus2Number']}\n"
-            f"   Min: {r['originStopName']}\n"
-            f"   Köçürmə: {r['transferStop1Name']} → {r['transferStop2Name']} "
-            f"(piyada ~{r.get('walkingMeters', 0):.0f}m, ~{r.get('walkingMinutes', 0):.0f} dəq)\n"
-            f"   Düş: {r['destStopName']}\n"
-            f"   Avtobus 1: #{r['bus1Number']} ({r.get('bus1Carrier', '')}) — {r.get('bus1Tariff', '?')}\n"
-            f"   Avtobus 2: #{r['bus2Number']} ({r.get('bus2Carrier', '')}) — {r.get('bus2Tariff', '?')}"
-        )
+        walk = f"piyada ~{r.get('walkingMeters', 0):.0f}m, ~{r.get('walkingMinutes', 0):.0f} dəq"
+        transfer = r["transferStop1Name"]
+        if r["transferStop2Name"] != transfer:
+            transfer += f" → {r['transferStop2Name']}"
+        line = f"{i}. #{r['bus1Number']} → #{r['bus2Number']}"
+        if not origin:
+            line += f", min: {r['originStopName']}"
+        line += f", köçürmə: {transfer} ({walk})"
+        if not dest:
+            line += f", düş: {r['destStopName']}"
+        line += f", {r.get('bus1Tariff', '?')} + {r.get('bus2Tariff', '?')}"
+        lines.append(line)
     return "\n".join(lines)
 
 
@@ -70,13 +92,59 @@ def generate_response(
     user_message: str,
     context: str,
     conversation_history: list[dict] | None = None,
+    intent: str | None = None,
 ) -> str:
     """
     Generate a response using Gemini with graph context.
     conversation_history: list of {"role": "user"|"model", "parts": [{"text": "..."}]}
+    intent: caps the context to that intent's token budget (see rag/context.py).
+    Calls whose history is just the greeting, and that have identical input
+    and greeting, share one in-flight Gemini request.
+    Inside a request budget, a generation that runs out of time is replaced by
+    a templated reply built from the context.
     """
-    client = _get_client()
+    context = fit_context(intent, context)
+    try:
+        with stage("generate", GENERATE_TIMEOUT_SECONDS):
+            greeting = _greeting(conversation_history)
+            if greeting is not None:
+                # The greeting is part of the key: one with the user's nearby
+                # stops must not be shared with other sessions
+                key = make_key("generate_response", user_message, context, greeting)
+                return flight.do(key, _generate, user_message, context, conversation_history)
+            return _generate(user_message, context, conversation_history)
+    except DeadlineExceeded:
+        budget = current_budget()
+        if budget is None:
+            raise
+        budget.fallback("generate")
+        return templated_reply(intent, context)
+
+
+def _greeting(history: list[dict] | None) -> str | None:
+    """
+    Text of the history if it holds only bot turns (the session greeting),
+    else None. Such a call is a first question and may be coalesced; the
+    greeting itself still goes to the model.
+    """
+    history = history or []
+    if any(turn.get("role") != "model" for turn in history):
+        return None
+    return "\n".join(part.get("text", "") for turn in history for part in turn.get("parts", []))
+
 
+def templated_reply(intent: str | None, context: str) -> str:
+    """Reply without the LLM: the graph context itself, or a busy message."""
+    if intent in _TEMPLATED_INTENTS:
+        return FALLBACK_REPLY.format(context=context)
+    return BUSY_REPLY
+
+
+def _generate(
+    user_message: str,
+    context: str,
+    conversation_history: list[dict] | None,
+) -> str:
     prompt = ROUTE_CONTEXT_TEMPLATE.format(
         context=context, question=user_message
     )
@@ -87,23 +155,13 @@ def generate_response(
         contents.extend(conversation_history)
     contents.append({"role": "user", "parts": [{"text": prompt}]})
 
-    for attempt in range(2):
-        try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=contents,
-                config=genai.types.GenerateContentConfig(
-                    system_instruction=SYSTEM_PROMPT,
-                    temperature=0.3,
-                    max_output_tokens=1024,
-                ),
-            )
-            return response.text.strip()
-        except ClientError as e:
-            if e.code == 429 and attempt == 0:
-                time.sleep(15)
-                continue
-            raise
+    return gateway.generate(
+        "response",
+        contents,
+        system_instruction=SYSTEM_PROMPT,
+        temperature=0.3,
+        max_output_tokens=1024,
+    )
 
 
 def generate_simple_response(
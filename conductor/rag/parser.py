@@ -2,27 +2,10 @@
 
 import re
 import json
-import time
-import httpx
-from google import genai
-from google.genai.errors import ClientError
-from conductor.config import GEMINI_API_KEY, MODEL_NAME, DISABLE_SSL_VERIFY
-from conductor.rag.prompts import INTENT_PARSE_PROMPT
-
-
-_client = None
-
-
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(
-            api_key=GEMINI_API_KEY,
-            http_options={"api_version": "v1beta"},
-        )
-        if DISABLE_SSL_VERIFY:
-            _client._api_client._httpx_client = httpx.Client(verify=False)
-    return _client
+from conductor.budget import DeadlineExceeded, current_budget, stage
+from conductor.config import PARSE_TIMEOUT_SECONDS
+from conductor.llm.gateway import gateway
+from conductor.rag.prompts import INTENT_PARSE_MESSAGE, INTENT_PARSE_PROMPT
 
 
 # ── Local pre-parser (saves Gemini calls for obvious intents) ──
@@ -79,41 +62,60 @@ def _local_parse(message: str) -> dict | None:
     return None  # not sure — fall through to Gemini
 
 
+_ANY_BUS_NUMBER_RE = re.compile(r"(?:^|[\s#])(\d{1,3}[a-zA-Z]?)(?=\s|$|[?.!,])")
+_FROM_TO_RE = re.compile(r"(.+?)(?:dan|dən|tan|tən)\s+(.+?)(?:\s+(?:necə|nece|hansı|hansi|getmək|getmek)\b.*)?[?.!]*$")
+
+
+def _fallback_parse(message: str) -> dict:
+    """
+    Best-effort local parse for when the LLM is out of time budget. Less
+    careful than _local_parse, but always answers.
+    """
+    m = message.strip().lower()
+    bus_match = _ANY_BUS_NUMBER_RE.search(m)
+    if bus_match and ("avtobus" in m or "#" in m or "marşrut" in m or "marsrut" in m):
+        return {"intent": "bus_info", "entities": {"bus_number": bus_match.group(1)}}
+    route_match = _FROM_TO_RE.match(m)
+    if route_match:
+        origin, destination = route_match.group(1).strip(), route_match.group(2).strip()
+        if any(w in origin for w in _LOCATION_WORDS):
+            origin = "user_location"
+        return {"intent": "route_find", "entities": {"origin": origin, "destination": destination}}
+    return {"intent": "general", "entities": {}}
+
+
 # ── Main parser ──
 
 def parse_intent(message: str) -> dict:
     """
     Parse user message into intent + entities.
-    Tries local parsing first, falls back to Gemini.
+    Tries local parsing first, falls back to Gemini; if Gemini doesn't answer
+    within the parse stage's budget, a lenient local parse is used instead.
     """
-    # Try local parsing first (no API call)
-    local = _local_parse(message)
-    if local is not None:
-        return local
-
-    # Fall back to Gemini with retry on rate limit
-    return _parse_with_gemini(message)
-
-
-def _parse_with_gemini(message: str, retries: int = 1) -> dict:
-    """Parse intent via Gemini, with one retry on rate limit."""
-    client = _get_client()
-    prompt = INTENT_PARSE_PROMPT.format(message=message)
-
-    for attempt in range(1 + retries):
-        try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=prompt,
-            )
-            break
-        except ClientError as e:
-            if e.code == 429 and attempt < retries:
-                time.sleep(15)
-                continue
+    try:
+        with stage("parse", PARSE_TIMEOUT_SECONDS):
+            # Try local parsing first (no API call)
+            local = _local_parse(message)
+            if local is not None:
+                return local
+
+            # Fall back to the LLM (the gateway retries once on rate limit)
+            return _parse_with_gemini(message)
+    except DeadlineExceeded:
+        budget = current_budget()
+        if budget is None:
             raise
+        budget.fallback("parse")
+        return _fallback_parse(message)
+
 
-    text = response.text.strip()
+def _parse_with_gemini(message: str) -> dict:
+    """Parse intent via the LLM gateway."""
+    text = gateway.generate(
+        "intent",
+        INTENT_PARSE_MESSAGE.format(message=message),
+        system_instruction=INTENT_PARSE_PROMPT,
+    )
 
     # Strip markdown code fences if present
     if text.startswith("```"):
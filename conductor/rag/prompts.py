@@ -15,6 +15,7 @@ Qaydalar:
 - m/st = metro stansiyası, qəs. = qəsəbəsi
 """
 
+# Static, so the gateway can cache it provider-side; the message goes in INTENT_PARSE_MESSAGE
 INTENT_PARSE_PROMPT = """İstifadəçinin mesajını analiz et və JSON formatında cavab ver.
 
 Mümkün intent-lər:
@@ -36,17 +37,17 @@ Yalnız JSON cavab ver, başqa heç nə yazma.
 
 Nümunə:
 İstifadəçi: "Gənclik metrosuna hansı avtobus gedir?"
-{{"intent": "route_find", "entities": {{"origin": "user_location", "destination": "gənclik metrosu"}}}}
+{"intent": "route_find", "entities": {"origin": "user_location", "destination": "gənclik metrosu"}}
 
 İstifadəçi: "65 nömrəli avtobus harada dayanır?"
-{{"intent": "bus_info", "entities": {{"bus_number": "65"}}}}
+{"intent": "bus_info", "entities": {"bus_number": "65"}}
 
 İstifadəçi: "Buradan 28 Maya necə gedə bilərəm?"
-{{"intent": "route_find", "entities": {{"origin": "user_location", "destination": "28 may"}}}}
-
-İstifadəçi mesajı: {message}
+{"intent": "route_find", "entities": {"origin": "user_location", "destination": "28 may"}}
 """
 
+INTENT_PARSE_MESSAGE = "İstifadəçi mesajı: {message}"
+
 ROUTE_CONTEXT_TEMPLATE = """Aşağıdakı marşrut məlumatlarından istifadə edərək istifadəçiyə cavab ver.
 
 {context}
@@ -61,6 +62,13 @@ Son nöqtə: {destination}
 İstifadəçiyə bunu düzgün bildir və mümkün alternativlər təklif et (məsələn metro, taksi).
 """
 
+# Templated replies for when the LLM is out of latency budget
+FALLBACK_REPLY = """Cavabı tam hazırlamağa vaxt çatmadı. Tapdığım məlumat:
+
+{context}"""
+
+BUSY_REPLY = "Sorğu çox uzun çəkdi. Zəhmət olmasa, bir az sonra yenidən cəhd edin."
+
 LOCATION_REQUEST = "Sizin hazırkı yerinizi bilmirəm. Zəhmət olmasa, harada olduğunuzu yazın və ya geolokasiya göndərin."
 
 GREETING = "Salam! Mən Conductor — Bakı avtobus köməkçisiyəm. Sizə necə kömək edə bilərəm?"
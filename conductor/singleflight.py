@@ -0,0 +1,105 @@
+"""Single-flight request coalescing — identical concurrent calls share one computation."""
+
+import copy
+import threading
+
+from conductor.budget import DeadlineExceeded, time_left
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one in-flight execution.
+
+    The first caller (the leader) runs the function; callers arriving while it
+    is running block and receive the same result (or exception). Nothing is
+    cached once the call completes. Shared results must be treated as read-only.
+    Waiters inside a request budget stop waiting when it runs out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            # Waiters give up when their own request budget runs out
+            left = time_left()
+            if not call.done.wait(None if left is None else max(0.0, left)):
+                raise DeadlineExceeded("gave up waiting for a coalesced call")
+            if call.error is not None:
+                raise _copy_error(call.error) from call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(c.waiters for c in self._calls.values())
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "inFlight": in_flight,
+            "waiting": waiting,
+        }
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    """
+    A fresh exception for one waiter. Raising the leader's own object in every
+    waiter thread would have them all rewrite its __traceback__. The copy keeps
+    the type, so callers' `except RateLimitError` etc. still apply.
+    """
+    try:
+        copied = copy.copy(error)
+    except Exception:
+        copied = None
+    if not isinstance(copied, BaseException) or copied is error:
+        return RuntimeError(f"coalesced call failed: {error!r}")
+    return copied
+
+
+def make_key(name: str, *args, **kwargs) -> tuple:
+    """Build a hashable key from a call name and its (possibly list-valued) arguments."""
+    return (name, _freeze(args), _freeze(sorted(kwargs.items())))
+
+
+def _freeze(val):
+    if isinstance(val, (list, tuple)):
+        return tuple(_freeze(v) for v in val)
+    if isinstance(val, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in val.items()))
+    return val
@@ -0,0 +1,61 @@
+"""Cold-start tracking — readiness state and a per-phase startup timing report."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Durations of the phases between process import and the API being ready
+    (imports, Neo4j connectivity, index load), plus lazy work done on first
+    use (e.g. the LLM client). Phases recorded more than once accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.status = "starting"  # starting → ready
+        self.error: str | None = None  # last warm-up failure while starting
+        self.phases: dict[str, float] = {}
+        self.ready_seconds: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = round(self.phases.get(name, 0.0) + seconds, 3)
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def mark_ready(self):
+        self.ready_seconds = round(time.perf_counter() - self.started, 3)
+        self.status = "ready"
+        self.error = None
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = dict(self.phases)
+        return {
+            "status": self.status,
+            "error": self.error,
+            "readySeconds": self.ready_seconds,
+            "phases": phases,
+        }
+
+    def print_report(self):
+        print(f"Startup: ready in {self.ready_seconds:.2f}s")
+        for name, seconds in self.phases.items():
+            print(f"  {name:<14} {seconds:>7.3f}s")
+
+
+# Created on first import of the package — main.py imports this first
+startup = StartupTimer()
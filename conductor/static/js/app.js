@@ -67,96 +67,129 @@
         map.setView([lat, lng], 15);
     }
 
-    // All-stops layer (persistent, loaded once)
-    let clusterGroup = null;
-
-    function loadAllStops() {
-        API.getAllStops().then((stops) => {
-            if (!stops || stops.length === 0) return;
-
-            clusterGroup = L.markerClusterGroup({
-                maxClusterRadius: 40,
-                spiderfyOnMaxZoom: true,
-                showCoverageOnHover: false,
-                disableClusteringAtZoom: 16,
-                iconCreateFunction: function (cluster) {
-                    const count = cluster.getChildCount();
-                    let size = "small";
-                    if (count > 50) size = "large";
-                    else if (count > 20) size = "medium";
-                    return L.divIcon({
-                        html: `<div class="cluster-icon cluster-icon--${size}"><span>${count}</span></div>`,
-                        className: "stop-cluster",
-                        iconSize: [40, 40],
-                    });
-                },
-            });
+    // Viewport stops layer — server-side clusters for the visible bbox only
+    let stopsLayer = null;
+    let viewportRequest = null;
+
+    const defaultIcon = L.divIcon({
+        className: "stop-marker",
+        html: '<div class="stop-dot"></div>',
+        iconSize: [18, 18],
+        iconAnchor: [9, 9],
+    });
 
-            const defaultIcon = L.divIcon({
-                className: "stop-marker",
-                html: '<div class="stop-dot"></div>',
-                iconSize: [18, 18],
-                iconAnchor: [9, 9],
-            });
+    const hubIcon = L.divIcon({
+        className: "stop-marker",
+        html: '<div class="stop-dot stop-dot--hub"></div>',
+        iconSize: [22, 22],
+        iconAnchor: [11, 11],
+    });
 
-            const hubIcon = L.divIcon({
-                className: "stop-marker",
-                html: '<div class="stop-dot stop-dot--hub"></div>',
-                iconSize: [22, 22],
-                iconAnchor: [11, 11],
-            });
+    function clusterIcon(count) {
+        let size = "small";
+        if (count > 50) size = "large";
+        else if (count > 20) size = "medium";
+        return L.divIcon({
+            html: `<div class="cluster-icon cluster-icon--${size}"><span>${count}</span></div>`,
+            className: "stop-cluster",
+            iconSize: [40, 40],
+        });
+    }
+
+    function loadViewportStops() {
+        if (!stopsLayer) {
+            stopsLayer = L.layerGroup().addTo(map);
+            map.on("moveend", loadViewportStops);
+        }
 
-            stops.forEach((stop) => {
-                if (!stop.latitude || !stop.longitude) return;
-                const icon = stop.isTransportHub ? hubIcon : defaultIcon;
-                const marker = L.marker([stop.latitude, stop.longitude], { icon });
+        // Drop the in-flight request if the user keeps panning
+        if (viewportRequest) viewportRequest.abort();
+        viewportRequest = new AbortController();
 
-                // Lazy-load bus list on popup open
-                marker.bindPopup(() => buildStopPopup(stop), { minWidth: 180, maxWidth: 280 });
+        const zoom = map.getZoom();
+        API.getStopClusters(map.getBounds().toBBoxString(), zoom, viewportRequest.signal)
+            .then((data) => {
+                if (!data) return;
+                stopsLayer.clearLayers();
 
-                clusterGroup.addLayer(marker);
-            });
+                data.clusters.forEach((c) => {
+                    L.marker([c.lat, c.lng], { icon: clusterIcon(c.count) })
+                        .on("click", () => map.setView([c.lat, c.lng], Math.min(zoom + 2, 18)))
+                        .addTo(stopsLayer);
+                });
 
-            map.addLayer(clusterGroup);
-        });
+                data.stops.forEach((stop) => {
+                    const icon = stop.isTransportHub ? hubIcon : defaultIcon;
+                    L.marker([stop.latitude, stop.longitude], { icon })
+                        // Lazy-load bus list on popup open
+                        .bindPopup(() => buildStopPopup(stop), { minWidth: 180, maxWidth: 280 })
+                        .addTo(stopsLayer);
+                });
+            })
+            .catch((err) => {
+                if (err.name !== "AbortError") console.error("Stops layer error:", err);
+            });
     }
 
+    // stopId → buses, filled by /api/stops/nearby/buses so popups need no extra fetch
+    const stopBuses = new Map();
+
     function buildStopPopup(stop) {
         const container = document.createElement("div");
         container.className = "stop-popup";
         container.innerHTML =
             `<div class="stop-popup__name">${escHtml(stop.name || "Dayanacaq")}</div>` +
             (stop.code ? `<div class="stop-popup__code">Kod: ${escHtml(stop.code)}</div>` : "") +
+            (stop.distanceMeters ? `<div class="stop-popup__code">${Math.round(stop.distanceMeters)}m</div>` : "") +
             `<div class="stop-popup__buses" id="popup-buses-${stop.id}">Yüklənir...</div>`;
 
-        // Fetch buses asynchronously
-        API.getBusesAtStop(stop.id).then((buses) => {
-            const el = container.querySelector(`#popup-buses-${stop.id}`);
-            if (!el) return;
-            if (buses.length === 0) {
-                el.textContent = "Avtobus tapılmadı";
-                return;
-            }
-            el.innerHTML = buses
-                .map((b) =>
-                    `<span class="stop-popup__bus" data-bus="${b.number}">#${escHtml(b.number)}</span>`
-                )
-                .join(" ");
-
-            // Make bus chips clickable
-            el.querySelectorAll(".stop-popup__bus").forEach((chip) => {
-                chip.addEventListener("click", () => {
-                    const num = chip.dataset.bus;
-                    chatInput.value = `${num} nömrəli avtobus`;
-                    sendMessage(chatInput.value);
-                    map.closePopup();
-                });
+        const el = container.querySelector(`#popup-buses-${stop.id}`);
+        if (stopBuses.has(stop.id)) {
+            renderPopupBuses(el, stopBuses.get(stop.id));
+        } else {
+            // Fetch buses asynchronously
+            API.getBusesAtStop(stop.id).then((buses) => {
+                stopBuses.set(stop.id, buses);
+                renderPopupBuses(el, buses);
             });
-        });
+        }
 
         return container;
     }
 
+    function renderPopupBuses(el, buses) {
+        if (buses.length === 0) {
+            el.textContent = "Avtobus tapılmadı";
+            return;
+        }
+        el.innerHTML = buses
+            .map((b) =>
+                `<span class="stop-popup__bus" data-bus="${escHtml(b.number)}">#${escHtml(b.number)}</span>`
+            )
+            .join(" ");
+
+        // Make bus chips clickable
+        el.querySelectorAll(".stop-popup__bus").forEach((chip) => {
+            chip.addEventListener("click", () => {
+                const num = chip.dataset.bus;
+                chatInput.value = `${num} nömrəli avtobus`;
+                sendMessage(chatInput.value);
+                map.closePopup();
+            });
+        });
+    }
+
+    // Nearby stops with their buses in one request (replaces one fetch per stop)
+    function loadNearbyStops(lat, lng) {
+        return API.getNearbyStopsWithBuses(lat, lng).then((stops) => {
+            stops.forEach((s) => stopBuses.set(s.id, s.buses || []));
+            if (stops.length > 0) {
+                state.nearestStops = stops;
+                showStopsOnMap(stops);
+            }
+        });
+    }
+
     function showStopsOnMap(stops, fitBounds = true) {
         stopMarkers.forEach((m) => map.removeLayer(m));
         stopMarkers = [];
@@ -173,11 +206,12 @@
         stops.forEach((stop) => {
             if (!stop.latitude || !stop.longitude) return;
             const marker = L.marker([stop.latitude, stop.longitude], { icon: highlightIcon })
-                .addTo(map)
-                .bindPopup(
-                    `<b>${escHtml(stop.name || "Dayanacaq")}</b>` +
-                    (stop.distanceMeters ? `<br>${Math.round(stop.distanceMeters)}m` : "")
-                );
+                .addTo(map);
+            if (stop.id != null) {
+                marker.bindPopup(() => buildStopPopup(stop), { minWidth: 180, maxWidth: 280 });
+            } else {
+                marker.bindPopup(`<b>${escHtml(stop.name || "Dayanacaq")}</b>`);
+            }
             stopMarkers.push(marker);
         });
 
@@ -192,11 +226,63 @@
         }
     }
 
+    // Route geometry — Google encoded polylines from the API
+    let routeLines = [];
+    const ROUTE_COLORS = ["#1a73e8", "#e8710a", "#188038", "#a142f4"];
+
+    function decodePolyline(encoded) {
+        const points = [];
+        let index = 0, lat = 0, lng = 0;
+        while (index < encoded.length) {
+            const deltas = [];
+            for (let k = 0; k < 2; k++) {
+                let shift = 0, result = 0, b;
+                do {
+                    b = encoded.charCodeAt(index++) - 63;
+                    result |= (b & 0x1f) << shift;
+                    shift += 5;
+                } while (b >= 0x20);
+                deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+            }
+            lat += deltas[0];
+            lng += deltas[1];
+            points.push([lat / 1e5, lng / 1e5]);
+        }
+        return points;
+    }
+
+    function showRouteShapes(shapes) {
+        routeLines.forEach((l) => map.removeLayer(l));
+        routeLines = [];
+        if (!shapes || shapes.length === 0) return;
+
+        shapes.forEach((shape, i) => {
+            const line = L.polyline(decodePolyline(shape.polyline), {
+                color: ROUTE_COLORS[i % ROUTE_COLORS.length],
+                weight: 4,
+                opacity: 0.8,
+            })
+                .addTo(map)
+                .bindPopup(`<b>#${escHtml(shape.busNumber || "")}</b>`);
+            routeLines.push(line);
+        });
+    }
+
     function resizeMap() {
         if (map) setTimeout(() => map.invalidateSize(), 120);
     }
 
     // ── API ──────────────────────────────────────────────────
+    // Retries while the server is still warming up (503 + Retry-After)
+    async function apiFetch(url, options, attempts = 12) {
+        for (let i = 1; ; i++) {
+            const res = await fetch(url, options);
+            if (res.status !== 503 || i >= attempts) return res;
+            const wait = Number(res.headers.get("Retry-After")) || 5;
+            await new Promise((resolve) => setTimeout(resolve, wait * 1000));
+        }
+    }
+
     const API = {
         async startSession(lat, lng) {
             const body = {};
@@ -204,7 +290,7 @@
                 body.latitude = lat;
                 body.longitude = lng;
             }
-            const res = await fetch("/api/session/start", {
+            const res = await apiFetch("/api/session/start", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify(body),
@@ -214,18 +300,23 @@
         },
 
         async chat(sessionId, message) {
-            const res = await fetch("/api/chat", {
+            const res = await apiFetch("/api/chat", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ session_id: sessionId, message }),
+                body: JSON.stringify({ session_id: sessionId, message, zoom: map ? map.getZoom() : null }),
             });
             if (res.status === 404) return { expired: true };
+            if (res.status === 429 || res.status === 503) {
+                // Rate limited, or still shed after retries: show the server's message
+                const body = await res.json().catch(() => ({}));
+                return { reply: body.detail || "Zəhmət olmasa, bir az sonra yenidən cəhd edin.", routes: [] };
+            }
             if (!res.ok) throw new Error(`Chat failed: ${res.status}`);
             return res.json();
         },
 
         async updateLocation(sessionId, lat, lng) {
-            const res = await fetch("/api/session/location", {
+            const res = await apiFetch("/api/session/location", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ session_id: sessionId, latitude: lat, longitude: lng }),
@@ -235,20 +326,44 @@
         },
 
         async getBusInfo(number) {
-            const res = await fetch(`/api/bus/${encodeURIComponent(number)}`);
+            const zoom = map ? `?zoom=${map.getZoom()}` : "";
+            const res = await apiFetch(`/api/bus/${encodeURIComponent(number)}${zoom}`);
             if (!res.ok) return null;
             return res.json();
         },
 
         async getAllStops() {
-            const res = await fetch("/api/stops");
+            const res = await apiFetch("/api/stops");
+            if (!res.ok) return [];
+            // Column-oriented payload: parallel arrays of ids, names, coordinates
+            const cols = await res.json();
+            return (cols.ids || []).map((id, i) => ({
+                id,
+                name: cols.names[i],
+                code: cols.codes[i],
+                latitude: cols.lat[i],
+                longitude: cols.lng[i],
+                isTransportHub: cols.hub[i] === 1,
+            }));
+        },
+
+        async getStopClusters(bbox, zoom, signal) {
+            const params = new URLSearchParams({ bbox, zoom });
+            const res = await apiFetch(`/api/stops/clusters?${params}`, { signal });
+            if (!res.ok) return null;
+            return res.json();
+        },
+
+        async getNearbyStopsWithBuses(lat, lng) {
+            const params = new URLSearchParams({ lat, lng });
+            const res = await apiFetch(`/api/stops/nearby/buses?${params}`);
             if (!res.ok) return [];
             const data = await res.json();
             return data.stops || [];
         },
 
         async getBusesAtStop(stopId) {
-            const res = await fetch(`/api/stops/${stopId}/buses`);
+            const res = await apiFetch(`/api/stops/${stopId}/buses`);
             if (!res.ok) return [];
             const data = await res.json();
             return data.buses || [];
@@ -376,8 +491,8 @@
 
             addMessage(data.greeting, "bot");
 
-            if (state.nearestStops.length > 0) {
-                showStopsOnMap(state.nearestStops);
+            if (lat != null && lng != null) {
+                loadNearbyStops(lat, lng);
             }
 
             // Show suggestion chips after greeting
@@ -447,10 +562,13 @@
             showStopsOnMap(mapPoints);
         }
 
-        // For route_find results, try to fetch bus stops for map display
+        // For route_find results, draw the legs of the best route
         const firstRoute = data.routes[0];
         const busNumber = firstRoute.busNumber || firstRoute.bus1Number;
         if (busNumber && data.intent === "route_find") {
+            const legIds = [firstRoute.busId, firstRoute.bus1Id, firstRoute.bus2Id];
+            showRouteShapes((data.shapes || []).filter((s) => legIds.includes(s.busId)));
+
             API.getBusInfo(busNumber).then((info) => {
                 if (info && info.stops) {
                     showStopsOnMap(
@@ -463,12 +581,23 @@
                 }
             });
         }
+
+        // For bus_info results, draw the bus's route geometry
+        if (data.intent === "bus_info" && firstRoute.number) {
+            API.getBusInfo(firstRoute.number).then((info) => {
+                if (info && info.shapes) {
+                    showRouteShapes(
+                        info.shapes.map((s) => ({ ...s, busNumber: info.bus.number }))
+                    );
+                }
+            });
+        }
     }
 
     // ── Event Listeners ──────────────────────────────────────
     document.addEventListener("DOMContentLoaded", () => {
         initMap();
-        loadAllStops();
+        loadViewportStops();
 
         // Location modal — Allow
         btnAllowLocation.addEventListener("click", async () => {
@@ -527,9 +656,8 @@
                 setUserLocation(loc.lat, loc.lng);
                 if (state.sessionId) {
                     try {
-                        const data = await API.updateLocation(state.sessionId, loc.lat, loc.lng);
-                        state.nearestStops = data.nearest_stops || [];
-                        showStopsOnMap(state.nearestStops);
+                        await API.updateLocation(state.sessionId, loc.lat, loc.lng);
+                        await loadNearbyStops(loc.lat, loc.lng);
                         addMessage("Yeriniz yeniləndi.", "bot");
                     } catch (err) {
                         console.error("Location update error:", err);
@@ -0,0 +1,434 @@
+"""
+Tracing for individual slow chat turns.
+
+Metrics (conductor/metrics.py) show which stage is slow on average; a trace
+shows where one particular turn spent its time. Each chat turn is a trace
+whose spans cover the pipeline: _process_chat, the intent handler, each
+stop-matcher query, each Neo4j query and each LLM call.
+
+Traces are tail-sampled. Spans are collected in memory while the turn
+runs, and the trace is only exported if the turn took TRACE_SLOW_SECONDS or
+longer, failed, or falls in the TRACE_SAMPLE_RATE fraction. Export runs on
+a background thread: printed as a tree ("log") or sent as OTLP/HTTP JSON to
+an OpenTelemetry collector ("otlp"). With the default exporter ("none")
+nothing is recorded and span() is a no-op.
+
+A PROFILE_SAMPLE_RATE fraction of traced turns also runs under cProfile or
+tracemalloc (PROFILE_MODE). The capture is written to PROFILE_DIR only if
+the turn turns out slow. The profiler is enabled in the worker thread
+that runs the turn; up to Python 3.11 cProfile only sees that thread,
+while on 3.12+ it hooks every thread and allows one active profiler.
+tracemalloc is always process-wide, so allocation reports include other
+requests. Either way, at most one turn is profiled at a time.
+
+All settings can be changed at runtime (POST /api/admin/tracing).
+"""
+
+import collections
+import cProfile
+import os
+import queue
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+
+from conductor.config import (
+    OTEL_EXPORTER_OTLP_ENDPOINT,
+    OTEL_SERVICE_NAME,
+    PROFILE_DIR,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_RATE,
+    TRACE_EXPORTER,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOW_SECONDS,
+)
+
+EXPORTERS = ("none", "log", "otlp")
+PROFILE_MODES = ("off", "cprofile", "tracemalloc")
+
+# Exported traces listed in stats()
+RECENT_TRACES = 20
+# Traces waiting for the export thread; more are dropped rather than blocking requests
+EXPORT_QUEUE_SIZE = 100
+# Captures kept in PROFILE_DIR; the oldest are deleted first
+MAX_PROFILE_FILES = 50
+# Allocation sites listed in a tracemalloc report
+TRACEMALLOC_TOP = 30
+OTLP_TIMEOUT_SECONDS = 5
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.perf_counter_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start) / 1e9
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    def set(self, key: str, value):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        # Spans time with perf_counter; this maps them back to wall-clock time for export
+        self.wall_ns = time.time_ns()
+        self.perf_ns = time.perf_counter_ns()
+
+    def unix_ns(self, perf_ns: int) -> int:
+        return self.wall_ns + (perf_ns - self.perf_ns)
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_parent: ContextVar[str | None] = ContextVar("span", default=None)
+
+
+@contextmanager
+def span(name: str, /, **attributes):
+    """A child of the current span; a no-op outside a traced request."""
+    trace = _trace.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+    s = Span(name, _parent.get(), attributes)
+    token = _parent.set(s.span_id)
+    try:
+        yield s
+    except BaseException as e:
+        s.fail(e)
+        raise
+    finally:
+        s.end = time.perf_counter_ns()
+        _parent.reset(token)
+        trace.spans.append(s)
+
+
+class Tracer:
+    def __init__(self):
+        self.exporter = "none"
+        self.slow_seconds = TRACE_SLOW_SECONDS
+        self.sample_rate = TRACE_SAMPLE_RATE
+        self.profile_mode = "off"
+        self.profile_sample_rate = PROFILE_SAMPLE_RATE
+        self.profile_dir = PROFILE_DIR
+        try:
+            self.configure(exporter=TRACE_EXPORTER, profile_mode=PROFILE_MODE)
+        except ValueError as e:
+            print(f"Tracing config ignored: {e}")
+
+        self._queue: queue.Queue = queue.Queue(EXPORT_QUEUE_SIZE)
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._session: requests.Session | None = None
+        self.recent: collections.deque = collections.deque(maxlen=RECENT_TRACES)
+        self.traced = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+        self.profiles = 0
+        self.last_error: str | None = None
+
+    def configure(self, exporter: str | None = None, slow_seconds: float | None = None,
+                  sample_rate: float | None = None, profile_mode: str | None = None,
+                  profile_sample_rate: float | None = None) -> dict:
+        """Change settings at runtime; unknown exporters/modes raise ValueError."""
+        if exporter is not None:
+            if exporter not in EXPORTERS:
+                raise ValueError(f"exporter must be one of {', '.join(EXPORTERS)}")
+            self.exporter = exporter
+        if profile_mode is not None:
+            if profile_mode not in PROFILE_MODES:
+                raise ValueError(f"profile mode must be one of {', '.join(PROFILE_MODES)}")
+            self.profile_mode = profile_mode
+        if slow_seconds is not None:
+            self.slow_seconds = max(0.0, slow_seconds)
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        if profile_sample_rate is not None:
+            self.profile_sample_rate = min(1.0, max(0.0, profile_sample_rate))
+        return self.settings()
+
+    @contextmanager
+    def request(self, name: str, /, **attributes):
+        """Trace the enclosed block as one request (the root span)."""
+        if self.exporter == "none" or _trace.get() is not None:
+            with span(name, **attributes) as s:
+                yield s
+            return
+
+        trace = Trace()
+        root = Span(name, None, attributes)
+        trace_token = _trace.set(trace)
+        parent_token = _parent.set(root.span_id)
+        profile = self._start_profile()
+        try:
+            yield root
+        except BaseException as e:
+            root.fail(e)
+            raise
+        finally:
+            root.end = time.perf_counter_ns()
+            capture = self._stop_profile(profile)
+            _parent.reset(parent_token)
+            _trace.reset(trace_token)
+            trace.spans.append(root)
+            self._finish(trace, root, capture)
+
+    # ── Tail sampling ───────────────────────────────
+
+    def _finish(self, trace: Trace, root: Span, capture):
+        with self._stats_lock:
+            self.traced += 1
+        slow = root.seconds >= self.slow_seconds
+        if not (slow or root.error or random.random() < self.sample_rate):
+            return
+        root.set("slow", slow)
+        try:
+            self._queue.put_nowait((trace, root, capture if slow else None))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._export_loop, name="trace-export", daemon=True)
+                self._worker.start()
+
+    def _export_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            trace, root, capture = item
+            try:
+                if capture is not None:
+                    root.set("profile", self._write_profile(trace, capture))
+                if self.exporter == "otlp":
+                    self._export_otlp(trace)
+                elif self.exporter == "log":
+                    print(format_trace(trace))
+                self.exported += 1
+            except Exception as e:
+                self.export_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Trace export failed ({self.last_error})")
+            self.recent.append({
+                "traceId": trace.trace_id,
+                "name": root.name,
+                "seconds": round(root.seconds, 3),
+                "spans": len(trace.spans),
+                "error": root.error,
+                "attributes": dict(root.attributes),
+            })
+
+    # ── Profiling ───────────────────────────────────
+
+    def _start_profile(self):
+        if self.profile_mode == "off" or random.random() >= self.profile_sample_rate:
+            return None
+        # One capture at a time: tracemalloc is process-wide, and from 3.12 so is
+        # cProfile (sys.monitoring allows a single profiler). Up to 3.11,
+        # enable() only profiles the calling thread, i.e. this turn's worker.
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.profile_mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                return ("cprofile", profiler)
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            return ("tracemalloc", started)
+        except Exception as e:
+            self._profile_lock.release()
+            print(f"Profiling unavailable ({type(e).__name__}: {e})")
+            return None
+
+    def _stop_profile(self, profile):
+        if profile is None:
+            return None
+        kind, handle = profile
+        try:
+            if kind == "cprofile":
+                handle.disable()
+                return ("cprofile", handle)
+            snapshot = tracemalloc.take_snapshot()
+            if handle:  # leave tracing on if someone else started it
+                tracemalloc.stop()
+            return ("tracemalloc", snapshot)
+        finally:
+            self._profile_lock.release()
+
+    def _write_profile(self, trace: Trace, capture) -> str:
+        kind, data = capture
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(trace.wall_ns / 1e9))
+        base = os.path.join(self.profile_dir, f"{stamp}-{trace.trace_id[:12]}")
+        if kind == "cprofile":
+            path = base + ".prof"  # python -m pstats <file>, or snakeviz
+            data.dump_stats(path)
+        else:
+            path = base + ".tracemalloc.txt"
+            stats = data.statistics("lineno")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"Allocations still held at the end of trace {trace.trace_id}\n")
+                for stat in stats[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+        self.profiles += 1
+        self._prune_profiles()
+        return path
+
+    def _prune_profiles(self):
+        files = sorted(
+            (os.path.join(self.profile_dir, name) for name in os.listdir(self.profile_dir)),
+            key=os.path.getmtime,
+        )
+        for path in files[:-MAX_PROFILE_FILES]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ── OTLP export ─────────────────────────────────
+
+    def _export_otlp(self, trace: Trace):
+        if self._session is None:
+            self._session = requests.Session()
+        resp = self._session.post(
+            OTEL_EXPORTER_OTLP_ENDPOINT.rstrip("/") + "/v1/traces",
+            json=otlp_payload(trace),
+            timeout=OTLP_TIMEOUT_SECONDS,
+        )
+        resp.raise_for_status()
+
+    def settings(self) -> dict:
+        return {
+            "exporter": self.exporter,
+            "slowSeconds": self.slow_seconds,
+            "sampleRate": self.sample_rate,
+            "profileMode": self.profile_mode,
+            "profileSampleRate": self.profile_sample_rate,
+            "profileDir": self.profile_dir,
+        }
+
+    def stats(self) -> dict:
+        return {
+            **self.settings(),
+            "traced": self.traced,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "exportErrors": self.export_errors,
+            "profiles": self.profiles,
+            "lastError": self.last_error,
+            "recent": list(self.recent),
+        }
+
+    def close(self):
+        """Export what is queued (briefly) before shutdown."""
+        if self._worker is not None:
+            try:
+                self._queue.put(None, timeout=1)
+            except queue.Full:
+                return
+            self._worker.join(timeout=5)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+def otlp_payload(trace: Trace) -> dict:
+    """The trace as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    spans = []
+    for s in trace.spans:
+        entry = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,  # SERVER for the root, else INTERNAL
+            "startTimeUnixNano": str(trace.unix_ns(s.start)),
+            "endTimeUnixNano": str(trace.unix_ns(s.end)),
+            "attributes": [_attribute(k, v) for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+        }
+        if s.parent_id:
+            entry["parentSpanId"] = s.parent_id
+        spans.append(entry)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", OTEL_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "conductor"}, "spans": spans}],
+        }]
+    }
+
+
+def format_trace(trace: Trace) -> str:
+    """The trace as an indented tree, one span per line."""
+    children: dict[str | None, list[Span]] = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+    lines = [f"Trace {trace.trace_id}"]
+
+    def walk(parent_id: str | None, depth: int):
+        for s in sorted(children.get(parent_id, []), key=lambda s: s.start):
+            attrs = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+            error = f" ERROR {s.error}" if s.error else ""
+            offset = (s.start - trace.perf_ns) / 1e6
+            lines.append(
+                f"  {'  ' * depth}{s.name:<{36 - 2 * depth}} +{offset:8.1f}ms "
+                f"{s.seconds * 1000:8.1f}ms  {attrs}{error}"
+            )
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+tracer = Tracer()
@@ -0,0 +1,296 @@
+"""Compact transit model — busDetails.json parsed once into flat, array-backed tables."""
+
+import os
+import pickle
+from array import array
+
+from conductor.transit.stream import iter_json_array
+
+# Bump when the table layout or its construction changes so stale pickles are rebuilt
+MODEL_VERSION = 3
+
+# busDetails keys the model reads — everything else is dropped while streaming
+BUS_FIELDS = (
+    "id", "number", "carrier", "firstPoint", "lastPoint", "routLength",
+    "durationMinuts", "tariff", "tariffStr", "paymentType", "region",
+    "workingZoneType", "stops", "routes",
+)
+
+
+def safe_float(val, default=0.0) -> float:
+    """Parse float from potentially dirty data (e.g., '40,578,409' → 40.578409)."""
+    if val is None:
+        return default
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).strip()
+    if not s:
+        return default
+    # If string has commas, check if it's a malformed coordinate (e.g., "40,578,409")
+    if "," in s and "." not in s:
+        # Likely "40,578409" or "40,578,409" — first part is integer, rest is decimal
+        parts = s.split(",")
+        if len(parts) >= 2:
+            s = parts[0] + "." + "".join(parts[1:])
+    try:
+        return float(s)
+    except ValueError:
+        return default
+
+
+class TransitModel:
+    """
+    Stops, buses and per-(bus, direction) stop sequences as parallel arrays.
+
+    Rows are referenced by index, not id: a sequence stores stop *rows*, and
+    stop_index / bus_index map AYNA ids back to rows. Sequence k covers
+    seq_stops[seq_offsets[k]:seq_offsets[k + 1]], already ordered, with
+    stop entries that have no stop record dropped. seq_order keeps each entry's
+    position in the full direction list (sorted by AYNA entry id), so dropped
+    entries leave gaps exactly as the HAS_STOP order always has. Route shapes
+    (flowCoordinates) use the same offsets layout.
+    """
+
+    def __init__(self):
+        # Stops
+        self.stop_ids = array("q")
+        self.stop_codes: list[str] = []
+        self.stop_names: list[str] = []
+        self.stop_lat = array("d")
+        self.stop_lng = array("d")
+        self.stop_hub = array("b")
+        self.stop_index: dict[int, int] = {}
+
+        # Buses (few hundred rows — numeric columns keep their JSON types)
+        self.bus_ids = array("q")
+        self.bus_numbers: list[str] = []
+        self.bus_carriers: list[str] = []
+        self.bus_first_points: list[str] = []
+        self.bus_last_points: list[str] = []
+        self.bus_route_lengths: list = []
+        self.bus_durations: list = []
+        self.bus_tariffs: list = []
+        self.bus_tariff_strs: list[str] = []
+        self.bus_payment_types: list[str] = []
+        self.bus_regions: list[str] = []
+        self.bus_zone_ids = array("q")
+        self.bus_zone_names: list[str] = []
+        self.bus_index: dict[int, int] = {}
+
+        # Stop sequences, one per (bus, direction)
+        self.seq_bus = array("i")
+        self.seq_direction = array("i")
+        self.seq_offsets = array("i", [0])
+        self.seq_stops = array("i")
+        self.seq_order = array("i")
+        self.seq_total_distance = array("d")
+        self.seq_intermediate_distance = array("d")
+
+        # Raw route geometry, one per (bus, direction) route
+        self.shape_bus = array("i")
+        self.shape_direction = array("i")
+        self.shape_offsets = array("i", [0])
+        self.shape_lat = array("d")
+        self.shape_lng = array("d")
+
+    # ── Construction ───────────────────────────
+
+    @classmethod
+    def from_bus_details(cls, bus_details) -> "TransitModel":
+        """
+        Build every table in a single pass over busDetails records — a list or
+        any iterator (see iter_json_array). Each record is folded into the
+        arrays and can be freed before the next one is read.
+
+        A bus may reference a stop whose record only appears under a later
+        bus, so sequences hold stop ids until every record has been read and
+        are resolved to rows at the end.
+        """
+        model = cls()
+        stop_ids = array("q")
+        for bus in bus_details:
+            row = model._add_bus(bus)
+
+            dir_stops: dict[int, list] = {}
+            for bs in bus.get("stops", []):
+                stop = bs.get("stop")
+                if stop and stop.get("id") and stop["id"] not in model.stop_index:
+                    model._add_stop(stop)
+                dir_stops.setdefault(bs.get("directionTypeId", 1), []).append(bs)
+
+            for direction, d_stops in dir_stops.items():
+                # Entries without a stop still count towards the order
+                d_stops.sort(key=lambda x: x["id"])
+                for order, bs in enumerate(d_stops):
+                    if not bs.get("stopId"):
+                        continue
+                    stop_ids.append(bs["stopId"])
+                    model.seq_order.append(order)
+                    model.seq_total_distance.append(safe_float(bs.get("totalDistance")))
+                    model.seq_intermediate_distance.append(
+                        safe_float(bs.get("intermediateDistance"))
+                    )
+                model.seq_bus.append(row)
+                model.seq_direction.append(direction)
+                model.seq_offsets.append(len(stop_ids))
+
+            for route in bus.get("routes") or []:
+                for c in route.get("flowCoordinates") or []:
+                    if c.get("lat") is None or c.get("lng") is None:
+                        continue
+                    model.shape_lat.append(safe_float(c["lat"]))
+                    model.shape_lng.append(safe_float(c["lng"]))
+                model.shape_bus.append(row)
+                model.shape_direction.append(route.get("directionTypeId", 1))
+                model.shape_offsets.append(len(model.shape_lat))
+        model._resolve_sequences(stop_ids)
+        return model
+
+    def _resolve_sequences(self, stop_ids: array):
+        """Map sequence stop ids to rows, dropping ids no bus had a stop record for."""
+        index = self.stop_index
+        keep = [i for i, sid in enumerate(stop_ids) if sid in index]
+        if len(keep) < len(stop_ids):
+            # Offsets count kept entries; the per-entry columns drop the rest
+            kept_before = array("i", [0])
+            for sid in stop_ids:
+                kept_before.append(kept_before[-1] + (sid in index))
+            self.seq_offsets = array("i", (kept_before[o] for o in self.seq_offsets))
+            for name in ("seq_order", "seq_total_distance", "seq_intermediate_distance"):
+                column = getattr(self, name)
+                setattr(self, name, array(column.typecode, (column[i] for i in keep)))
+        self.seq_stops = array("i", (index[stop_ids[i]] for i in keep))
+
+    def _add_stop(self, stop: dict) -> int:
+        row = len(self.stop_ids)
+        self.stop_index[stop["id"]] = row
+        self.stop_ids.append(stop["id"])
+        self.stop_codes.append(stop.get("code") or "")
+        self.stop_names.append(stop.get("name") or "")
+        self.stop_lat.append(safe_float(stop.get("latitude")))
+        self.stop_lng.append(safe_float(stop.get("longitude")))
+        self.stop_hub.append(1 if stop.get("isTransportHub") else 0)
+        return row
+
+    def _add_bus(self, bus: dict) -> int:
+        row = len(self.bus_ids)
+        zone = bus.get("workingZoneType") or {}
+        self.bus_index[bus["id"]] = row
+        self.bus_ids.append(bus["id"])
+        self.bus_numbers.append(bus.get("number", ""))
+        self.bus_carriers.append(bus.get("carrier", ""))
+        self.bus_first_points.append(bus.get("firstPoint", ""))
+        self.bus_last_points.append(bus.get("lastPoint", ""))
+        self.bus_route_lengths.append(bus.get("routLength", 0))
+        self.bus_durations.append(bus.get("durationMinuts", 0))
+        self.bus_tariffs.append(bus.get("tariff", 0))
+        self.bus_tariff_strs.append(bus.get("tariffStr", ""))
+        self.bus_payment_types.append((bus.get("paymentType") or {}).get("name", ""))
+        self.bus_regions.append((bus.get("region") or {}).get("name", ""))
+        self.bus_zone_ids.append(zone.get("id") or 0)
+        self.bus_zone_names.append(zone.get("name", ""))
+        return row
+
+    # ── Access ─────────────────────────────────
+
+    @property
+    def stop_count(self) -> int:
+        return len(self.stop_ids)
+
+    @property
+    def bus_count(self) -> int:
+        return len(self.bus_ids)
+
+    @property
+    def sequence_count(self) -> int:
+        return len(self.seq_bus)
+
+    def stop_record(self, row: int) -> dict:
+        return {
+            "id": self.stop_ids[row],
+            "code": self.stop_codes[row],
+            "name": self.stop_names[row],
+            "latitude": self.stop_lat[row],
+            "longitude": self.stop_lng[row],
+            "isTransportHub": bool(self.stop_hub[row]),
+        }
+
+    def sequences(self, bus_rows: set[int] | None = None):
+        """Yield (seq, bus_row, direction, start, end), optionally for some buses only."""
+        offsets = self.seq_offsets
+        for k in range(len(self.seq_bus)):
+            bus_row = self.seq_bus[k]
+            if bus_rows is None or bus_row in bus_rows:
+                yield k, bus_row, self.seq_direction[k], offsets[k], offsets[k + 1]
+
+    def links(self, start: int, end: int):
+        """Positions i in [start, end - 1) whose entry directly precedes entry i + 1 (a NEXT_STOP)."""
+        order = self.seq_order
+        for i in range(start, end - 1):
+            if order[i + 1] == order[i] + 1:
+                yield i
+
+    def shapes(self, bus_rows: set[int] | None = None):
+        """Yield (bus_row, direction, [(lat, lng), ...]) per route."""
+        offsets = self.shape_offsets
+        for k in range(len(self.shape_bus)):
+            bus_row = self.shape_bus[k]
+            if bus_rows is None or bus_row in bus_rows:
+                start, end = offsets[k], offsets[k + 1]
+                yield bus_row, self.shape_direction[k], list(
+                    zip(self.shape_lat[start:end], self.shape_lng[start:end])
+                )
+
+    def bus_stop_rows(self, bus_row: int) -> set[int]:
+        rows = set()
+        for _, _, _, start, end in self.sequences({bus_row}):
+            rows.update(self.seq_stops[start:end])
+        return rows
+
+    # ── Persistence ────────────────────────────
+
+    def save(self, path: str, source_key: tuple | None = None):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                {"version": MODEL_VERSION, "source": source_key, "tables": self.__dict__},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, source_key: tuple | None = None) -> "TransitModel | None":
+        """Load a saved model; None if missing, from another layout version or stale."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != MODEL_VERSION:
+            return None
+        if source_key is not None and data.get("source") != source_key:
+            return None
+        model = cls.__new__(cls)
+        model.__dict__.update(data["tables"])
+        return model
+
+
+def source_key(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def load_or_build(json_path: str, cache_path: str) -> tuple[TransitModel, bool]:
+    """
+    Return (model, from_cache). The JSON is only parsed when the cached model
+    is missing or was built from a different file (size/mtime changed), and
+    then streamed record by record, so peak memory tracks the model rather
+    than the whole parsed document.
+    """
+    key = source_key(json_path)
+    model = TransitModel.load(cache_path, key)
+    if model is not None:
+        return model, True
+    model = TransitModel.from_bus_details(iter_json_array(json_path, BUS_FIELDS))
+    model.save(cache_path, key)
+    return model, False
@@ -0,0 +1,373 @@
+"""
+Versioned binary transit snapshot, memory-mapped by the API.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header   magic "CNDSNAP1", format u32, section count u32
+    table    per section: name 24s, typecode 1s, pad 7x, offset u64, length u64
+    sections fixed-width arrays (stops, coordinates, stop sequences, transfers,
+             name keys) plus a string table (offsets + UTF-8 blob) and a JSON meta blob
+
+Sections are exposed as zero-copy memoryviews over a read-only mmap, so opening
+a snapshot costs a few milliseconds and worker processes share the same pages
+through the OS page cache.
+
+Deployments that don't build the graph themselves (Docker, Render) download
+the published file from SNAPSHOT_URL with fetch_snapshot().
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+import requests
+
+from conductor.graph.spatial import GridIndex
+from conductor.transit.model import TransitModel
+
+MAGIC = b"CNDSNAP1"
+SNAPSHOT_FORMAT = 2
+
+_HEADER = struct.Struct("<8sII")
+_ENTRY = struct.Struct("<24sc7xQQ")
+_ALIGN = 8
+
+# nearest_stops grid cell; larger radii scan more neighbouring cells
+NEAREST_CELL_METERS = 500
+
+
+class _StringTable:
+    def __init__(self):
+        self.index: dict[str, int] = {}
+        self.offsets = array("I", [0])
+        self.data = bytearray()
+
+    def add(self, value: str) -> int:
+        value = value or ""
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.offsets) - 1
+            self.index[value] = idx
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return idx
+
+
+def write_snapshot(
+    path: str,
+    model: TransitModel,
+    transfers: list[dict],
+    graph_version: str,
+) -> int:
+    """
+    Serialize the model and TRANSFER pairs (compute_transfers output) for one
+    graph version. Written to a temp file and renamed, so readers never see a
+    partial snapshot. Returns the file size in bytes.
+    """
+    strings = _StringTable()
+    n = model.stop_count
+
+    # Same normalization as Stop.nameNormalized
+    keys = [name.strip().lower() for name in model.stop_names]
+    by_name = sorted(range(n), key=lambda r: model.stop_names[r])
+
+    # Transfers as CSR adjacency over stop rows (both directions)
+    neighbors: list[list[tuple[int, float]]] = [[] for _ in range(n)]
+    for p in transfers:
+        a, b = model.stop_index.get(p["a"]), model.stop_index.get(p["b"])
+        if a is not None and b is not None:
+            neighbors[a].append((b, p["distance"]))
+            neighbors[b].append((a, p["distance"]))
+    transfer_offsets = array("i", [0])
+    transfer_to = array("i")
+    transfer_meters = array("f")
+    for row in neighbors:
+        row.sort()
+        for other, dist in row:
+            transfer_to.append(other)
+            transfer_meters.append(dist)
+        transfer_offsets.append(len(transfer_to))
+
+    sections = {
+        "stop_ids": model.stop_ids,
+        "stop_lat": model.stop_lat,
+        "stop_lng": model.stop_lng,
+        "stop_hub": model.stop_hub,
+        "stop_name": array("I", (strings.add(s) for s in model.stop_names)),
+        "stop_code": array("I", (strings.add(s) for s in model.stop_codes)),
+        "stop_key": array("I", (strings.add(k) for k in keys)),
+        "stop_by_name": array("i", by_name),
+        "bus_ids": model.bus_ids,
+        "bus_number": array("I", (strings.add(s) for s in model.bus_numbers)),
+        "seq_bus": model.seq_bus,
+        "seq_direction": model.seq_direction,
+        "seq_offsets": model.seq_offsets,
+        "seq_stops": model.seq_stops,
+        "seq_order": model.seq_order,
+        "seq_distance": model.seq_total_distance,
+        "transfer_offsets": transfer_offsets,
+        "transfer_to": transfer_to,
+        "transfer_meters": transfer_meters,
+        "str_offsets": strings.offsets,
+    }
+    blobs = {
+        "str_data": bytes(strings.data),
+        "meta": json.dumps({
+            "graphVersion": graph_version,
+            "builtAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "stops": n,
+            "buses": model.bus_count,
+            "sequences": model.sequence_count,
+            "transfers": len(transfers),
+        }).encode("utf-8"),
+    }
+
+    entries = []
+    offset = _HEADER.size + _ENTRY.size * (len(sections) + len(blobs))
+    payload = []
+    for name, arr in list(sections.items()) + list(blobs.items()):
+        offset += -offset % _ALIGN
+        raw = arr.tobytes() if isinstance(arr, array) else arr
+        typecode = arr.typecode if isinstance(arr, array) else "B"
+        entries.append((name.encode(), typecode.encode(), offset, len(raw)))
+        payload.append((offset, raw))
+        offset += len(raw)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, SNAPSHOT_FORMAT, len(entries)))
+        for entry in entries:
+            f.write(_ENTRY.pack(*entry))
+        for off, raw in payload:
+            f.write(b"\0" * (off - f.tell()))
+            f.write(raw)
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+def fetch_snapshot(url: str, path: str, timeout: float = 60) -> bool:
+    """
+    Download the snapshot published at `url` to `path` (temp file + rename, so
+    a mapped copy stays valid). The ETag of the last download is kept next to
+    the file, so an unchanged snapshot costs one 304. True if a new file was written.
+    """
+    etag_path = path + ".etag"
+    headers = {}
+    if os.path.exists(path) and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            headers["If-None-Match"] = f.read().strip()
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".download"
+        with open(tmp, "wb") as f:
+            for chunk in response.iter_content(1 << 20):
+                f.write(chunk)
+        os.replace(tmp, path)
+        etag = response.headers.get("ETag")
+    if etag:
+        with open(etag_path, "w") as f:
+            f.write(etag)
+    elif os.path.exists(etag_path):
+        os.remove(etag_path)
+    return True
+
+
+class Snapshot:
+    """Read-only view of a snapshot file. Row numbers index every stop_* section."""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise ValueError("snapshot files are little-endian")
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, fmt, count = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or fmt != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path}: not a format {SNAPSHOT_FORMAT} snapshot")
+            view = memoryview(self._mm)
+            self._views = []
+            for i in range(count):
+                name, typecode, offset, length = _ENTRY.unpack_from(
+                    self._mm, _HEADER.size + i * _ENTRY.size
+                )
+                section = view[offset : offset + length].cast(typecode.decode())
+                self._views.append(section)
+                setattr(self, name.rstrip(b"\0").decode(), section)
+            self._views.append(view)
+        except Exception:
+            self.close()
+            raise
+
+        self.meta = json.loads(bytes(self.meta))
+        self.graph_version: str | None = self.meta.get("graphVersion")
+        self.stop_index = {sid: row for row, sid in enumerate(self.stop_ids)}
+        self.bus_index = {bid: row for row, bid in enumerate(self.bus_ids)}
+        self._grid = GridIndex(
+            [
+                (row, self.stop_lat[row], self.stop_lng[row])
+                for row in range(len(self.stop_ids))
+                if self.stop_lat[row] and self.stop_lng[row]
+            ],
+            cell_meters=NEAREST_CELL_METERS,
+        )
+        self._lazy_lock = threading.Lock()  # API threads share one snapshot
+        self._keys: list[str] | None = None
+        self._stop_seqs: dict[int, list[tuple[int, int]]] | None = None
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot | None":
+        """Open a snapshot, or None (with a warning) if it is missing or unreadable."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Warning: ignoring snapshot {path}: {e}")
+            return None
+
+    def close(self):
+        """Unmap the file. Safe to call twice; lookups on a closed snapshot raise ValueError."""
+        for v in getattr(self, "_views", []):
+            v.release()
+        self._views = []
+        try:
+            self._mm.close()
+        except BufferError:
+            # A slice is still exported; the mapping goes when it is collected
+            print(f"Warning: snapshot {self.path} still in use, left to the garbage collector")
+
+    # ── Strings ────────────────────────────────
+
+    def string(self, idx: int) -> str:
+        start, end = self.str_offsets[idx], self.str_offsets[idx + 1]
+        return self.str_data[start:end].tobytes().decode("utf-8")
+
+    def stop(self, row: int) -> dict:
+        return {
+            "id": self.stop_ids[row],
+            "name": self.string(self.stop_name[row]),
+            "code": self.string(self.stop_code[row]),
+            "latitude": self.stop_lat[row],
+            "longitude": self.stop_lng[row],
+            "isTransportHub": bool(self.stop_hub[row]),
+        }
+
+    # ── Lookups (mirror the Cypher queries they replace) ──
+
+    def all_stops(self) -> list[dict]:
+        """FIND_ALL_STOPS — every located stop, ordered by name."""
+        return [
+            self.stop(row) for row in self.stop_by_name
+            if self.stop_lat[row] and self.stop_lng[row]
+        ]
+
+    def stops_by_name(self, name: str, limit: int = 5) -> list[dict]:
+        """FIND_STOPS_BY_NAME — substring match on the normalized name key."""
+        if self._keys is None:
+            with self._lazy_lock:
+                if self._keys is None:
+                    self._keys = [self.string(k) for k in self.stop_key]
+        stops = [self.stop(row) for row, key in enumerate(self._keys) if name in key]
+        stops.sort(key=lambda s: (not s["isTransportHub"], s["name"]))
+        return stops[:limit]
+
+    def nearest_stops(self, lat: float, lng: float, radius: float, limit: int = 10) -> list[dict]:
+        """FIND_NEAREST_STOPS — radius search on the grid built at open."""
+        hits = sorted(self._grid.within(lat, lng, radius), key=lambda h: h[1])[:limit]
+        out = []
+        for row, dist in hits:
+            s = self.stop(row)
+            del s["isTransportHub"]
+            s["distanceMeters"] = round(dist, 1)
+            out.append(s)
+        return out
+
+    def bus_route_stops(self, bus_id: int, direction: int = 1) -> list[dict] | None:
+        """BUS_ROUTE_STOPS — None if the bus is not in the snapshot."""
+        b = self.bus_index.get(bus_id)
+        if b is None:
+            return None
+        for k in range(len(self.seq_bus)):
+            if self.seq_bus[k] == b and self.seq_direction[k] == direction:
+                start, end = self.seq_offsets[k], self.seq_offsets[k + 1]
+                return [
+                    {
+                        "stopId": self.stop_ids[row],
+                        "stopName": self.string(self.stop_name[row]),
+                        "stopCode": self.string(self.stop_code[row]),
+                        "latitude": self.stop_lat[row],
+                        "longitude": self.stop_lng[row],
+                        "stopOrder": self.seq_order[i],
+                        "distance": self.seq_distance[i],
+                    }
+                    for i, row in zip(range(start, end), self.seq_stops[start:end])
+                ]
+        return []
+
+    def direct_routes(self, origin_ids: list[int], dest_ids: list[int], limit: int = 5) -> list[dict]:
+        """
+        FIND_DIRECT_ROUTES from the stop sequences alone — the latency-budget
+        fallback when Neo4j is slow. Bus metadata the snapshot doesn't hold
+        (carrier, tariff, payment) is left empty.
+        """
+        if self._stop_seqs is None:
+            with self._lazy_lock:
+                if self._stop_seqs is None:
+                    # stop row → (sequence, position) for every sequence through it
+                    index: dict[int, list[tuple[int, int]]] = {}
+                    for k in range(len(self.seq_bus)):
+                        start = self.seq_offsets[k]
+                        for pos, row in enumerate(self.seq_stops[start : self.seq_offsets[k + 1]]):
+                            index.setdefault(row, []).append((k, pos))
+                    self._stop_seqs = index
+
+        dest_rows = {self.stop_index[d] for d in dest_ids if d in self.stop_index}
+        routes = []
+        for origin_id in origin_ids:
+            o = self.stop_index.get(origin_id)
+            if o is None:
+                continue
+            for k, pos in self._stop_seqs.get(o, ()):
+                start, end = self.seq_offsets[k], self.seq_offsets[k + 1]
+                for i in range(start + pos + 1, end):
+                    d = self.seq_stops[i]
+                    if d not in dest_rows:
+                        continue
+                    b = self.seq_bus[k]
+                    routes.append({
+                        "busId": self.bus_ids[b],
+                        "busNumber": self.string(self.bus_number[b]),
+                        "carrier": "",
+                        "tariffStr": None,
+                        "paymentType": None,
+                        "durationMinuts": None,
+                        "originStopId": origin_id,
+                        "originStopName": self.string(self.stop_name[o]),
+                        "destStopId": self.stop_ids[d],
+                        "destStopName": self.string(self.stop_name[d]),
+                        "direction": self.seq_direction[k],
+                        "stopCount": self.seq_order[i] - self.seq_order[start + pos],
+                    })
+        routes.sort(key=lambda r: r["stopCount"])
+        return routes[:limit]
+
+    def transfers(self, stop_id: int) -> list[tuple[int, float]]:
+        """(stop id, walking meters) for every TRANSFER neighbor of a stop."""
+        row = self.stop_index.get(stop_id)
+        if row is None:
+            return []
+        start, end = self.transfer_offsets[row], self.transfer_offsets[row + 1]
+        return [
+            (self.stop_ids[self.transfer_to[i]], self.transfer_meters[i])
+            for i in range(start, end)
+        ]
@@ -0,0 +1,83 @@
+"""Streaming reader for large top-level JSON arrays such as busDetails.json."""
+
+import json
+from collections.abc import Iterator
+
+_WHITESPACE = " \t\n\r"
+_MISSING = object()
+
+
+def iter_json_array(
+    path: str, fields: tuple[str, ...] | None = None, chunk_size: int = 1 << 20
+) -> Iterator:
+    """
+    Yield the elements of a top-level JSON array one at a time, reading the
+    file in chunks. Only the current element and one read buffer are held in
+    memory, whatever the file size. With `fields`, object elements are
+    projected to those keys before they are yielded.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        # Leading whitespace may span several chunks
+        buf = f.read(chunk_size)
+        pos = _skip(buf, 0)
+        while pos >= len(buf) and buf:
+            buf = f.read(chunk_size)
+            pos = _skip(buf, 0)
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+        eof = False
+        # False: value or ']' next, True: ',' or ']' next, None: value next
+        expect_comma = False
+        while True:
+            pos = _skip(buf, pos)
+            if pos < len(buf):
+                ch = buf[pos]
+                if ch == "]" and expect_comma is not None:
+                    return
+                if expect_comma:
+                    if ch != ",":
+                        raise ValueError(f"{path}: expected ',' or ']' in array")
+                    pos = _skip(buf, pos + 1)
+                    expect_comma = None  # a value must follow
+                    continue
+
+            item, end = _MISSING, None
+            if pos < len(buf):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    pass
+            if item is _MISSING or (not eof and _maybe_cut(item, buf, end)):
+                if eof:
+                    raise ValueError(f"{path}: truncated JSON array")
+                chunk = f.read(max(chunk_size, len(buf) - pos))
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+
+            pos = end
+            expect_comma = True
+            if fields is not None and isinstance(item, dict):
+                item = {k: item[k] for k in fields if k in item}
+            yield item
+
+
+def _maybe_cut(item, buf: str, end: int) -> bool:
+    """
+    Whether a decoded scalar may continue past the buffer — "-4." decodes as
+    -4 — so it is only trusted once the following ',' or ']' is in view.
+    Objects, arrays and strings end with their own closing character.
+    """
+    if isinstance(item, (dict, list, str)):
+        return False
+    nxt = _skip(buf, end)
+    return nxt >= len(buf) or buf[nxt] not in ",]"
+
+
+def _skip(buf: str, pos: int) -> int:
+    while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+    return pos
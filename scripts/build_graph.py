@@ -1,10 +1,23 @@
 """
-Graph ingestion script — loads stops.json and busDetails.json into Neo4j.
+Graph ingestion script — loads busDetails.json into Neo4j.
+
+busDetails.json is streamed one bus record at a time into a TransitModel
+(conductor/transit/model.py) that every phase reads; the model is cached in data/transit_model.pkl and
+reused while the JSON file is unchanged.
+
+A full rebuild is blue/green: it writes a new graph generation (every node
+carries a `gen` property) next to the live one, validates it, flips the
+GraphMeta pointer the API reads, then drops generations older than the one
+it replaced in batches. Readers never see a half-built graph, and API
+instances that have not reloaded yet keep working on the previous one.
 
 Usage:
-    python scripts/build_graph.py
+    python scripts/build_graph.py                 # full rebuild
+    python scripts/build_graph.py --incremental   # apply changes since last build
 """
 
+import argparse
+import hashlib
 import json
 import sys
 import os
@@ -12,17 +25,24 @@ import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from conductor.graph.client import Neo4jClient
-from conductor.config import TRANSFER_MAX_DISTANCE_METERS
-
-DATA_DIR = os.path.join(os.path.dirname(os.path.
-dirname(os.path.abspath(__file__))), "data")
-
-
-def load_json(filename):
-    path = os.path.join(DATA_DIR, filename)
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+from conductor.graph.client import Neo4jClient, ScopedClient
+from conductor.graph import queries
+from conductor.graph.geometry import encode_shape_levels
+from conductor.matching.transliterate import normalize_bus_number, to_ascii
+from conductor.graph.spatial import GridIndex
+from conductor.graph.writer import BatchWriter, run_stage
+from conductor.transit.model import TransitModel, load_or_build
+from conductor.transit.snapshot import write_snapshot
+from conductor.config import (
+    SNAPSHOT_PATH,
+    TRANSFER_MAX_DISTANCE_METERS,
+    WALKING_SPEED_METERS_PER_MIN,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+TRANSIT_MODEL_PATH = os.path.join(DATA_DIR, "transit_model.pkl")
+# Nodes deleted per server-side transaction when dropping an old generation
+DROP_BATCH_ROWS = 1000
 
 
 def normalize_name(name: str) -> str:
@@ -31,27 +51,6 @@ def normalize_name(name: str) -> str:
     return name.strip().lower()
 
 
-def safe_float(val, default=0.0) -> float:
-    """Parse float from potentially dirty data (e.g., '40,578,409' → 40.578409)."""
-    if val is None:
-        return default
-    if isinstance(val, (int, float)):
-        return float(val)
-    s = str(val).strip()
-    if not s:
-        return default
-    # If string has commas, check if it's a malformed coordinate (e.g., "40,578,409")
-    if "," in s and "." not in s:
-        # Likely "40,578409" or "40,578,409" — first part is integer, rest is decimal
-        parts = s.split(",")
-        if len(parts) >= 2:
-            s = parts[0] + "." + "".join(parts[1:])
-    try:
-        return float(s)
-    except ValueError:
-        return default
-
-
 # ──────────────────────────────────────────────
 # Phase 0: Constraints & Indexes
 # ──────────────────────────────────────────────
@@ -59,14 +58,26 @@ def safe_float(val, default=0.0) -> float:
 def create_constraints_and_indexes(client: Neo4jClient):
     print("Creating constraints and indexes...")
 
+    # Keys are unique per generation — two generations coexist during a rebuild
     statements = [
-        "CREATE CONSTRAINT stop_id IF NOT EXISTS FOR (s:Stop) REQUIRE s.id IS UNIQUE",
-        "CREATE CONSTRAINT bus_id IF NOT EXISTS FOR (b:Bus) REQUIRE b.id IS UNIQUE",
-        "CREATE CONSTRAINT carrier_name IF NOT EXISTS FOR (c:Carrier) REQUIRE c.name IS UNIQUE",
-        "CREATE CONSTRAINT zone_id IF NOT EXISTS FOR (z:Zone) REQUIRE z.id IS UNIQUE",
+        "DROP CONSTRAINT stop_id IF EXISTS",
+        "DROP CONSTRAINT bus_id IF EXISTS",
+        "DROP CONSTRAINT carrier_name IF EXISTS",
+        "DROP CONSTRAINT zone_id IF EXISTS",
+        "CREATE CONSTRAINT stop_id_gen IF NOT EXISTS FOR (s:Stop) REQUIRE (s.id, s.gen) IS UNIQUE",
+        "CREATE CONSTRAINT bus_id_gen IF NOT EXISTS FOR (b:Bus) REQUIRE (b.id, b.gen) IS UNIQUE",
+        "CREATE CONSTRAINT carrier_name_gen IF NOT EXISTS FOR (c:Carrier) REQUIRE (c.name, c.gen) IS UNIQUE",
+        "CREATE CONSTRAINT zone_id_gen IF NOT EXISTS FOR (z:Zone) REQUIRE (z.id, z.gen) IS UNIQUE",
+        "CREATE INDEX stop_gen IF NOT EXISTS FOR (s:Stop) ON (s.gen)",
+        "CREATE INDEX bus_gen IF NOT EXISTS FOR (b:Bus) ON (b.gen)",
+        "CREATE INDEX route_shape_gen IF NOT EXISTS FOR (r:RouteShape) ON (r.gen)",
         "CREATE INDEX stop_name IF NOT EXISTS FOR (s:Stop) ON (s.nameNormalized)",
         "CREATE INDEX bus_number IF NOT EXISTS FOR (b:Bus) ON (b.number)",
+        "CREATE INDEX bus_number_normalized IF NOT EXISTS FOR (b:Bus) ON (b.numberNormalized)",
+        "CREATE INDEX route_shape_bus IF NOT EXISTS FOR (r:RouteShape) ON (r.busId)",
         "CREATE POINT INDEX stop_location IF NOT EXISTS FOR (s:Stop) ON (s.location)",
+        "CREATE FULLTEXT INDEX stop_name_fulltext IF NOT EXISTS FOR (s:Stop) "
+        "ON EACH [s.name, s.nameNormalized, s.nameAscii]",
     ]
 
     for stmt in statements:
@@ -83,235 +94,198 @@ def create_constraints_and_indexes(client: Neo4jClient):
 # Phase 1: Stop nodes
 # ──────────────────────────────────────────────
 
-def ingest_stops(client: Neo4jClient, bus_details: list):
-    """
-    Create Stop nodes from busDetails (which has names, codes, coords).
-    busDetails stops are the richest source — each bus.stops[].stop has full info.
-    """
+def stop_rows(model: TransitModel, rows) -> list[dict]:
+    """Stop node properties for the given model rows, with derived name keys."""
+    out = []
+    for row in rows:
+        stop = model.stop_record(row)
+        stop["nameNormalized"] = normalize_name(stop["name"])
+        stop["nameAscii"] = to_ascii(stop["name"])
+        out.append(stop)
+    return out
+
+
+def ingest_stops(writer: BatchWriter, model: TransitModel):
+    """Create Stop nodes for every stop referenced by busDetails."""
     print("Ingesting Stop nodes...")
+    print(f"  Found {model.stop_count} unique stops.")
 
-    # Collect unique stops from all bus details
-    stops_map = {}
-    for bus in bus_details:
-        for bus_stop in bus.get("stops", []):
-            stop = bus_stop.get("stop")
-            if not stop or not stop.get("id"):
-                continue
-            sid = stop["id"]
-            if sid not in stops_map:
-                stops_map[sid] = {
-                    "id": sid,
-                    "code": stop.get("code", ""),
-                    "name": stop.get("name", ""),
-                    "nameNormalized": normalize_name(stop.get("name", "")),
-                    "latitude": safe_float(stop.get("latitude")),
-                    "longitude": safe_float(stop.get("longitude")),
-                    "isTransportHub": stop.get("isTransportHub", False),
-                }
-
-    stops_list = list(stops_map.values())
-    print(f"  Found {len(stops_list)} unique stops.")
-
-    # Batch upsert in chunks
-    batch_size = 200
-    for i in range(0, len(stops_list), batch_size):
-        batch = stops_list[i : i + batch_size]
-        client.run_write(
-            """
-            UNWIND $stops AS s
-            MERGE (stop:Stop {id: s.id})
-            SET stop.code = s.code,
-                stop.name = s.name,
-                stop.nameNormalized = s.nameNormalized,
-                stop.latitude = s.latitude,
-                stop.longitude = s.longitude,
-                stop.isTransportHub = s.isTransportHub,
-                stop.location = point({latitude: s.latitude, longitude: s.longitude})
-            """,
-            {"stops": batch},
-        )
-        print(f"  Stops: {min(i + batch_size, len(stops_list))}/{len(stops_list)}")
+    write_stops(writer, stop_rows(model, range(model.stop_count)))
 
-    print(f"  Created {len(stops_list)} Stop nodes.\n")
-    return stops_map
+
+def write_stops(writer: BatchWriter, stops_list: list):
+    writer.write(
+        "Stop nodes",
+        """
+        UNWIND $stops AS s
+        MERGE (stop:Stop {id: s.id, gen: $gen})
+        SET stop.code = s.code,
+            stop.name = s.name,
+            stop.nameNormalized = s.nameNormalized,
+            stop.nameAscii = s.nameAscii,
+            stop.latitude = s.latitude,
+            stop.longitude = s.longitude,
+            stop.isTransportHub = s.isTransportHub,
+            stop.location = point({latitude: s.latitude, longitude: s.longitude})
+        """,
+        stops_list,
+        param="stops",
+        batch_size=500,
+    )
 
 
 # ──────────────────────────────────────────────
 # Phase 2: Carrier & Zone nodes
 # ──────────────────────────────────────────────
 
-def ingest_carriers_and_zones(client: Neo4jClient, bus_details: list):
+def ingest_carriers_and_zones(
+    writer: BatchWriter, model: TransitModel, bus_rows: set[int] | None = None
+):
     print("Ingesting Carrier and Zone nodes...")
 
     carriers = set()
     zones = {}
 
-    for bus in bus_details:
-        carrier = bus.get("carrier")
-        if carrier:
-            carriers.add(carrier)
-
-        wzt = bus.get("workingZoneType")
-        if wzt and wzt.get("id"):
-            zones[wzt["id"]] = wzt.get("name", "")
+    for b in range(model.bus_count):
+        if bus_rows is not None and b not in bus_rows:
+            continue
+        if model.bus_carriers[b]:
+            carriers.add(model.bus_carriers[b])
+        if model.bus_zone_ids[b]:
+            zones[model.bus_zone_ids[b]] = model.bus_zone_names[b]
 
     # Carriers
-    client.run_write(
+    writer.write(
+        "Carrier nodes",
         """
         UNWIND $carriers AS name
-        MERGE (c:Carrier {name: name})
+        MERGE (c:Carrier {name: name, gen: $gen})
         """,
-        {"carriers": list(carriers)},
+        list(carriers),
+        param="carriers",
     )
-    print(f"  Created {len(carriers)} Carrier nodes.")
 
     # Zones
     zone_list = [{"id": k, "name": v} for k, v in zones.items()]
-    client.run_write(
+    writer.write(
+        "Zone nodes",
         """
         UNWIND $zones AS z
-        MERGE (zone:Zone {id: z.id})
+        MERGE (zone:Zone {id: z.id, gen: $gen})
         SET zone.name = z.name
         """,
-        {"zones": zone_list},
+        zone_list,
+        param="zones",
     )
-    print(f"  Created {len(zone_list)} Zone nodes.\n")
 
 
 # ──────────────────────────────────────────────
 # Phase 3: Bus nodes + OPERATED_BY + IN_ZONE
 # ──────────────────────────────────────────────
 
-def ingest_buses(client: Neo4jClient, bus_details: list):
+def ingest_buses(writer: BatchWriter, model: TransitModel, bus_rows: set[int] | None = None):
     print("Ingesting Bus nodes...")
 
     bus_list = []
-    for bus in bus_details:
+    for b in range(model.bus_count):
+        if bus_rows is not None and b not in bus_rows:
+            continue
         bus_list.append({
-            "id": bus["id"],
-            "number": bus.get("number", ""),
-            "carrier": bus.get("carrier", ""),
-            "firstPoint": bus.get("firstPoint", ""),
-            "lastPoint": bus.get("lastPoint", ""),
-            "routLength": bus.get("routLength", 0),
-            "durationMinuts": bus.get("durationMinuts", 0),
-            "tariff": bus.get("tariff", 0),
-            "tariffStr": bus.get("tariffStr", ""),
-            "paymentType": bus.get("paymentType", {}).get("name", ""),
-            "region": bus.get("region", {}).get("name", ""),
-            "zoneId": bus.get("workingZoneType", {}).get("id", 0),
-            "zoneName": bus.get("workingZoneType", {}).get("name", ""),
+            "id": model.bus_ids[b],
+            "number": model.bus_numbers[b],
+            "numberNormalized": normalize_bus_number(model.bus_numbers[b]),
+            "carrier": model.bus_carriers[b],
+            "firstPoint": model.bus_first_points[b],
+            "lastPoint": model.bus_last_points[b],
+            "routLength": model.bus_route_lengths[b],
+            "durationMinuts": model.bus_durations[b],
+            "tariff": model.bus_tariffs[b],
+            "tariffStr": model.bus_tariff_strs[b],
+            "paymentType": model.bus_payment_types[b],
+            "region": model.bus_regions[b],
+            "zoneId": model.bus_zone_ids[b],
+            "zoneName": model.bus_zone_names[b],
         })
 
-    batch_size = 100
-    for i in range(0, len(bus_list), batch_size):
-        batch = bus_list[i : i + batch_size]
-        client.run_write(
-            """
-            UNWIND $buses AS b
-            MERGE (bus:Bus {id: b.id})
-            SET bus.number = b.number,
-                bus.carrier = b.carrier,
-                bus.firstPoint = b.firstPoint,
-                bus.lastPoint = b.lastPoint,
-                bus.routLength = b.routLength,
-                bus.durationMinuts = b.durationMinuts,
-                bus.tariff = b.tariff,
-                bus.tariffStr = b.tariffStr,
-                bus.paymentType = b.paymentType,
-                bus.region = b.region,
-                bus.zoneName = b.zoneName
-            """,
-            {"buses": batch},
-        )
-
-    print(f"  Created {len(bus_list)} Bus nodes.")
+    writer.write(
+        "Bus nodes",
+        """
+        UNWIND $buses AS b
+        MERGE (bus:Bus {id: b.id, gen: $gen})
+        SET bus.number = b.number,
+            bus.numberNormalized = b.numberNormalized,
+            bus.carrier = b.carrier,
+            bus.firstPoint = b.firstPoint,
+            bus.lastPoint = b.lastPoint,
+            bus.routLength = b.routLength,
+            bus.durationMinuts = b.durationMinuts,
+            bus.tariff = b.tariff,
+            bus.tariffStr = b.tariffStr,
+            bus.paymentType = b.paymentType,
+            bus.region = b.region,
+            bus.zoneName = b.zoneName
+        """,
+        bus_list,
+        param="buses",
+        batch_size=200,
+    )
 
-    # OPERATED_BY
-    client.run_write(
+    writer.write(
+        "OPERATED_BY rels",
         """
         UNWIND $buses AS b
-        MATCH (bus:Bus {id: b.id})
-        MATCH (carrier:Carrier {name: b.carrier})
+        MATCH (bus:Bus {id: b.id, gen: $gen})
+        MATCH (carrier:Carrier {name: b.carrier, gen: $gen})
         MERGE (bus)-[:OPERATED_BY]->(carrier)
         """,
-        {"buses": bus_list},
+        bus_list,
+        param="buses",
     )
-    print("  Created OPERATED_BY relationships.")
-
-    # IN_ZONE
-    client.run_write(
+    writer.write(
+        "IN_ZONE rels",
         """
         UNWIND $buses AS b
-        MATCH (bus:Bus {id: b.id})
-        MATCH (zone:Zone {id: b.zoneId})
+        MATCH (bus:Bus {id: b.id, gen: $gen})
+        MATCH (zone:Zone {id: b.zoneId, gen: $gen})
         MERGE (bus)-[:IN_ZONE]->(zone)
         """,
-        {"buses": bus_list},
+        bus_list,
+        param="buses",
     )
-    print("  Created IN_ZONE relationships.\n")
 
 
 # ──────────────────────────────────────────────
 # Phase 4: HAS_STOP relationships
 # ──────────────────────────────────────────────
 
-def ingest_has_stop(client: Neo4jClient, bus_details: list):
+def ingest_has_stop(writer: BatchWriter, model: TransitModel, bus_rows: set[int] | None = None):
     print("Ingesting HAS_STOP relationships...")
 
-    total = 0
-    batch = []
-    batch_size = 500
-
-    for bus in bus_details:
-        bus_id = bus["id"]
-        stops = bus.get("stops", [])
-
-        # Group by direction and sort by sequence (the 'id' field acts as ordering)
-        dir_stops = {}
-        for bs in stops:
-            d = bs.get("directionTypeId", 1)
-            if d not in dir_stops:
-                dir_stops[d] = []
-            dir_stops[d].append(bs)
-
-        for direction, d_stops in dir_stops.items():
-            d_stops.sort(key=lambda x: x["id"])
-            for order, bs in enumerate(d_stops):
-                stop_id = bs.get("stopId")
-                if not stop_id:
-                    continue
-                batch.append({
-                    "busId": bus_id,
-                    "stopId": stop_id,
-                    "order": order,
-                    "direction": direction,
-                    "distanceFromStart": bs.get("totalDistance", 0),
-                    "intermediateDistance": bs.get("intermediateDistance", 0),
-                })
-                total += 1
-
-                if len(batch) >= batch_size:
-                    _flush_has_stop(client, batch)
-                    batch = []
-
-    if batch:
-        _flush_has_stop(client, batch)
-
-    print(f"  Created {total} HAS_STOP relationships.\n")
-
-
-def _flush_has_stop(client: Neo4jClient, batch: list):
-    client.run_write(
+    rels = []
+    for _, b, direction, start, end in model.sequences(bus_rows):
+        bus_id = model.bus_ids[b]
+        for i in range(start, end):
+            rels.append({
+                "busId": bus_id,
+                "stopId": model.stop_ids[model.seq_stops[i]],
+                "order": model.seq_order[i],
+                "direction": direction,
+                "distanceFromStart": model.seq_total_distance[i],
+                "intermediateDistance": model.seq_intermediate_distance[i],
+            })
+
+    writer.write(
+        "HAS_STOP rels",
         """
         UNWIND $rels AS r
-        MATCH (bus:Bus {id: r.busId})
-        MATCH (stop:Stop {id: r.stopId})
+        MATCH (bus:Bus {id: r.busId, gen: $gen})
+        MATCH (stop:Stop {id: r.stopId, gen: $gen})
         MERGE (bus)-[h:HAS_STOP {direction: r.direction, order: r.order}]->(stop)
         SET h.distanceFromStart = r.distanceFromStart,
             h.intermediateDistance = r.intermediateDistance
         """,
-        {"rels": batch},
+        rels,
+        param="rels",
     )
 
 
@@ -319,186 +293,631 @@ def _flush_has_stop(client: Neo4jClient, batch: list):
 # Phase 5: NEXT_STOP relationships
 # ──────────────────────────────────────────────
 
-def ingest_next_stop(client: Neo4jClient, bus_details: list):
+def ingest_next_stop(writer: BatchWriter, model: TransitModel, bus_rows: set[int] | None = None):
     print("Ingesting NEXT_STOP relationships...")
 
-    total = 0
-    batch = []
-    batch_size = 500
-
-    for bus in bus_details:
-        bus_id = bus["id"]
-        bus_number = bus.get("number", "")
-        stops = bus.get("stops", [])
-
-        dir_stops = {}
-        for bs in stops:
-            d = bs.get("directionTypeId", 1)
-            if d not in dir_stops:
-                dir_stops[d] = []
-            dir_stops[d].append(bs)
-
-        for direction, d_stops in dir_stops.items():
-            d_stops.sort(key=lambda x: x["id"])
-            for i in range(len(d_stops) - 1):
-                from_id = d_stops[i].get("stopId")
-                to_id = d_stops[i + 1].get("stopId")
-                if not from_id or not to_id:
-                    continue
-                dist = abs(
-                    (d_stops[i + 1].get("intermediateDistance", 0))
-                    - (d_stops[i].get("intermediateDistance", 0))
-                )
-                batch.append({
-                    "fromId": from_id,
-                    "toId": to_id,
-                    "busId": bus_id,
-                    "busNumber": bus_number,
-                    "direction": direction,
-                    "distance": round(dist, 2),
-                })
-                total += 1
+    rels = []
+    stops, inter = model.seq_stops, model.seq_intermediate_distance
+    for _, b, direction, start, end in model.sequences(bus_rows):
+        bus_id, bus_number = model.bus_ids[b], model.bus_numbers[b]
+        for i in model.links(start, end):
+            rels.append({
+                "fromId": model.stop_ids[stops[i]],
+                "toId": model.stop_ids[stops[i + 1]],
+                "busId": bus_id,
+                "busNumber": bus_number,
+                "direction": direction,
+                "distance": round(abs(inter[i + 1] - inter[i]), 2),
+            })
+
+    writer.write(
+        "NEXT_STOP rels",
+        """
+        UNWIND $rels AS r
+        MATCH (a:Stop {id: r.fromId, gen: $gen})
+        MATCH (b:Stop {id: r.toId, gen: $gen})
+        MERGE (a)-[n:NEXT_STOP {busId: r.busId, direction: r.direction}]->(b)
+        SET n.busNumber = r.busNumber,
+            n.distance = r.distance
+        """,
+        rels,
+        param="rels",
+    )
 
-                if len(batch) >= batch_size:
-                    _flush_next_stop(client, batch)
-                    batch = []
 
-    if batch:
-        _flush_next_stop(client, batch)
+# ──────────────────────────────────────────────
+# Phase 6: Per-stop summaries (denormalized)
+# ──────────────────────────────────────────────
 
-    print(f"  Created {total} NEXT_STOP relationships.\n")
+def build_stop_summaries(model: TransitModel) -> dict[int, dict]:
+    """
+    Per-stop summary of the buses serving it, as parallel arrays (one entry per
+    bus + direction, ordered by bus number) so that stop detail reads are a single
+    node lookup with no HAS_STOP expansion.
+    """
+    entries: dict[int, list[tuple]] = {}
+    terminals: set[int] = set()
+    stops = model.seq_stops
+
+    for _, b, direction, start, end in model.sequences():
+        if start == end:
+            continue
+        terminals.add(stops[start])
+        terminals.add(stops[end - 1])
+        entry = (
+            model.bus_numbers[b],
+            direction,
+            model.bus_ids[b],
+            model.bus_carriers[b],
+            model.bus_first_points[b],
+            model.bus_last_points[b],
+            model.bus_tariff_strs[b],
+            model.bus_payment_types[b],
+        )
+        for row in dict.fromkeys(stops[start:end]):
+            entries.setdefault(row, []).append(entry)
+
+    summaries = {}
+    for row, rows in entries.items():
+        rows.sort(key=lambda r: (r[0], r[1]))
+        stop_id = model.stop_ids[row]
+        summaries[stop_id] = {
+            "id": stop_id,
+            "busNumbers": [r[0] for r in rows],
+            "busDirections": [r[1] for r in rows],
+            "busIds": [r[2] for r in rows],
+            "busCarriers": [r[3] for r in rows],
+            "busFirstPoints": [r[4] for r in rows],
+            "busLastPoints": [r[5] for r in rows],
+            "busTariffs": [r[6] for r in rows],
+            "busPaymentTypes": [r[7] for r in rows],
+            "busCount": len({r[2] for r in rows}),
+            "isTerminal": row in terminals,
+        }
+    return summaries
+
+
+def ingest_stop_summaries(writer: BatchWriter, model: TransitModel, stop_ids: set | None = None):
+    """Write per-stop summaries — for every stop, or only for stop_ids when given."""
+    print("Ingesting per-stop summaries...")
+
+    summaries = build_stop_summaries(model)
+    if stop_ids is None:
+        summaries = list(summaries.values())
+    else:
+        summaries = [summaries[sid] for sid in stop_ids if sid in summaries]
+    writer.write(
+        "Stop summaries",
+        """
+        UNWIND $stops AS s
+        MATCH (stop:Stop {id: s.id, gen: $gen})
+        SET stop.busNumbers = s.busNumbers,
+            stop.busDirections = s.busDirections,
+            stop.busIds = s.busIds,
+            stop.busCarriers = s.busCarriers,
+            stop.busFirstPoints = s.busFirstPoints,
+            stop.busLastPoints = s.busLastPoints,
+            stop.busTariffs = s.busTariffs,
+            stop.busPaymentTypes = s.busPaymentTypes,
+            stop.busCount = s.busCount,
+            stop.isTerminal = s.isTerminal
+        """,
+        summaries,
+        param="stops",
+    )
 
 
-def _flush_next_stop(client: Neo4jClient, batch: list):
-    client.run_write(
+# ──────────────────────────────────────────────
+# Phase 7: RouteShape nodes (simplified geometry)
+# ──────────────────────────────────────────────
+
+def ingest_route_shapes(writer: BatchWriter, model: TransitModel, bus_rows: set[int] | None = None):
+    """
+    Simplify each route's flowCoordinates with Douglas–Peucker at every
+    SHAPE_TOLERANCES level and store them as encoded polylines on a
+    RouteShape node per (bus, direction).
+    """
+    print("Ingesting RouteShape nodes...")
+
+    shapes = []
+    raw_points = 0
+    encoded_bytes = 0
+    for b, direction, points in model.shapes(bus_rows):
+        if len(points) < 2:
+            continue
+        levels = encode_shape_levels(points)
+        raw_points += len(points)
+        encoded_bytes += sum(len(v) for v in levels.values())
+        shapes.append({
+            "busId": model.bus_ids[b],
+            "direction": direction,
+            "pointCount": len(points),
+            **levels,
+        })
+
+    print(f"  {raw_points} raw points → {encoded_bytes} bytes of encoded polylines.")
+    writer.write(
+        "RouteShape nodes",
         """
-        UNWIND $rels AS r
-        MATCH (a:Stop {id: r.fromId})
-        MATCH (b:Stop {id: r.toId})
-        MERGE (a)-[n:NEXT_STOP {busId: r.busId, direction: r.direction}]->(b)
-        SET n.busNumber = r.busNumber,
-            n.distance = r.distance
+        UNWIND $shapes AS r
+        MATCH (bus:Bus {id: r.busId, gen: $gen})
+        MERGE (shape:RouteShape {busId: r.busId, direction: r.direction, gen: $gen})
+        SET shape.fine = r.fine,
+            shape.medium = r.medium,
+            shape.coarse = r.coarse,
+            shape.pointCount = r.pointCount
+        MERGE (bus)-[:HAS_SHAPE]->(shape)
         """,
-        {"rels": batch},
+        shapes,
+        param="shapes",
+        batch_size=100,
     )
 
 
 # ──────────────────────────────────────────────
-# Phase 6: TRANSFER relationships (proximity)
+# Phase 8: TRANSFER relationships (proximity)
 # ──────────────────────────────────────────────
 
-def ingest_transfers(client: Neo4jClient):
+def compute_transfers(
+    model: TransitModel,
+    max_distance: float = TRANSFER_MAX_DISTANCE_METERS,
+    walking_speed: float = WALKING_SPEED_METERS_PER_MIN,
+) -> list[dict]:
+    """
+    Find stop pairs within max_distance of each other that are NOT adjacent
+    (NEXT_STOP in either direction) on any bus. Uses a metric grid, so the
+    cost is O(n + pairs) instead of a Cartesian product over all stops.
+    """
+    adjacent = set()
+    ids, stops = model.stop_ids, model.seq_stops
+    for _, _, _, start, end in model.sequences():
+        for i in model.links(start, end):
+            a, b = ids[stops[i]], ids[stops[i + 1]]
+            adjacent.add((min(a, b), max(a, b)))
+
+    points = [
+        (ids[row], model.stop_lat[row], model.stop_lng[row])
+        for row in range(model.stop_count)
+        if model.stop_lat[row] and model.stop_lng[row]
+    ]
+    grid = GridIndex(points, cell_meters=max_distance)
+
+    pairs = []
+    for a, b, dist in grid.pairs_within(max_distance):
+        if (a, b) in adjacent:
+            continue
+        pairs.append({
+            "a": a,
+            "b": b,
+            "distance": round(dist, 1),
+            "minutes": round(dist / walking_speed, 1),
+        })
+    return pairs
+
+
+def ingest_transfers(writer: BatchWriter, model: TransitModel, stop_ids: set | None = None):
     """
-    Create TRANSFER edges between stops that are within TRANSFER_MAX_DISTANCE_METERS
-    of each other but do NOT share a direct NEXT_STOP connection on the same bus.
-    This is done in Neo4j using the spatial point index.
+    Create bidirectional TRANSFER edges between nearby stops. Pairs are computed
+    client-side (compute_transfers) and written in batched UNWINDs. With stop_ids,
+    only pairs touching those stops are written.
     """
-    print(f"Ingesting TRANSFER relationships (within {TRANSFER_MAX_DISTANCE_METERS}m)...")
+    print(
+        f"Ingesting TRANSFER relationships (within {TRANSFER_MAX_DISTANCE_METERS}m, "
+        f"{WALKING_SPEED_METERS_PER_MIN:g} m/min)..."
+    )
+
+    pairs = compute_transfers(model)
+    if stop_ids is not None:
+        pairs = [p for p in pairs if p["a"] in stop_ids or p["b"] in stop_ids]
+    print(f"  Found {len(pairs)} stop pairs.")
 
-    result = client.run_query(
+    writer.write(
+        "TRANSFER pairs",
         """
-        MATCH (a:Stop), (b:Stop)
-        WHERE a.location IS NOT NULL
-          AND b.location IS NOT NULL
-          AND a.id < b.id
-          AND point.distance(a.location, b.location) <= $maxDist
-          AND NOT (a)-[:NEXT_STOP]->(b)
-          AND NOT (b)-[:NEXT_STOP]->(a)
-        WITH a, b, point.distance(a.location, b.location) AS dist
+        UNWIND $pairs AS p
+        MATCH (a:Stop {id: p.a, gen: $gen})
+        MATCH (b:Stop {id: p.b, gen: $gen})
         MERGE (a)-[t:TRANSFER]->(b)
-        SET t.walkingDistanceMeters = round(dist, 1),
-            t.walkingTimeMinutes = round(dist / 72.0, 1)
+        SET t.walkingDistanceMeters = p.distance,
+            t.walkingTimeMinutes = p.minutes
         MERGE (b)-[t2:TRANSFER]->(a)
-        SET t2.walkingDistanceMeters = round(dist, 1),
-            t2.walkingTimeMinutes = round(dist / 72.0, 1)
-        RETURN count(t) AS created
+        SET t2.walkingDistanceMeters = p.distance,
+            t2.walkingTimeMinutes = p.minutes
         """,
-        {"maxDist": TRANSFER_MAX_DISTANCE_METERS},
+        pairs,
+        param="pairs",
+        batch_size=1000,
     )
 
-    count = result[0]["created"] if result else 0
-    print(f"  Created {count} TRANSFER pairs (bidirectional).\n")
-
 
 # ──────────────────────────────────────────────
-# Phase 7: Validation
+# Phase 9: Validation
 # ──────────────────────────────────────────────
 
-def validate_graph(client: Neo4jClient):
+def validate_graph(client: ScopedClient) -> bool:
+    """
+    Report counts for the client's generation. False if it is missing core
+    data (no stops, buses or HAS_STOP edges) and must not be made active.
+    """
     print("Validating graph...")
 
     checks = [
-        ("Stop nodes", "MATCH (s:Stop) RETURN count(s) AS c"),
-        ("Bus nodes", "MATCH (b:Bus) RETURN count(b) AS c"),
-        ("Carrier nodes", "MATCH (c:Carrier) RETURN count(c) AS c"),
-        ("Zone nodes", "MATCH (z:Zone) RETURN count(z) AS c"),
-        ("HAS_STOP rels", "MATCH ()-[r:HAS_STOP]->() RETURN count(r) AS c"),
-        ("NEXT_STOP rels", "MATCH ()-[r:NEXT_STOP]->() RETURN count(r) AS c"),
-        ("TRANSFER rels", "MATCH ()-[r:TRANSFER]->() RETURN count(r) AS c"),
-        ("OPERATED_BY rels", "MATCH ()-[r:OPERATED_BY]->() RETURN count(r) AS c"),
-        ("IN_ZONE rels", "MATCH ()-[r:IN_ZONE]->() RETURN count(r) AS c"),
+        ("Stop nodes", "MATCH (s:Stop {gen: $gen}) RETURN count(s) AS c"),
+        ("Bus nodes", "MATCH (b:Bus {gen: $gen}) RETURN count(b) AS c"),
+        ("Carrier nodes", "MATCH (c:Carrier {gen: $gen}) RETURN count(c) AS c"),
+        ("Zone nodes", "MATCH (z:Zone {gen: $gen}) RETURN count(z) AS c"),
+        ("RouteShape nodes", "MATCH (r:RouteShape {gen: $gen}) RETURN count(r) AS c"),
+        ("HAS_STOP rels", "MATCH (:Bus {gen: $gen})-[r:HAS_STOP]->() RETURN count(r) AS c"),
+        ("NEXT_STOP rels", "MATCH (:Stop {gen: $gen})-[r:NEXT_STOP]->() RETURN count(r) AS c"),
+        ("TRANSFER rels", "MATCH (:Stop {gen: $gen})-[r:TRANSFER]->() RETURN count(r) AS c"),
+        ("OPERATED_BY rels", "MATCH (:Bus {gen: $gen})-[r:OPERATED_BY]->() RETURN count(r) AS c"),
+        ("IN_ZONE rels", "MATCH (:Bus {gen: $gen})-[r:IN_ZONE]->() RETURN count(r) AS c"),
     ]
 
+    counts = {}
     for label, query in checks:
         result = client.run_query(query)
-        count = result[0]["c"] if result else 0
-        print(f"  {label}: {count}")
+        counts[label] = result[0]["c"] if result else 0
+        print(f"  {label}: {counts[label]}")
 
     # Check orphan stops (stops with no bus)
     orphans = client.run_query(
-        "MATCH (s:Stop) WHERE NOT (s)<-[:HAS_STOP]-() RETURN count(s) AS c"
+        "MATCH (s:Stop {gen: $gen}) WHERE NOT (s)<-[:HAS_STOP]-() RETURN count(s) AS c"
     )
     orphan_count = orphans[0]["c"] if orphans else 0
     if orphan_count > 0:
         print(f"  Warning: {orphan_count} orphan stops (no bus serves them)")
 
-    print("\nGraph build complete.")
+    unsummarized = client.run_query(
+        "MATCH (s:Stop {gen: $gen}) WHERE (s)<-[:HAS_STOP]-() AND s.busIds IS NULL "
+        "RETURN count(s) AS c"
+    )
+    unsummarized_count = unsummarized[0]["c"] if unsummarized else 0
+    if unsummarized_count > 0:
+        print(f"  Warning: {unsummarized_count} served stops without a bus summary")
+
+    missing = [k for k in ("Stop nodes", "Bus nodes", "HAS_STOP rels") if not counts[k]]
+    if missing:
+        print(f"  Error: generation has no {', '.join(missing)}")
+        return False
+    return True
+
+
+def active_generation(client: Neo4jClient) -> str | None:
+    rows = client.run_query(queries.GRAPH_VERSION, {})
+    return rows[0].get("generation") if rows else None
+
+
+def mark_graph_version(client: Neo4jClient, generation: str) -> str:
+    """
+    Point GraphMeta at `generation` and stamp a new version so the API drops
+    its caches. This single write is the switch between generations.
+    """
+    version = time.strftime("%Y%m%d%H%M%S")
+    client.run_write(
+        """
+        MERGE (m:GraphMeta {key: "active"})
+        SET m.previousGeneration = CASE
+                WHEN m.generation <> $generation THEN m.generation
+                ELSE m.previousGeneration END,
+            m.generation = $generation,
+            m.version = $version,
+            m.builtAt = datetime()
+        """,
+        {"generation": generation, "version": version},
+    )
+    print(f"Graph version: {version} (generation {generation})")
+    return version
+
+
+# ──────────────────────────────────────────────
+# Incremental refresh (fingerprint diff)
+# ──────────────────────────────────────────────
+
+FINGERPRINTS_PATH = os.path.join(DATA_DIR, "graph_fingerprints.json")
+# Snapshots written with a different format can't be diffed — full rebuild instead
+FINGERPRINT_FORMAT = 2
+
+
+def _digest(obj) -> str:
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def fingerprint_data(model: TransitModel) -> dict:
+    """
+    Hash every bus and stop record as ingested. Stop attributes are left out
+    of the bus hash so that renaming a stop only touches that Stop node.
+    Each bus also records its stop ids, which an incremental run needs to
+    find the edges of a bus that has since changed or disappeared.
+    """
+    sequences: dict[int, list] = {}
+    for _, b, direction, start, end in model.sequences():
+        sequences.setdefault(b, []).append([
+            direction,
+            [model.stop_ids[r] for r in model.seq_stops[start:end]],
+            model.seq_order[start:end].tolist(),
+            model.seq_total_distance[start:end].tolist(),
+            model.seq_intermediate_distance[start:end].tolist(),
+        ])
+    shapes: dict[int, list] = {}
+    for b, direction, points in model.shapes():
+        shapes.setdefault(b, []).append([direction, points])
+
+    buses = {}
+    for b in range(model.bus_count):
+        record = [
+            model.bus_numbers[b], model.bus_carriers[b], model.bus_first_points[b],
+            model.bus_last_points[b], model.bus_route_lengths[b], model.bus_durations[b],
+            model.bus_tariffs[b], model.bus_tariff_strs[b], model.bus_payment_types[b],
+            model.bus_regions[b], model.bus_zone_ids[b], model.bus_zone_names[b],
+            sequences.get(b, []), shapes.get(b, []),
+        ]
+        buses[str(model.bus_ids[b])] = {
+            "hash": _digest(record),
+            "stops": sorted({model.stop_ids[r] for r in model.bus_stop_rows(b)}),
+        }
+    stops = {
+        str(model.stop_ids[row]): _digest(model.stop_record(row))
+        for row in range(model.stop_count)
+    }
+    return {"format": FINGERPRINT_FORMAT, "buses": buses, "stops": stops}
+
+
+def load_fingerprints() -> dict | None:
+    if not os.path.exists(FINGERPRINTS_PATH):
+        return None
+    with open(FINGERPRINTS_PATH, "r", encoding="utf-8") as f:
+        fingerprints = json.load(f)
+    return fingerprints if fingerprints.get("format") == FINGERPRINT_FORMAT else None
+
+
+def save_fingerprints(fingerprints: dict):
+    tmp = FINGERPRINTS_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, separators=(",", ":"))
+    os.replace(tmp, FINGERPRINTS_PATH)
+
+
+def diff_fingerprints(old: dict, new: dict) -> dict:
+    """Added / changed / removed ids (as ints) for buses and stops."""
+    diff = {}
+    for kind in ("buses", "stops"):
+        before, after = old.get(kind, {}), new[kind]
+        digest = (lambda v: v["hash"]) if kind == "buses" else (lambda v: v)
+        diff[kind] = {
+            "added": {int(k) for k in after.keys() - before.keys()},
+            "removed": {int(k) for k in before.keys() - after.keys()},
+            "changed": {
+                int(k) for k in after.keys() & before.keys()
+                if digest(after[k]) != digest(before[k])
+            },
+        }
+    return diff
+
+
+def apply_incremental(
+    writer: BatchWriter, model: TransitModel, old: dict, diff: dict
+):
+    """
+    Apply a fingerprint diff to the active generation, in place.
+
+    Changed and removed buses are deleted together with their NEXT_STOP edges
+    and RouteShapes, then changed and added buses are re-ingested through the
+    normal phases. Summaries and TRANSFER edges are rebuilt only for stops on
+    the old or new route of a touched bus, or whose own record changed.
+    """
+    client = writer.client
+    buses, stops = diff["buses"], diff["stops"]
+    dropped_buses = buses["changed"] | buses["removed"]
+    upsert_buses = {model.bus_index[bid] for bid in buses["changed"] | buses["added"]}
+
+    # Stops whose bus membership or NEXT_STOP adjacency may have changed
+    touched_stops = set()
+    for bus_id in dropped_buses:
+        touched_stops.update(old["buses"][str(bus_id)]["stops"])
+    for b in upsert_buses:
+        touched_stops.update(model.stop_ids[r] for r in model.bus_stop_rows(b))
+
+    print(
+        f"Applying diff: buses +{len(buses['added'])} ~{len(buses['changed'])} "
+        f"-{len(buses['removed'])}, stops +{len(stops['added'])} "
+        f"~{len(stops['changed'])} -{len(stops['removed'])}\n"
+    )
+
+    if dropped_buses:
+        print(f"Removing {len(dropped_buses)} stale Bus nodes...")
+        client.run_write(
+            """
+            UNWIND $stopIds AS sid
+            MATCH (:Stop {id: sid, gen: $gen})-[n:NEXT_STOP]->()
+            WHERE n.busId IN $busIds
+            DELETE n
+            """,
+            {"stopIds": sorted(touched_stops), "busIds": sorted(dropped_buses)},
+        )
+        client.run_write(
+            """
+            UNWIND $busIds AS bid
+            MATCH (bus:Bus {id: bid, gen: $gen})
+            OPTIONAL MATCH (bus)-[:HAS_SHAPE]->(shape:RouteShape)
+            DETACH DELETE shape, bus
+            """,
+            {"busIds": sorted(dropped_buses)},
+        )
+        print("  Done.\n")
+
+    if stops["removed"]:
+        print(f"Removing {len(stops['removed'])} Stop nodes...")
+        client.run_write(
+            """
+            UNWIND $ids AS sid
+            MATCH (stop:Stop {id: sid, gen: $gen})
+            DETACH DELETE stop
+            """,
+            {"ids": sorted(stops["removed"])},
+        )
+        print("  Done.\n")
+
+    upsert_stops = stop_rows(
+        model, (model.stop_index[sid] for sid in stops["changed"] | stops["added"])
+    )
+    if upsert_stops:
+        print(f"Upserting {len(upsert_stops)} Stop nodes...")
+        write_stops(writer, upsert_stops)
+        print()
+
+    if upsert_buses:
+        ingest_carriers_and_zones(writer, model, upsert_buses)
+        ingest_buses(writer, model, upsert_buses)
+        run_stage(
+            lambda: ingest_has_stop(writer, model, upsert_buses),
+            lambda: ingest_next_stop(writer, model, upsert_buses),
+            lambda: ingest_route_shapes(writer, model, upsert_buses),
+        )
+
+    if dropped_buses:
+        client.run_write("MATCH (c:Carrier {gen: $gen}) WHERE NOT (c)<-[:OPERATED_BY]-() DELETE c")
+        client.run_write("MATCH (z:Zone {gen: $gen}) WHERE NOT (z)<-[:IN_ZONE]-() DELETE z")
+
+    live_touched = {sid for sid in touched_stops if sid in model.stop_index}
+    ingest_stop_summaries(writer, model, live_touched)
+
+    transfer_stops = live_touched | (stops["changed"] | stops["added"])
+    if transfer_stops:
+        client.run_write(
+            """
+            UNWIND $ids AS sid
+            MATCH (:Stop {id: sid, gen: $gen})-[t:TRANSFER]-()
+            DELETE t
+            """,
+            {"ids": sorted(transfer_stops)},
+        )
+        ingest_transfers(writer, model, transfer_stops)
 
 
 # ──────────────────────────────────────────────
 # Main
 # ──────────────────────────────────────────────
 
-def clear_graph(client: Neo4jClient):
-    print("Clearing existing graph data...")
-    # Delete in batches to avoid memory issues on large graphs
-    client.run_write("MATCH ()-[r]->() DELETE r")
-    client.run_write("MATCH (n) DELETE n")
-    print("  Done.\n")
+def new_generation() -> str:
+    return time.strftime("g%Y%m%d%H%M%S")
+
+
+def drop_generations(client: Neo4jClient, keep: list[str]):
+    """
+    Delete every node outside the generations in `keep` (including
+    pre-generation nodes without a gen), in server-side batches so no single
+    transaction has to hold the whole old graph.
+    """
+    print(f"Dropping graph data outside generations {', '.join(keep)}...")
+    t0 = time.time()
+    client.run_write(
+        """
+        MATCH (n)
+        WHERE NOT n:GraphMeta AND (n.gen IS NULL OR NOT n.gen IN $keep)
+        CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF $batch ROWS
+        """,
+        {"keep": keep, "batch": DROP_BATCH_ROWS},
+    )
+    print(f"  Done in {time.time() - t0:.1f}s.\n")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Load AYNA data into Neo4j.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="apply only the changes since the last build (falls back to a full "
+        "rebuild when no fingerprint snapshot exists)",
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  Conductor — Graph Ingestion")
     print("=" * 60 + "\n")
 
     # Load data
-    print("Loading JSON data...")
-    bus_details = load_json("busDetails.json")
-    stops_raw = load_json("stops.json")
-    print(f"  busDetails.json: {len(bus_details)} buses")
-    print(f"  stops.json: {len(stops_raw)} stops\n")
+    print("Loading transit model...")
+    t0 = time.time()
+    model, cached = load_or_build(os.path.join(DATA_DIR, "busDetails.json"), TRANSIT_MODEL_PATH)
+    source = "cached model" if cached else "busDetails.json"
+    print(
+        f"  {model.bus_count} buses, {model.stop_count} stops, "
+        f"{model.sequence_count} stop sequences from {source} in {time.time() - t0:.2f}s\n"
+    )
+
+    fingerprints = fingerprint_data(model)
+    previous = load_fingerprints() if args.incremental else None
+    if args.incremental and previous is None:
+        print("No fingerprint snapshot found — running a full rebuild.\n")
 
     with Neo4jClient() as client:
         client.verify_connectivity()
-        print()
+        active = active_generation(client)
+        if previous is not None and previous.get("generation") != active:
+            print("Fingerprints belong to another graph generation — running a full rebuild.\n")
+            previous = None
+
+        # Incremental runs patch the active generation in place; a full rebuild
+        # stages a new one and only switches to it once it validates.
+        gen = active if previous is not None else new_generation()
+        scoped = ScopedClient(client, gen=gen)
+        start = time.time()
 
-        clear_graph(client)
-        create_constraints_and_indexes(client)
+        with BatchWriter(scoped) as writer:
+            print(f"Writing generation {gen} with up to {writer.concurrency} concurrent batches.\n")
+
+            if previous is not None:
+                diff = diff_fingerprints(previous, fingerprints)
+                if not any(ids for kind in diff.values() for ids in kind.values()):
+                    print("No changes since the last build.")
+                    return
+                create_constraints_and_indexes(client)
+                apply_incremental(writer, model, previous, diff)
+            else:
+                create_constraints_and_indexes(client)
+
+                # Nodes before the edges that MATCH them; phases within a stage
+                # are independent and share the writer's concurrency limit.
+                run_stage(
+                    lambda: ingest_stops(writer, model),
+                    lambda: ingest_carriers_and_zones(writer, model),
+                )
+                ingest_buses(writer, model)
+                run_stage(
+                    lambda: ingest_has_stop(writer, model),
+                    lambda: ingest_next_stop(writer, model),
+                    lambda: ingest_route_shapes(writer, model),
+                )
+                run_stage(
+                    lambda: ingest_stop_summaries(writer, model),
+                    lambda: ingest_transfers(writer, model),
+                )
 
-        start = time.time()
+        if not validate_graph(scoped):
+            print(
+                f"\nValidation failed — generation {gen} was not activated; "
+                f"the API keeps serving {active}."
+            )
+            sys.exit(1)
 
-        ingest_stops(client, bus_details)
-        ingest_carriers_and_zones(client, bus_details)
-        ingest_buses(client, bus_details)
-        ingest_has_stop(client, bus_details)
-        ingest_next_stop(client, bus_details)
-        ingest_transfers(client)
-        validate_graph(client)
+        version = mark_graph_version(client, gen)
+        fingerprints["generation"] = gen
+        save_fingerprints(fingerprints)
 
-        elapsed = time.time() - start
-        print(f"\nTotal ingestion time: {elapsed:.1f}s")
+        t0 = time.time()
+        size = write_snapshot(SNAPSHOT_PATH, model, compute_transfers(model), version)
+        print(f"Snapshot: {SNAPSHOT_PATH} ({size / 1024:.0f} KiB, {time.time() - t0:.2f}s)\n")
 
+        if previous is None:
+            # API instances pinned to the replaced generation keep serving it
+            # until they reload, so it stays until the next full rebuild.
+            drop_generations(client, [g for g in (gen, active) if g])
+
+        elapsed = time.time() - start
+        writer.report()
+        print(f"\nGraph build complete. Total ingestion time: {elapsed:.1f}s")
 
 if __name__ == "__main__":
     main()
@@ -1,93 +1,280 @@
-import requests
+"""
+Fetch bus route details from the AYNA API into data/busDetails.json.
+
+Buses are fetched concurrently over one pooled session, with retries and
+backoff on network errors, 429 and 5xx. Each response's ETag/Last-Modified
+and content hash go into data/busDetails.state.json, so the next run sends
+conditional requests and leaves unchanged buses alone. If nothing changed,
+busDetails.json is not rewritten. Progress is appended to a checkpoint file,
+so an interrupted run resumes where it stopped.
+
+Usage:
+    python scripts/busDetails.py
+    python scripts/busDetails.py --concurrency 4 --base-url http://localhost:8080
+    python scripts/busDetails.py --force    # ignore validators, refetch everything
+"""
+
+import argparse
+import hashlib
 import json
 import os
+import random
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conductor.config import AYNA_API_URL, FETCH_CONCURRENCY
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+OUTPUT_PATH = os.path.join(DATA_DIR, "busDetails.json")
+STATE_PATH = os.path.join(DATA_DIR, "busDetails.state.json")
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "busDetails.checkpoint.jsonl")
+
+MAX_RETRIES = 4
+TIMEOUT_SECONDS = 30
+
+
+def make_session(concurrency: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept"] = "application/json"
+    return session
 
-def fetch_bus_list():
+
+def get_with_retry(session: requests.Session, url: str, headers: dict = None) -> requests.Response:
     """
-    Fetch the list of all bus IDs from the Ayna API.
+    GET with exponential backoff on network errors, 429 and 5xx. Honors a
+    numeric Retry-After. Other 4xx responses raise immediately.
     """
-    url = "https://map-api.ayna.gov.az/api/bus/getBusList"
+    attempt = 0
+    while True:
+        try:
+            response = session.get(url, headers=headers, timeout=TIMEOUT_SECONDS)
+            response.raise_for_status()  # 304 passes through
+            return response
+        except requests.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            if attempt >= MAX_RETRIES or (status is not None and status < 500 and status != 429):
+                raise
+            attempt += 1
+            delay = min(0.5 * 2 ** attempt, 15.0) * random.uniform(0.5, 1.0)
+            retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
 
-    try:
-        print("Fetching bus list from API...")
-        response = requests.get(url)
-        response.raise_for_status()
 
-        bus_list = response.json()
-        print(f"Successfully fetched {len(bus_list)} buses")
-        return bus_list
+def content_hash(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
 
-    except requests.exceptions.RequestException as e:
+
+def fetch_bus_list(session: requests.Session, base_url: str = AYNA_API_URL):
+    """
+    Fetch the list of all bus IDs from the Ayna API.
+    """
+    print("Fetching bus list from API...")
+    try:
+        bus_list = get_with_retry(session, f"{base_url}/api/bus/getBusList").json()
+    except (requests.RequestException, ValueError) as e:
         print(f"Error fetching bus list: {e}")
         return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON response: {e}")
-        return None
+    print(f"Successfully fetched {len(bus_list)} buses")
+    return bus_list
 
-def fetch_bus_details(bus_id):
+
+def fetch_bus_details(
+    session: requests.Session, bus_id: int, validators: dict | None = None,
+    base_url: str = AYNA_API_URL,
+) -> dict:
     """
-    Fetch detailed information for a specific bus ID.
+    Conditionally fetch one bus. Returns a checkpoint entry:
+    {"id", "status": "not-modified" | "unchanged" | "changed", "etag",
+    "lastModified", "hash", "details" (only when changed)}.
     """
-    url = f"https://map-api.ayna.gov.az/api/bus/getBusById?id={bus_id}"
+    validators = validators or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("lastModified"):
+        headers["If-Modified-Since"] = validators["lastModified"]
 
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+    response = get_with_retry(
+        session, f"{base_url}/api/bus/getBusById?id={bus_id}", headers
+    )
+    entry = {
+        "id": bus_id,
+        "etag": response.headers.get("ETag") or validators.get("etag"),
+        "lastModified": response.headers.get("Last-Modified") or validators.get("lastModified"),
+    }
+    if response.status_code == 304:
+        return {**entry, "status": "not-modified", "hash": validators.get("hash")}
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching details for bus ID {bus_id}: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON response for bus ID {bus_id}: {e}")
-        return None
+    body = response.content
+    details = json.loads(body)
+    digest = content_hash(body)
+    if digest == validators.get("hash"):
+        return {**entry, "status": "unchanged", "hash": digest}
+    return {**entry, "status": "changed", "hash": digest, "details": details}
+
+
+# ──────────────────────────────────────────────
+# State & checkpoint
+# ──────────────────────────────────────────────
+
+def load_state() -> dict:
+    """Validators from the last completed run: {bus id (str): {etag, lastModified, hash}}."""
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("buses", {})
+
+
+def save_state(buses: dict, failed: list):
+    _write_json(STATE_PATH, {"buses": buses, "failed": failed})
+
+
+def load_checkpoint() -> dict[int, dict]:
+    """Entries already fetched by an interrupted run. Torn lines are skipped."""
+    entries = {}
+    if not os.path.exists(CHECKPOINT_PATH):
+        return entries
+    with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["id"]] = entry
+    return entries
+
+
+def load_previous_output() -> dict[int, dict]:
+    if not os.path.exists(OUTPUT_PATH):
+        return {}
+    with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
+        return {bus["id"]: bus for bus in json.load(f)}
+
+
+def _write_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
 
-def fetch_all_bus_details():
+
+# ──────────────────────────────────────────────
+# Main
+# ──────────────────────────────────────────────
+
+def fetch_all_bus_details(
+    base_url: str = AYNA_API_URL, concurrency: int = FETCH_CONCURRENCY, force: bool = False
+):
     """
     Fetch details for all buses and save to JSON file.
+    Returns the bus details list, or None if the bus list could not be fetched.
     """
-    # First, get the list of all bus IDs
-    bus_list = fetch_bus_list()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    session = make_session(concurrency)
+
+    bus_list = fetch_bus_list(session, base_url)
     if not bus_list:
         print("Failed to fetch bus list. Exiting.")
-        return
-
-    # Fetch details for each bus
-    all_bus_details = []
-    total_buses = len(bus_list)
-
-    print(f"\nFetching details for {total_buses} buses...")
+        return None
 
-    for idx, bus in enumerate(bus_list, 1):
-        bus_id = bus['id']
-        bus_number = bus['number']
+    previous = load_previous_output()
+    # Validators are only usable while we still hold the content they describe
+    state = {} if force else {
+        k: v for k, v in load_state().items() if int(k) in previous
+    }
+    done = load_checkpoint()
+    if done:
+        print(f"Resuming: {len(done)} buses already fetched by an interrupted run.")
 
-        print(f"[{idx}/{total_buses}] Fetching bus #{bus_number} (ID: {bus_id})...", end=' ')
+    pending = [bus for bus in bus_list if bus["id"] not in done]
+    total = len(bus_list)
+    print(f"\nFetching details for {len(pending)} buses ({concurrency} concurrent)...")
 
-        details = fetch_bus_details(bus_id)
+    failed = []
+    start = time.time()
+    with open(CHECKPOINT_PATH, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch") as pool:
+        checkpoint.write("\n" if checkpoint.tell() else "")  # never append onto a torn line
+        futures = {
+            pool.submit(
+                fetch_bus_details, session, bus["id"], state.get(str(bus["id"])), base_url
+            ): bus
+            for bus in pending
+        }
+        for idx, future in enumerate(as_completed(futures), len(done) + 1):
+            bus = futures[future]
+            try:
+                entry = future.result()
+            except (requests.RequestException, ValueError) as e:
+                failed.append(bus["id"])
+                print(f"[{idx}/{total}] Bus #{bus['number']} (ID: {bus['id']}) ✗ {e}")
+                continue
+            checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            done[bus["id"]] = entry
+            print(f"[{idx}/{total}] Bus #{bus['number']} (ID: {bus['id']}) ✓ {entry['status']}")
+    session.close()
 
-        if details:
-            all_bus_details.append(details)
-            print("✓")
+    all_bus_details = []
+    new_state = {}
+    changed = 0
+    for bus in bus_list:
+        bus_id = bus["id"]
+        entry = done.get(bus_id)
+        if entry is not None and entry["status"] == "changed":
+            all_bus_details.append(entry["details"])
+            changed += 1
+        elif bus_id in previous:
+            # Not modified, unchanged, or failed this run — keep the last good record
+            all_bus_details.append(previous[bus_id])
         else:
-            print("✗")
-
-        # Add a small delay to avoid overwhelming the server
-        time.sleep(0.1)
+            continue
+        if entry is not None:
+            new_state[str(bus_id)] = {
+                "etag": entry["etag"],
+                "lastModified": entry["lastModified"],
+                "hash": entry["hash"],
+            }
+        elif str(bus_id) in state:
+            new_state[str(bus_id)] = state[str(bus_id)]
 
-    print(f"\nSuccessfully fetched details for {len(all_bus_details)}/{total_buses} buses")
+    removed = len(previous.keys() - {bus["id"] for bus in bus_list})
+    kept = [bus_id for bus_id in failed if bus_id in previous]
+    print(
+        f"\nFetched {total - len(failed)}/{total} buses in {time.time() - start:.1f}s: "
+        f"{changed} changed, {removed} removed, {len(failed)} failed"
+        + (f" ({len(kept)} kept from the previous run)" if kept else "")
+    )
 
-    # Ensure data directory exists
-    os.makedirs('data', exist_ok=True)
+    if changed or removed or not os.path.exists(OUTPUT_PATH):
+        _write_json(OUTPUT_PATH, all_bus_details)
+        print(f"Bus details saved to {OUTPUT_PATH} ({len(all_bus_details)} buses)")
+    else:
+        print(f"No changes — {OUTPUT_PATH} left untouched")
 
-    # Save to JSON file
-    output_path = 'data/busDetails.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_bus_details, f, ensure_ascii=False, indent=2)
-
-    print(f"Bus details saved to {output_path}")
+    save_state(new_state, failed)
+    os.remove(CHECKPOINT_PATH)
     return all_bus_details
 
+
 if __name__ == "__main__":
-    fetch_all_bus_details()
+    parser = argparse.ArgumentParser(description="Fetch bus details from the AYNA API.")
+    parser.add_argument("--base-url", default=AYNA_API_URL, help="API root (e.g. a local stub)")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    parser.add_argument(
+        "--force", action="store_true", help="ignore stored ETags/hashes and refetch everything"
+    )
+    args = parser.parse_args()
+    if fetch_all_bus_details(args.base_url.rstrip("/"), max(1, args.concurrency), args.force) is None:
+        sys.exit(1)
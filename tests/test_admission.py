@@ -0,0 +1,30 @@
+import pytest
+
+from conductor.api.admission import Rejected, TokenBucket, client_ip
+
+PROXY = "10.0.0.7"
+
+
+def test_client_ip_without_trusted_proxies_is_the_peer():
+    assert client_ip("203.0.113.9", ["198.51.100.1"], 0) == "203.0.113.9"
+
+
+def test_client_ip_takes_the_hop_the_proxy_recorded():
+    assert client_ip(PROXY, ["203.0.113.9"], 1) == "203.0.113.9"
+    # A client-supplied entry sits left of the one the proxy appended
+    assert client_ip(PROXY, ["1.2.3.4, 203.0.113.9"], 1) == "203.0.113.9"
+    assert client_ip(PROXY, ["1.2.3.4", "203.0.113.9"], 1) == "203.0.113.9"
+
+
+def test_client_ip_with_a_missing_header_falls_back_to_the_peer():
+    assert client_ip(PROXY, [], 1) == PROXY
+    assert client_ip(None, [], 1) is None
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_ip_bucket():
+    bucket = TokenBucket("ip", per_minute=1, burst=3)
+    for i in range(3):
+        bucket.take(client_ip(PROXY, [f"192.0.2.{i}, 203.0.113.9"], 1))
+    with pytest.raises(Rejected) as e:
+        bucket.take(client_ip(PROXY, ["192.0.2.200, 203.0.113.9"], 1))
+    assert e.value.status == 429
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from conductor.transit.stream import iter_json_array
+
+
+def _write(tmp_path, text: str) -> str:
+    path = tmp_path / "data.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 20])
+@pytest.mark.parametrize("text", [
+    "[]",
+    " [ 1 , 2 ] ",
+    "\n\n    \t[1]",
+    '[{"a": 1, "b": [1, 2]}, "x,]", -4.25e-3, true, null]',
+])
+def test_matches_json_loads(tmp_path, text, chunk_size):
+    path = _write(tmp_path, text)
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == json.loads(text)
+
+
+def test_leading_whitespace_longer_than_a_chunk(tmp_path):
+    path = _write(tmp_path, " [ 1 , 2 ] ")
+    assert list(iter_json_array(path, chunk_size=1)) == [1, 2]
+
+
+def test_projects_fields(tmp_path):
+    path = _write(tmp_path, '[{"id": 1, "stops": [], "extra": "x"}]')
+    assert list(iter_json_array(path, fields=("id", "stops"))) == [{"id": 1, "stops": []}]
+
+
+@pytest.mark.parametrize("text", ["", "   ", '{"a": 1}', "[1, 2", "[1 2]"])
+def test_rejects_invalid_input(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(_write(tmp_path, text), chunk_size=1))